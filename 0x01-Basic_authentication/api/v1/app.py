@@ -10,6 +10,7 @@ from flask_cors import CORS, cross_origin
 import os
 from api.v1.auth.auth import Auth
 from api.v1.auth.basic_auth import BasicAuth
+from api.v1.auth.path_matcher import PathMatcher
 
 app = Flask(__name__)
 app.register_blueprint(app_views)
@@ -17,6 +18,9 @@ CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 
 
 auth = None
+EXCLUDED_PATHS = PathMatcher(['/api/v1/status/',
+                              '/api/v1/unauthorized/',
+                              '/api/v1/forbidden/'])
 if os.getenv("AUTH_TYPE") == "basic_auth":
     auth = BasicAuth()
 elif os.getenv("AUTH_TYPE") == "auth":
@@ -34,9 +38,7 @@ def before_request_func() -> None:
     """
     if auth is None:
         return
-    if not auth.require_auth(request.path, ['/api/v1/status/',
-                                            '/api/v1/unauthorized/',
-                                            '/api/v1/forbidden/']):
+    if not auth.require_auth(request.path, EXCLUDED_PATHS):
         # If the request does not require authentication, return
         return
     if auth.authorization_header(request) is None:
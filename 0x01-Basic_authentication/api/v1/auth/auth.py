@@ -3,7 +3,8 @@
 """
 from flask import request
 from typing import List, TypeVar
-import fnmatch
+
+from .path_matcher import PathMatcher, compile_paths
 
 
 class Auth:
@@ -11,6 +12,9 @@ class Auth:
     """
     def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
         """ Method to check if auth is required.
+
+        excluded_paths are fnmatch patterns, given as a list or as a
+        PathMatcher compiled from it.
         """
         if path is None:
             return True
@@ -18,11 +22,10 @@ class Auth:
         if excluded_paths is None or not excluded_paths:
             return True
 
-        for excluded_path in excluded_paths:
-            if fnmatch.fnmatch(path, excluded_path):
-                return False
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = compile_paths(tuple(excluded_paths))
 
-        return True
+        return not excluded_paths.match(path)
 
     def authorization_header(self, request=None) -> str:
         """ Method to get authorization header.
@@ -31,15 +34,7 @@ class Auth:
             return request.headers.get('Authorization', None)
         return None
 
-<<<<<<< HEAD
     def current_user(self, request=None) -> TypeVar('User'):
         """ Method to get user from request.
-=======
-    def current_user(self, request=None) -> TypeVar("User"):
-        """
-        Get the current user from the given request
-        :param request: the request object
-        :return: the current user
->>>>>>> 707ed63 (n)
         """
         return None
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Precompiled path matching module.
+"""
+from functools import lru_cache
+from typing import List
+import fnmatch
+import re
+
+
+class PathMatcher:
+    """Set of fnmatch patterns compiled for fast matching.
+
+    Patterns without wildcard go to a set, patterns ending with a single
+    * to a set of prefixes, and any other glob to one regular expression.
+    """
+    def __init__(self, patterns: List[str]) -> None:
+        """Compiles the patterns.
+        """
+        self.patterns = tuple(patterns)
+        self._exact = set()
+        self._prefixes = set()
+        globs = []
+        for pattern in self.patterns:
+            head = pattern[:-1] if pattern.endswith('*') else pattern
+            if any(c in head for c in '*?['):
+                globs.append(fnmatch.translate(pattern))
+            elif pattern.endswith('*'):
+                self._prefixes.add(head)
+            else:
+                self._exact.add(pattern)
+        self._prefix_lengths = sorted(set(len(p) for p in self._prefixes))
+        self._glob = re.compile('|'.join(globs)) if globs else None
+
+    def __len__(self) -> int:
+        """Returns the number of patterns.
+        """
+        return len(self.patterns)
+
+    def match(self, path: str) -> bool:
+        """Checks if a path matches one of the patterns.
+        """
+        if path in self._exact:
+            return True
+        for length in self._prefix_lengths:
+            if length > len(path):
+                break
+            if path[:length] in self._prefixes:
+                return True
+        return self._glob is not None and self._glob.match(path) is not None
+
+
+@lru_cache(maxsize=64)
+def compile_paths(patterns: tuple) -> PathMatcher:
+    """Returns the PathMatcher of a tuple of patterns, compiled once.
+    """
+    return PathMatcher(patterns)
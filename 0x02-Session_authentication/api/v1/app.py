@@ -5,6 +5,10 @@ Route module for the API
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
+from api.v1.auth.path_matcher import PathMatcher
+from api.v1.auth.rate_limit import trust_proxies
+from api.v1.auth.timing import timed
+from models.base import reload_changed
 import os
 from os import getenv
 
@@ -12,9 +16,14 @@ from os import getenv
 app = Flask(__name__)
 app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
 app.register_blueprint(app_views)
+app.wsgi_app = trust_proxies(app.wsgi_app)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 auth = None
 AUTH_TYPE = getenv("AUTH_TYPE")
+EXCLUDED_PATHS = PathMatcher(['/api/v1/status/',
+                              '/api/v1/unauthorized/',
+                              '/api/v1/forbidden/',
+                              '/api/v1/auth_session/login/'])
 
 if AUTH_TYPE == "auth":
     from api.v1.auth.auth import Auth
@@ -31,6 +40,14 @@ elif AUTH_TYPE == "session_exp_auth":
 elif AUTH_TYPE == "session_db_auth":
     from api.v1.auth.session_db_auth import SessionDBAuth
     auth = SessionDBAuth()
+elif AUTH_TYPE == "session_signed_auth":
+    from api.v1.auth.session_signed_auth import SessionSignedAuth
+    auth = SessionSignedAuth()
+
+if getenv("DB_BGSAVE_SIGNAL", "").lower() in ("1", "true", "yes"):
+    # Backups are for the owner of the process only, never a route
+    from models.bgsave import install_signal_handler
+    install_signal_handler()
 
 
 @ app.errorhandler(404)
@@ -85,6 +102,45 @@ def forbidden_error(error) -> tuple:
     return jsonify({"error": "Forbidden"}), 403
 
 
+# WSGI environ key of the outcome of authenticate(), when the request
+# was authenticated before reaching Flask (see api.v1.asgi)
+AUTH_ENVIRON_KEY = "api.v1.auth"
+
+
+def authenticate(request) -> tuple:
+    """ Authenticate a request
+
+    Args:
+        request (Request): a werkzeug or Flask request object
+
+    Returns:
+        tuple: (None, None) if the path needs no authentication,
+        (401, None) without credentials, (403, None) with wrong ones,
+        else (200, the current user)
+    """
+    if auth is None:
+        return None, None
+
+    with timed("require_auth"):
+        required = auth.require_auth(request.path, EXCLUDED_PATHS)
+    if not required:
+        return None, None
+
+    with timed("authorization_header"):
+        header = auth.authorization_header(request)
+    if header is None:
+        with timed("session_cookie"):
+            cookie = auth.session_cookie(request)
+        if cookie is None:
+            return 401, None
+
+    with timed("current_user"):
+        current_user = auth.current_user(request)
+    if current_user is None:
+        return 403, None
+    return 200, current_user
+
+
 @ app.before_request
 def before_request() -> str:
     """ Before Request Handler
@@ -99,32 +155,26 @@ def before_request() -> str:
     `current_user` attribute of the request object to
     the current user.
 
+    A request already authenticated by the ASGI entry point carries
+    the outcome in its environ, and isn't authenticated again.
+
     Args:
         request (Request): The Flask request object
 
     Returns:
         str: None
     """
-    if auth is None:
-        return
-
-    excluded_paths = ['/api/v1/status/',
-                      '/api/v1/unauthorized/',
-                      '/api/v1/forbidden/',
-                      '/api/v1/auth_session/login/']
-
-    if not auth.require_auth(request.path, excluded_paths):
-        return
-
-    if auth.authorization_header(request) is None \
-            and auth.session_cookie(request) is None:
-        abort(401)
-
-    current_user = auth.current_user(request)
-    if current_user is None:
-        abort(403)
-
-    request.current_user = current_user
+    outcome = request.environ.get(AUTH_ENVIRON_KEY)
+    if outcome is None:
+        # Pick up writes other worker processes made to the store
+        reload_changed()
+        outcome = authenticate(request)
+
+    status, current_user = outcome
+    if status in (401, 403):
+        abort(status)
+    if current_user is not None:
+        request.current_user = current_user
 
 
 if __name__ == "__main__":
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point of the API
+
+Serves the same Flask app, app_views routes and error handlers
+included, from an ASGI server, e.g.:
+
+    uvicorn api.v1.asgi:application --host 0.0.0.0 --port 5000
+
+Connections, request bodies and responses are handled on the event
+loop, so idle and slow clients hold no thread. Each request is first
+authenticated in the auth executor (ASGI_AUTH_WORKERS threads, default
+4), where password hashing and session lookups run, then handled by
+the Flask app in the app executor (ASGI_APP_WORKERS threads, default
+16), where the views and their store writes run. Both are bounded:
+past their size, requests wait on the loop, not in threads.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import asyncio
+import sys
+
+from werkzeug.wrappers import Request
+
+from api.v1.app import AUTH_ENVIRON_KEY, app, authenticate
+from api.v1.env import int_env
+from models.base import reload_changed
+
+
+AUTH_EXECUTOR = ThreadPoolExecutor(int_env("ASGI_AUTH_WORKERS", 4),
+                                   thread_name_prefix="asgi-auth")
+APP_EXECUTOR = ThreadPoolExecutor(int_env("ASGI_APP_WORKERS", 16),
+                                  thread_name_prefix="asgi-app")
+# Largest request body accepted, in bytes
+MAX_BODY = int_env("ASGI_MAX_BODY", 1024 * 1024)
+
+
+def _environ(scope: dict, body: bytes) -> dict:
+    """ Build the WSGI environ of an ASGI HTTP request
+
+    Args:
+        scope (dict): the ASGI connection scope
+        body (bytes): the whole request body
+
+    Returns:
+        dict: the environ, as PEP 3333 describes it
+    """
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8")
+        .decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/{}".format(scope.get("http_version",
+                                                      "1.1")),
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        # The body is read whole: its length is known, chunked or not
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1").upper().replace("-", "_")
+        value = value.decode("latin1")
+        if name == "CONTENT_LENGTH":
+            continue
+        if name == "CONTENT_TYPE":
+            environ[name] = value
+            continue
+        key = "HTTP_{}".format(name)
+        if key in environ:
+            value = "{},{}".format(environ[key], value)
+        environ[key] = value
+    return environ
+
+
+def _authenticate(environ: dict) -> tuple:
+    """ Authenticate a request in the auth executor
+
+    Returns:
+        tuple: the outcome of api.v1.app.authenticate
+    """
+    # Pick up writes other worker processes made to the store
+    reload_changed()
+    return authenticate(Request(environ))
+
+
+def _call_app(environ: dict) -> tuple:
+    """ Run the Flask app on a request in the app executor
+
+    Returns:
+        tuple: (status code, headers, list of body chunks)
+    """
+    response = {}
+    chunks = []
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = headers
+        return chunks.append
+
+    result = app(environ, start_response)
+    try:
+        for chunk in result:
+            if chunk:
+                chunks.append(chunk)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return response["status"], response["headers"], chunks
+
+
+async def _read_body(receive) -> bytes:
+    """ Read the whole request body
+
+    Returns:
+        bytes: the body, None if larger than MAX_BODY
+    """
+    parts = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        body = message.get("body", b"")
+        size += len(body)
+        if size > MAX_BODY:
+            return None
+        parts.append(body)
+        if not message.get("more_body", False):
+            break
+    return b"".join(parts)
+
+
+async def _send_response(send, status: int, headers: list, chunks: list):
+    """ Send a response through ASGI
+    """
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.lower().encode("latin1"), value.encode("latin1"))
+                    for name, value in headers],
+    })
+    await send({"type": "http.response.body", "body": b"".join(chunks)})
+
+
+async def _lifespan(receive, send):
+    """ Handle the lifespan protocol: shut the executors down on exit
+    """
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            AUTH_EXECUTOR.shutdown(wait=False)
+            APP_EXECUTOR.shutdown(wait=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope: dict, receive, send):
+    """ ASGI application of the API
+
+    Args:
+        scope (dict): the ASGI connection scope
+        receive: awaitable returning the next event
+        send: awaitable sending an event
+    """
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        raise ValueError("unsupported ASGI scope {}".format(scope["type"]))
+
+    body = await _read_body(receive)
+    if body is None:
+        await _send_response(send, 413,
+                             [("Content-Type", "application/json")],
+                             [b'{"error": "Payload too large"}\n'])
+        return
+    environ = _environ(scope, body)
+    loop = asyncio.get_running_loop()
+    environ[AUTH_ENVIRON_KEY] = await loop.run_in_executor(
+        AUTH_EXECUTOR, _authenticate, environ)
+    status, headers, chunks = await loop.run_in_executor(
+        APP_EXECUTOR, _call_app, environ)
+    await _send_response(send, status, headers, chunks)
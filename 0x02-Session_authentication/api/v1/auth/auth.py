@@ -2,6 +2,10 @@
 """ Auth module for API authentication """
 from flask import request
 from typing import List, TypeVar
+import os
+
+from api.v1.auth.path_matcher import PathMatcher, compile_paths
+
 
 class Auth:
     """ Class to manage API authentication """
@@ -11,7 +15,8 @@ class Auth:
         Args:
             path (str): The path to check
             excluded_paths (List[str]): List of paths that do not require
-            authentication
+            authentication, or a PathMatcher compiled from it. Paths
+            ending with * exclude every path starting with them.
         Returns:
             bool: True if authentication is required, False otherwise
         """
@@ -21,27 +26,33 @@ class Auth:
         if excluded_paths is None or not excluded_paths:
             return True
 
-        # Add trailing slash to the path if it's not already there
-        if not path.endswith('/'):
-            path += '/'
-
-        for excluded_path in excluded_paths:
-            # Add trailing slash to the excluded path if it's not already there
-            if not excluded_path.endswith('/'):
-                excluded_path += '/'
-            if path == excluded_path:
-                return False
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = compile_paths(tuple(excluded_paths))
 
-        return True
+        return not excluded_paths.match(path)
 
     def authorization_header(self, request=None) -> str:
         """ Method to get the authorization header
         Args:
             request (Request): The Flask request object
         Returns:
-            str: None (for now, will be implemented later)
+            str: The Authorization header, None if missing
         """
-        return None
+        if request is None:
+            return None
+        return request.headers.get('Authorization')
+
+    def session_cookie(self, request=None) -> str:
+        """ Method to get the session cookie
+        Args:
+            request (Request): The Flask request object
+        Returns:
+            str: The value of the cookie named by SESSION_NAME,
+            None if missing
+        """
+        if request is None:
+            return None
+        return request.cookies.get(os.getenv('SESSION_NAME'))
 
     def current_user(self, request=None) -> TypeVar('User'):
         """ Method to get the current user
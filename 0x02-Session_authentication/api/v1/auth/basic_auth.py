@@ -3,15 +3,39 @@
 Definition of class BasicAuth
 """
 import base64
+import hashlib
+import hmac
+import os
 from .auth import Auth
+from .single_flight import SingleFlight
+from .timing import timed
+from .ttl_cache import TTLCache
 from typing import TypeVar
 
+from api.v1.env import float_env, int_env
 from models.user import User
 
 
 class BasicAuth(Auth):
     """ Implement Basic Authorization protocol methods
     """
+    def __init__(self):
+        """
+        Initialize the class
+
+        Sets up the cache of verified credentials, sized by
+        BASIC_AUTH_CACHE_SIZE (default 1024, 0 disables it) with
+        entries living BASIC_AUTH_CACHE_TTL seconds (default 300).
+        Concurrent requests with the same header share one verification.
+        """
+        self.credential_cache = TTLCache(
+            int_env('BASIC_AUTH_CACHE_SIZE', 1024),
+            float_env('BASIC_AUTH_CACHE_TTL', 300))
+        # Cache keys are HMACs of the header under a per-process random
+        # key, so no credential is kept in memory in a usable form
+        self._cache_key = os.urandom(32)
+        self.flights = SingleFlight()
+
     def extract_base64_authorization_header(self, authorization_header: str) -> str:
         """
         Extracts the Base64 part of the
@@ -90,11 +114,14 @@ class BasicAuth(Auth):
         if user_pwd is None or not isinstance(user_pwd, str):
             return None
         try:
-            users = User.search({"email": user_email})
+            with timed("basic.lookup"):
+                users = User.search({"email": user_email})
             if not users or users == []:
                 return None
             for u in users:
-                if u.is_valid_password(user_pwd):
+                with timed("basic.password"):
+                    valid = u.is_valid_password(user_pwd)
+                if valid:
                     return u
             return None
         except Exception:
@@ -109,14 +136,52 @@ class BasicAuth(Auth):
 
         Returns:
             User: The User instance based on a received request
+
+        A header verified before is looked up in credential_cache
+        instead. The entry is used only while its user still exists
+        with the same password hash, so removing a user or changing
+        their password invalidates it. Concurrent calls with the same
+        header wait for the first one and share its User.
         """
         Auth_header = self.authorization_header(request)
-        if Auth_header is not None:
+        if Auth_header is None:
+            return None
+        key = hmac.new(self._cache_key, Auth_header.encode('utf-8'),
+                       hashlib.sha256).digest()
+        return self.flights.do(key, lambda: self._verified_user(
+            Auth_header, key))
+
+    def _verified_user(self, Auth_header: str, key: bytes) -> TypeVar('User'):
+        """
+        Returns the User of an Authorization header, from the cache of
+        verified credentials or by checking them
+
+        Args:
+            Auth_header (str): the Authorization header
+            key (bytes): its key in credential_cache
+
+        Returns:
+            User: the User, None if the credentials are wrong
+        """
+        cached = self.credential_cache.get(key)
+        if cached is not None:
+            user_id, password_hash = cached
+            with timed("basic.cached_user"):
+                user = User.get(user_id)
+            if user is not None and user.password == password_hash:
+                return user
+            self.credential_cache.invalidate(key)
+
+        user = None
+        email = None
+        with timed("basic.decode"):
             token = self.extract_base64_authorization_header(Auth_header)
             if token is not None:
                 decoded = self.decode_base64_authorization_header(token)
                 if decoded is not None:
                     email, pword = self.extract_user_credentials(decoded)
-                    if email is not None:
-                        return self.user_object_from_credentials(email, pword)
-        return
+        if email is not None:
+            user = self.user_object_from_credentials(email, pword)
+        if user is not None:
+            self.credential_cache.set(key, (user.id, user.password))
+        return user
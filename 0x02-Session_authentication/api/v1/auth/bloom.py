@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+""" Module of a Bloom filter of strings
+"""
+import hashlib
+import math
+import threading
+
+
+class BloomFilter:
+    """ Set of strings answering "maybe present" or "surely absent"
+
+    Sized for capacity items at a false positive rate of fp_rate.
+    Items can't be removed: the owner rebuilds a new filter instead.
+    """
+
+    def __init__(self, capacity: int = 100000, fp_rate: float = 0.01):
+        """ Initialize a BloomFilter instance
+        Args:
+            capacity (int): number of items expected
+            fp_rate (float): false positive rate at capacity
+        """
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.size = max(int(-capacity * math.log(fp_rate) / math.log(2) ** 2),
+                        8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, item: str):
+        """ Return the bits of an item, by double hashing one digest
+        """
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        """ Add an item
+        Args:
+            item (str): the item
+        """
+        positions = self._positions(item)
+        with self._lock:
+            for position in positions:
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        """ Tell whether an item may have been added
+        """
+        bits = self._bits
+        for position in self._positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        """ Return the number of items added
+        """
+        return self.count
+
+    def expected_fp_rate(self) -> float:
+        """ Return the false positive rate expected at the current fill
+        """
+        return (1 - math.exp(-self.hashes * self.count / self.size)) \
+            ** self.hashes
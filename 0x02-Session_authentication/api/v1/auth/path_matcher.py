@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+""" Module of precompiled path matching for API authentication
+"""
+from functools import lru_cache
+from typing import List
+import fnmatch
+import re
+
+
+class PathMatcher:
+    """ Set of path patterns compiled for fast matching
+
+    A pattern without wildcard matches exactly, ignoring a trailing
+    slash. A pattern ending with a single * matches every path starting
+    with the rest of it. Other glob patterns (*, ? or [] inside) are
+    merged into one regular expression, checked last.
+    """
+
+    def __init__(self, patterns: List[str]):
+        """ Compile the patterns
+        Args:
+            patterns (List[str]): paths or glob patterns
+        """
+        self.patterns = tuple(patterns)
+        self._exact = set()
+        self._prefixes = set()
+        globs = []
+        for pattern in self.patterns:
+            if not pattern.endswith(('*', '/')):
+                pattern += '/'
+            head = pattern[:-1] if pattern.endswith('*') else pattern
+            if any(c in head for c in '*?['):
+                globs.append(fnmatch.translate(pattern))
+            elif pattern.endswith('*'):
+                self._prefixes.add(head)
+            else:
+                self._exact.add(pattern)
+        # A path is checked against each distinct prefix length once,
+        # so the cost depends on the path, not on the number of prefixes
+        self._prefix_lengths = sorted(set(len(p) for p in self._prefixes))
+        self._glob = re.compile('|'.join(globs)) if globs else None
+
+    def __len__(self) -> int:
+        """ Return the number of patterns
+        """
+        return len(self.patterns)
+
+    def match(self, path: str) -> bool:
+        """ Method to check if a path matches one of the patterns
+        Args:
+            path (str): The path to check
+        Returns:
+            bool: True if the path matches, False otherwise
+        """
+        if not path.endswith('/'):
+            path += '/'
+        if path in self._exact:
+            return True
+        for length in self._prefix_lengths:
+            if length > len(path):
+                break
+            if path[:length] in self._prefixes:
+                return True
+        return self._glob is not None and self._glob.match(path) is not None
+
+
+@lru_cache(maxsize=64)
+def compile_paths(patterns: tuple) -> PathMatcher:
+    """ Return the PathMatcher of a tuple of patterns, compiled once
+    Args:
+        patterns (tuple): paths or glob patterns
+    Returns:
+        PathMatcher: the compiled patterns
+    """
+    return PathMatcher(patterns)
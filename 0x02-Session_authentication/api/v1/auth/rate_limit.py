@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+""" Module of token-bucket rate limiting for login attempts
+
+The same module is in 0x03-user_authentication_service: each project of
+the repository is run on its own, from its own directory, so neither
+can import the other's. Keep both copies in step.
+"""
+from collections import OrderedDict
+import os
+import threading
+import time
+
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+
+class TokenBucketLimiter:
+    """ Token buckets by key, in memory of the process
+
+    Each key gets a bucket of burst tokens, refilled at rate tokens per
+    second; an attempt takes one token from each of its keys. At most
+    maxsize buckets are kept: past it, the least recently used one is
+    dropped, which is the same as a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: int, maxsize: int = 100000):
+        """ Initialize a TokenBucketLimiter instance
+        Args:
+            rate (float): tokens added per second, 0 disables limiting
+            burst (int): capacity of a bucket
+            maxsize (int): most buckets kept
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.maxsize = maxsize
+        # {key: (tokens, time of the last update)}, least recent first
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+        self.evictions = 0
+
+    def acquire(self, *keys) -> float:
+        """ Take a token from the bucket of every key, or from none
+        Args:
+            keys: the keys of the attempt, None ones are ignored
+        Returns:
+            float: 0 if the attempt is allowed, else the seconds until
+            it would be
+        """
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        keys = [key for key in keys if key is not None]
+        with self._lock:
+            levels = []
+            wait = 0.0
+            for key in keys:
+                tokens, last = self._buckets.get(key, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                levels.append(tokens)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / self.rate)
+            if wait > 0:
+                self.limited += 1
+                return wait
+            for key, tokens in zip(keys, levels):
+                self._buckets[key] = (tokens - 1, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+            self.allowed += 1
+            return 0.0
+
+    def stats(self) -> dict:
+        """ Return the size and counters of the limiter
+        """
+        with self._lock:
+            return {
+                "buckets": len(self._buckets),
+                "maxsize": self.maxsize,
+                "allowed": self.allowed,
+                "limited": self.limited,
+                "evictions": self.evictions,
+            }
+
+
+def login_limiter() -> TokenBucketLimiter:
+    """ Return a limiter of login attempts configured by the environment
+
+    Limiting is off unless LOGIN_RATE_PER_MINUTE is set (0 for no
+    limit). That rate and LOGIN_BURST (default 10) apply to each client
+    IP and to each email; LOGIN_MAX_BUCKETS (default 100000) bounds the
+    memory used. Behind a reverse proxy, every client has the IP of the
+    proxy: set TRUSTED_PROXIES, see trust_proxies().
+    """
+    try:
+        rate = float(os.getenv('LOGIN_RATE_PER_MINUTE', 0)) / 60
+    except ValueError:
+        rate = 0
+    try:
+        burst = int(os.getenv('LOGIN_BURST', 10))
+    except ValueError:
+        burst = 10
+    try:
+        maxsize = int(os.getenv('LOGIN_MAX_BUCKETS', 100000))
+    except ValueError:
+        maxsize = 100000
+    return TokenBucketLimiter(rate, burst, maxsize)
+
+
+def trust_proxies(wsgi_app):
+    """ Wrap a WSGI app so the client IP is read from X-Forwarded-For
+
+    TRUSTED_PROXIES (default 0) is the number of reverse proxies in
+    front of the app: the address that many hops back in the header
+    becomes request.remote_addr. Without it the header is ignored, as
+    any client can send it.
+
+    Args:
+        wsgi_app: the WSGI app
+
+    Returns:
+        the app itself if no proxy is trusted, else the wrapped app
+    """
+    try:
+        proxies = int(os.getenv('TRUSTED_PROXIES', 0))
+    except ValueError:
+        proxies = 0
+    if proxies <= 0:
+        return wsgi_app
+    return ProxyFix(wsgi_app, x_for=proxies)
@@ -2,13 +2,215 @@
 """ Module of Session Authentication
 """
 from api.v1.auth.auth import Auth
+from api.v1.auth.bloom import BloomFilter
+from api.v1.auth.single_flight import SingleFlight
+from api.v1.auth.session_store import (
+    CompactSessionStore,
+    MemorySessionStore,
+    session_store
+)
+from api.v1.auth.timing import timed
+from api.v1.env import float_env, int_env
 from models.user import User
+import os
+import threading
+import time
 import uuid
 
 
 class SessionAuth(Auth):
     """Session Authentication Class"""
-    user_id_by_session_id = {}
+    # Shared by every thread serving requests; held for any change to
+    # user_id_by_session_id and for any walk over it.
+    _session_lock = threading.RLock()
+
+    def __init__(self):
+        """
+        Initialize the class
+
+        Unknown Session IDs are rejected by a Bloom filter of the live
+        ones before any store lookup. It's sized for
+        SESSION_FILTER_CAPACITY sessions (default 100000) at a false
+        positive rate of SESSION_FILTER_FP_RATE (default 0.01), and
+        rebuilt every SESSION_FILTER_REBUILD_INTERVAL seconds (default
+        300) to forget destroyed sessions. Rebuilds run in a thread of
+        their own, never in a request: until the first build, and while
+        a rebuild for sessions created elsewhere is running, every
+        Session ID is looked up. SESSION_FILTER=0 disables it; it's
+        also off when sessions live in a store other processes write
+        to, as it would reject their sessions.
+
+        Concurrent requests with the same Session ID share one lookup.
+
+        Sessions are kept in the backend chosen by SESSION_STORE, see
+        api.v1.auth.session_store, opened here rather than on import.
+        """
+        self.user_id_by_session_id = session_store()
+        self.filter_enabled = os.getenv('SESSION_FILTER', '1').lower() \
+            not in ('0', 'false', 'no')
+        self.filter_capacity = int_env('SESSION_FILTER_CAPACITY', 100000)
+        self.filter_fp_rate = float_env('SESSION_FILTER_FP_RATE', 0.01)
+        self.filter_rebuild_interval = \
+            int_env('SESSION_FILTER_REBUILD_INTERVAL', 300)
+        self._session_filter = None
+        self._filter_built_at = 0.0
+        self._filter_version = None
+        self._filter_lock = threading.Lock()
+        # Running rebuild thread, and the sessions created since it began
+        self._filter_rebuilder = None
+        self._filter_pending = None
+        self.filter_checks = 0
+        self.filter_rejected = 0
+        self.filter_false_positives = 0
+        self.flights = SingleFlight()
+
+    def _filter_usable(self) -> bool:
+        """
+        Tells whether every live session is known to this process, so
+        the Bloom filter can be trusted
+        """
+        return self.filter_enabled and \
+            isinstance(self.user_id_by_session_id,
+                       (MemorySessionStore, CompactSessionStore))
+
+    def _live_session_ids(self) -> list:
+        """
+        Returns the IDs of the live sessions, to rebuild the filter from
+        """
+        with self._session_lock:
+            return list(self.user_id_by_session_id)
+
+    def _sessions_version(self):
+        """
+        Returns a value that changes when sessions are created outside
+        of this instance, None if that can't happen
+        """
+        return None
+
+    def _start_rebuild(self):
+        """
+        Start a rebuild of the Bloom filter, unless one is running.
+        The caller holds _filter_lock
+        """
+        if self._filter_rebuilder is not None:
+            return
+        self._filter_pending = []
+        self._filter_rebuilder = threading.Thread(
+            target=self._rebuild_filter, daemon=True)
+        self._filter_rebuilder.start()
+
+    def _rebuild_filter(self):
+        """
+        Build a Bloom filter of the live sessions and swap it in, in the
+        rebuild thread. Sessions created meanwhile were queued by
+        _remember_session and are added before the swap
+        """
+        try:
+            version = self._sessions_version()
+            session_ids = self._live_session_ids()
+            session_filter = BloomFilter(
+                max(self.filter_capacity, 2 * len(session_ids)),
+                self.filter_fp_rate)
+            for session_id in session_ids:
+                session_filter.add(session_id)
+            with self._filter_lock:
+                for session_id in self._filter_pending:
+                    session_filter.add(session_id)
+                self._session_filter = session_filter
+                self._filter_built_at = time.monotonic()
+                self._filter_version = version
+        finally:
+            with self._filter_lock:
+                self._filter_pending = None
+                self._filter_rebuilder = None
+
+    def wait_filter(self, timeout: float = None) -> bool:
+        """
+        Wait for the running rebuild of the Bloom filter, if any
+
+        Args:
+            timeout (float): most seconds to wait, None for no limit
+
+        Returns:
+            bool: True if no rebuild is running anymore
+        """
+        with self._filter_lock:
+            rebuilder = self._filter_rebuilder
+        if rebuilder is not None:
+            rebuilder.join(timeout)
+            return not rebuilder.is_alive()
+        return True
+
+    def _remember_session(self, session_id: str):
+        """
+        Add a new Session ID to the Bloom filter, if built, and to the
+        one being rebuilt
+
+        Args:
+            session_id (str): session ID
+        """
+        with self._filter_lock:
+            if self._session_filter is not None:
+                self._session_filter.add(session_id)
+            if self._filter_pending is not None:
+                self._filter_pending.append(session_id)
+
+    def session_may_exist(self, session_id: str) -> bool:
+        """
+        Tells whether a Session ID may be a live session
+
+        Args:
+            session_id (str): session ID
+
+        Returns:
+            False if the session surely doesn't exist, True otherwise
+        """
+        if not self._filter_usable():
+            return True
+        version = self._sessions_version()
+        with self._filter_lock:
+            session_filter = self._session_filter
+            # Sessions created elsewhere since the last build may be
+            # missing from it: let the store answer until rebuilt
+            current = session_filter is not None and \
+                self._filter_version == version
+            if not current or time.monotonic() - self._filter_built_at >= \
+                    self.filter_rebuild_interval:
+                self._start_rebuild()
+            if not current:
+                return True
+            self.filter_checks += 1
+        if session_id in session_filter:
+            return True
+        with self._filter_lock:
+            self.filter_rejected += 1
+        return False
+
+    def filter_metrics(self) -> dict:
+        """
+        Returns the state and counters of the Bloom filter
+
+        Returns:
+            dict: sessions in the filter, its size, the false positive
+            rate expected from its fill and the one observed: IDs that
+            passed it but had no live session, among all such IDs
+        """
+        with self._filter_lock:
+            session_filter = self._session_filter
+            unknown = self.filter_rejected + self.filter_false_positives
+            return {
+                "enabled": self._filter_usable(),
+                "sessions": len(session_filter) if session_filter else 0,
+                "bits": session_filter.size if session_filter else 0,
+                "hashes": session_filter.hashes if session_filter else 0,
+                "checks": self.filter_checks,
+                "rejected": self.filter_rejected,
+                "false_positives": self.filter_false_positives,
+                "expected_fp_rate": session_filter.expected_fp_rate()
+                if session_filter else 0.0,
+                "observed_fp_rate": self.filter_false_positives / unknown
+                if unknown else 0.0,
+            }
 
     def create_session(self, user_id: str = None) -> str:
         """
@@ -25,7 +227,9 @@ class SessionAuth(Auth):
 
         session_id = str(uuid.uuid4())
 
-        self.user_id_by_session_id[session_id] = user_id
+        with self._session_lock:
+            self.user_id_by_session_id[session_id] = user_id
+        self._remember_session(session_id)
 
         return session_id
 
@@ -53,15 +257,41 @@ class SessionAuth(Auth):
 
         Returns:
             User instance or None if session_id is None
+
+        Concurrent calls for the same Session ID wait for the first
+        one and share its User.
         """
         session_id = self.session_cookie(request)
 
         if session_id is None:
             return None
 
-        user_id = self.user_id_for_session_id(session_id)
+        return self.flights.do(session_id,
+                               lambda: self._user_for_session(session_id))
+
+    def _user_for_session(self, session_id: str):
+        """
+        Returns the User of a Session ID
+
+        Args:
+            session_id (str): session ID
+
+        Returns:
+            User instance or None
+        """
+        with timed("session.filter"):
+            may_exist = self.session_may_exist(session_id)
+        if not may_exist:
+            return None
 
-        return User.get(user_id)
+        with timed("session.lookup"):
+            user_id = self.user_id_for_session_id(session_id)
+        if user_id is None and self._filter_usable():
+            with self._filter_lock:
+                self.filter_false_positives += 1
+
+        with timed("session.user"):
+            return User.get(user_id)
 
     def destroy_session(self, request=None):
         """
@@ -85,9 +315,41 @@ class SessionAuth(Auth):
         if not user_id:
             return False
 
-        try:
-            del self.user_id_by_session_id[session_id]
-        except Exception:
-            pass
+        with self._session_lock:
+            self._drop_session(session_id)
 
         return True
+
+    def destroy_user_sessions(self, user_id: str) -> int:
+        """
+        Deletes every session of a user / logout everywhere
+
+        The sessions are found through the index by user of the store,
+        in time proportional to their number.
+
+        Args:
+            user_id (str): user id
+
+        Returns:
+            the number of sessions deleted
+        """
+        if user_id is None:
+            return 0
+        removed = 0
+        with self._session_lock:
+            for session_id in self.user_id_by_session_id.sessions_of(user_id):
+                if self._drop_session(session_id) is not None:
+                    removed += 1
+        return removed
+
+    def _drop_session(self, session_id: str):
+        """
+        Forget a session. The caller holds _session_lock
+
+        Args:
+            session_id (str): session ID
+
+        Returns:
+            the removed session value, None if unknown
+        """
+        return self.user_id_by_session_id.pop(session_id, None)
@@ -2,7 +2,17 @@
 """
 Define class SessionDButh
 """
+from datetime import (
+    datetime,
+    timedelta
+)
+import threading
+import time
+
 from .session_exp_auth import SessionExpAuth
+from .ttl_cache import TTLCache
+from api.v1.env import int_env
+from models.base import LOADS
 from models.user_session import UserSession
 
 
@@ -12,6 +22,162 @@ class SessionDBAuth(SessionExpAuth):
     in a database
     """
 
+    def __init__(self):
+        """
+        Initialize the class
+
+        Loads the stored sessions, then keeps the recently used ones in
+        a read-through cache of SESSION_CACHE_SIZE entries (default
+        1024, 0 to disable). An entry lives until its session expires,
+        and the cache is cleared whenever the sessions are reloaded
+        because another process changed the session file, so sessions
+        it destroyed aren't served from it. Writes of this process
+        invalidate their own entries and keep the others.
+
+        When sessions expire, a background thread deletes the expired
+        UserSession records every SESSION_GC_INTERVAL seconds (default
+        3600, 0 to only collect on demand with collect_expired()).
+        stop_sweeper() stops it as well.
+
+        A session expires SESSION_DURATION seconds after the updated_at
+        of its record. With SESSION_SLIDING, refreshes are kept in
+        memory and written together, in one save of the session file
+        at most once per SESSION_REFRESH_INTERVAL seconds.
+        """
+        super().__init__()
+        UserSession.load_from_file()
+        self.session_cache = TTLCache(int_env('SESSION_CACHE_SIZE', 1024))
+        self._cache_loads = LOADS.get(UserSession.__name__)
+        self.gc_interval = int_env('SESSION_GC_INTERVAL', 3600)
+        self.collected_count = 0
+        # Refreshes not written yet, {session ID: date of last use}
+        self._pending_refresh = {}
+        self._last_flush = time.monotonic()
+        self._collector = None
+        if self.session_duration > 0 and self.gc_interval > 0:
+            self._collector = threading.Thread(target=self._collect_loop,
+                                               daemon=True)
+            self._collector.start()
+
+    def _filter_usable(self) -> bool:
+        """
+        Tells whether the Bloom filter can be trusted: UserSession
+        records are reloaded when other processes write them, and
+        _sessions_version tells when that happened
+        """
+        return self.filter_enabled
+
+    def _live_session_ids(self) -> list:
+        """
+        Returns the IDs of the stored sessions
+        """
+        return [user_session.session_id
+                for user_session in UserSession.all()]
+
+    def _sessions_version(self):
+        """
+        Returns the number of loads of the UserSession records, which
+        changes when other processes wrote them
+        """
+        return LOADS.get(UserSession.__name__)
+
+    def _remember_session(self, session_id: str):
+        """
+        Does nothing: create_session adds a new session to the Bloom
+        filter once its record is saved, so a rebuild reading the
+        records in between doesn't miss it
+        """
+
+    def _collect_loop(self):
+        """
+        Body of the collector thread
+        """
+        while not self._sweeper_stop.wait(self.gc_interval):
+            try:
+                self.collect_expired()
+            except Exception:
+                # A failed run is retried at the next interval
+                pass
+
+    def collect_expired(self) -> int:
+        """
+        Delete the expired UserSession records
+
+        They are found through the updated_at index, then removed with
+        a single rewrite of the session file, which reclaims their space.
+        Pending refreshes are written first, so no active session is
+        collected.
+
+        Returns:
+            int: the number of records deleted
+        """
+        if self.session_duration <= 0:
+            return 0
+        self.flush_refreshes()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.session_duration)
+        expired = UserSession.query({"updated_at": {"lt": cutoff}})
+        removed = UserSession.remove_many([s.id for s in expired])
+        for user_session in expired:
+            self.session_cache.invalidate(user_session.session_id)
+        with self._session_lock:
+            self.collected_count += removed
+        return removed
+
+    def flush_refreshes(self) -> int:
+        """
+        Write the pending sliding-expiration refreshes
+
+        The updated_at of every refreshed UserSession is set to its last
+        use, then all of them are saved with a single write. Sessions
+        deleted meanwhile, by this process or another one, stay deleted.
+
+        Returns:
+            int: the number of records written
+        """
+        with self._session_lock:
+            pending = self._pending_refresh
+            self._pending_refresh = {}
+            self._last_flush = time.monotonic()
+        user_sessions = []
+        for session_id, last_use in pending.items():
+            for user_session in UserSession.search(
+                    {"session_id": session_id}):
+                if user_session.updated_at < last_use:
+                    user_session.updated_at = last_use
+                    user_sessions.append(user_session)
+        return UserSession.save_many(user_sessions, existing_only=True)
+
+    def _refresh(self, session_id: str, user_id: str, now: datetime):
+        """
+        Record the use of a sliding session, and write the pending
+        refreshes if the last write is older than refresh_interval
+        Args:
+            session_id (str): session ID
+            user_id (str): user ID of the session
+            now (datetime): date of the use, in UTC
+        """
+        with self._session_lock:
+            self._pending_refresh[session_id] = now
+            due = time.monotonic() - self._last_flush >= \
+                self.refresh_interval
+        ttl = self.session_duration
+        self.session_cache.set(session_id, (user_id, now), ttl)
+        if due:
+            self.flush_refreshes()
+
+    def session_metrics(self) -> dict:
+        """
+        Returns counters of the sessions
+
+        Returns:
+            dict: the counters of SessionExpAuth, plus the number of
+            stored sessions and of expired records deleted
+        """
+        metrics = super().session_metrics()
+        metrics["stored"] = UserSession.count()
+        metrics["collected"] = self.collected_count
+        return metrics
+
     def create_session(self, user_id=None):
         """
         Create a Session ID for a user_id
@@ -27,20 +193,91 @@ class SessionDBAuth(SessionExpAuth):
         }
         user = UserSession(**kw)
         user.save()
+        super()._remember_session(session_id)
         return session_id
 
+    def _session_details(self, session_id: str):
+        """
+        Returns the user ID and last use of a session, read through
+        the cache
+        Args:
+            session_id (str): session ID
+        Return:
+            tuple (user_id, last use in UTC) or None if there is no session
+        """
+        loads = LOADS.get(UserSession.__name__)
+        if loads != self._cache_loads:
+            self.session_cache.clear()
+            self._cache_loads = loads
+        details = self.session_cache.get(session_id)
+        if details is not None:
+            return details
+        user_sessions = UserSession.search({"session_id": session_id})
+        if not user_sessions:
+            return None
+        last_use = user_sessions[0].updated_at
+        with self._session_lock:
+            pending = self._pending_refresh.get(session_id)
+        if pending is not None and pending > last_use:
+            last_use = pending
+        details = (user_sessions[0].user_id, last_use)
+        ttl = None
+        if self.session_duration > 0:
+            expires_at = details[1] + \
+                timedelta(seconds=self.session_duration)
+            ttl = (expires_at - datetime.utcnow()).total_seconds()
+            if ttl <= 0:
+                return details
+        self.session_cache.set(session_id, details, ttl)
+        return details
+
     def user_id_for_session_id(self, session_id=None):
         """
         Returns a user ID based on a session ID
         Args:
             session_id (str): session ID
         Return:
-            user id or None if session_id is None or not a string
+            user id or None if session_id is None, unknown or expired
         """
-        user_id = UserSession.search({"session_id": session_id})
-        if user_id:
+        if session_id is None:
+            return None
+        details = self._session_details(session_id)
+        if details is None:
+            return None
+        user_id, last_use = details
+        if self.session_duration <= 0:
             return user_id
-        return None
+        allowed_window = last_use + timedelta(seconds=self.session_duration)
+        now = datetime.utcnow()
+        if allowed_window < now:
+            return None
+        if self._needs_refresh(last_use, now):
+            self._refresh(session_id, user_id, now)
+        return user_id
+
+    def destroy_user_sessions(self, user_id: str) -> int:
+        """
+        Deletes every session of a user / logout everywhere
+
+        Their UserSession records are found through the user_id hash
+        index and removed with a single write of the session file.
+
+        Args:
+            user_id (str): user id
+
+        Returns:
+            the number of UserSession records deleted
+        """
+        super().destroy_user_sessions(user_id)
+        if user_id is None:
+            return 0
+        user_sessions = UserSession.search({"user_id": user_id})
+        with self._session_lock:
+            for user_session in user_sessions:
+                self._pending_refresh.pop(user_session.session_id, None)
+        for user_session in user_sessions:
+            self.session_cache.invalidate(user_session.session_id)
+        return UserSession.remove_many([s.id for s in user_sessions])
 
     def destroy_session(self, request=None):
         """
@@ -52,6 +289,10 @@ class SessionDBAuth(SessionExpAuth):
         session_id = self.session_cookie(request)
         if not session_id:
             return False
+        self.session_cache.invalidate(session_id)
+        with self._session_lock:
+            self._drop_session(session_id)
+            self._pending_refresh.pop(session_id, None)
         user_session = UserSession.search({"session_id": session_id})
         if user_session:
             user_session[0].remove()
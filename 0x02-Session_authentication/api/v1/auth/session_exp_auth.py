@@ -3,12 +3,14 @@
 Define SessionExpAuth class
 """
 import os
+import threading
 from datetime import (
     datetime,
     timedelta
 )
 
 from .session_auth import SessionAuth
+from api.v1.env import int_env
 
 
 class SessionExpAuth(SessionAuth):
@@ -23,17 +25,143 @@ class SessionExpAuth(SessionAuth):
         Sets the session duration based on the value of the
         SESSION_DURATION environment variable.
 
+        SESSION_MAX_COUNT (default 0, no limit) caps the number of
+        sessions kept: past it, the least recently used session is
+        evicted. When sessions expire, a background thread removes
+        them every SESSION_SWEEP_INTERVAL seconds (default 60, 0 to
+        only sweep on demand with sweep_expired()).
+
+        With SESSION_SLIDING set (1, true or yes), a session expires
+        SESSION_DURATION seconds after its last use instead of its
+        creation. The last use is recorded at most once every
+        SESSION_REFRESH_INTERVAL seconds (default 60) per session, so
+        most requests don't write to the store.
+
         Args:
             None
 
         Returns:
             None
         """
-        try:
-            duration = int(os.getenv('SESSION_DURATION'))
-        except Exception:
-            duration = 0
-        self.session_duration = duration
+        super().__init__()
+        self.session_duration = int_env('SESSION_DURATION')
+        self.max_sessions = int_env('SESSION_MAX_COUNT')
+        self.sweep_interval = int_env('SESSION_SWEEP_INTERVAL', 60)
+        self.sliding = os.getenv('SESSION_SLIDING', '').lower() in \
+            ('1', 'true', 'yes')
+        self.refresh_interval = int_env('SESSION_REFRESH_INTERVAL', 60)
+        self.expired_count = 0
+        self.evicted_count = 0
+        self._sweeper_stop = threading.Event()
+        self._sweeper = None
+        if self.session_duration > 0 and self.sweep_interval > 0:
+            self._sweeper = threading.Thread(target=self._sweep_loop,
+                                             daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        """
+        Body of the sweeper thread
+        """
+        while not self._sweeper_stop.wait(self.sweep_interval):
+            self.sweep_expired()
+
+    def stop_sweeper(self):
+        """
+        Stop the background sweeper thread, if running
+        """
+        self._sweeper_stop.set()
+
+    def _expires_at(self, session_dictionary: dict) -> float:
+        """
+        Returns the expiry timestamp of a session
+
+        Args:
+            session_dictionary (dict): the session details
+
+        Returns:
+            float: POSIX timestamp
+        """
+        return self._last_active(session_dictionary).timestamp() + \
+            self.session_duration
+
+    def _last_active(self, session_dictionary: dict) -> datetime:
+        """
+        Returns the date the lifetime of a session counts from: its
+        last refresh, or its creation
+
+        Args:
+            session_dictionary (dict): the session details
+
+        Returns:
+            datetime: the date
+        """
+        return session_dictionary.get("refreshed_at") or \
+            session_dictionary.get("created_at")
+
+    def _needs_refresh(self, last_active: datetime, now: datetime) -> bool:
+        """
+        Tells whether a sliding session is due a refresh, which happens
+        at most once per refresh_interval
+
+        Args:
+            last_active (datetime): last refresh or creation
+            now (datetime): current date, in the same time zone
+
+        Returns:
+            bool: True if its last use should be recorded
+        """
+        return self.sliding and self.session_duration > 0 and \
+            (now - last_active).total_seconds() >= self.refresh_interval
+
+    def sweep_expired(self) -> int:
+        """
+        Remove the expired sessions
+
+        Only the sessions whose expiry check the store has due are
+        read, in one batch, so the cost is proportional to the number
+        of sessions expired since the last sweep.
+
+        Returns:
+            int: the number of sessions removed
+        """
+        if self.session_duration <= 0:
+            return 0
+        now = datetime.now().timestamp()
+        removed = 0
+        with self._session_lock:
+            due = self.user_id_by_session_id.due(now)
+            found = self.user_id_by_session_id.get_many(due)
+            for session_id in due:
+                details = found.get(session_id)
+                if not isinstance(details, dict):
+                    continue
+                expires_at = self._expires_at(details)
+                if expires_at > now:
+                    # Renewed since it was scheduled
+                    self.user_id_by_session_id.schedule(session_id,
+                                                        expires_at)
+                    continue
+                self._drop_session(session_id)
+                removed += 1
+            self.expired_count += removed
+        return removed
+
+    def session_metrics(self) -> dict:
+        """
+        Returns counters of the sessions kept in memory
+
+        Returns:
+            dict: live sessions, sessions removed as expired,
+            sessions evicted over max_sessions, and the cap
+        """
+        with self._session_lock:
+            return {
+                "live": len(self.user_id_by_session_id),
+                "expired": self.expired_count,
+                "evicted": self.evicted_count,
+                "max_sessions": self.max_sessions,
+            }
 
     def create_session(self, user_id=None):
         """
@@ -52,7 +180,16 @@ class SessionExpAuth(SessionAuth):
             "user_id": user_id,
             "created_at": datetime.now()
         }
-        self.user_id_by_session_id[session_id] = session_dictionary
+        with self._session_lock:
+            self.user_id_by_session_id[session_id] = session_dictionary
+            if self.session_duration > 0:
+                self.user_id_by_session_id.schedule(
+                    session_id, self._expires_at(session_dictionary))
+            while self.max_sessions > 0 and \
+                    len(self.user_id_by_session_id) > self.max_sessions:
+                oldest = self.user_id_by_session_id.oldest()
+                self._drop_session(oldest)
+                self.evicted_count += 1
         return session_id
 
     def user_id_for_session_id(self, session_id=None):
@@ -67,15 +204,33 @@ class SessionExpAuth(SessionAuth):
         """
         if session_id is None:
             return None
-        user_details = self.user_id_by_session_id.get(session_id)
-        if user_details is None:
-            return None
+        with self._session_lock:
+            user_details = self.user_id_by_session_id.get(session_id)
+            if user_details is None:
+                return None
+            if self.max_sessions > 0:
+                # Only the eviction order needs it, and it's a write
+                self.user_id_by_session_id.touch(session_id)
         if "created_at" not in user_details.keys():
             return None
         if self.session_duration <= 0:
             return user_details.get("user_id")
-        created_at = user_details.get("created_at")
-        allowed_window = created_at + timedelta(seconds=self.session_duration)
-        if allowed_window < datetime.now():
+        last_active = self._last_active(user_details)
+        allowed_window = last_active + timedelta(seconds=self.session_duration)
+        now = datetime.now()
+        if allowed_window < now:
+            with self._session_lock:
+                if self.user_id_by_session_id.get(session_id) == \
+                        user_details:
+                    self._drop_session(session_id)
+                    self.expired_count += 1
             return None
+        if self._needs_refresh(last_active, now):
+            with self._session_lock:
+                if self.user_id_by_session_id.get(session_id) == \
+                        user_details:
+                    user_details = dict(user_details, refreshed_at=now)
+                    self.user_id_by_session_id[session_id] = user_details
+            # The expiry check is scheduled again when the sweep
+            # finds the session renewed
         return user_details.get("user_id")
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Define SessionSignedAuth class
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import time
+
+from .session_auth import SessionAuth
+
+
+def _b64encode(data: bytes) -> str:
+    """
+    Encode bytes in URL-safe base64 without padding
+    """
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    """
+    Decode URL-safe base64 written by _b64encode()
+
+    Raises:
+        ValueError: if data isn't valid base64
+    """
+    try:
+        return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+    except (binascii.Error, UnicodeEncodeError) as e:
+        raise ValueError(str(e))
+
+
+def _parse_keys(value: str) -> list:
+    """
+    Parse the signing keys of SESSION_SECRET_KEYS
+
+    A key is identified in tokens by the first 8 bytes of the SHA-256
+    of its secret, in hex: the ID never holds a dot, and stays the same
+    whatever the position of the key in the list.
+
+    Args:
+        value (str): comma separated secrets, taken whole
+
+    Returns:
+        list: (key ID, secret) pairs, in the given order
+    """
+    keys = []
+    for item in value.split(","):
+        item = item.strip()
+        if item == "":
+            continue
+        secret = item.encode()
+        keys.append((hashlib.sha256(secret).hexdigest()[:16], secret))
+    return keys
+
+
+class SessionSignedAuth(SessionAuth):
+    """
+    Definition of SessionSignedAuth class whose Session IDs are
+    self-contained tokens: the user ID and the expiry, signed with
+    HMAC-SHA256. Nothing is stored on the server, so any process
+    holding the keys verifies a token with no lookup.
+
+    A token is `<key ID>.<user ID>.<expiry>.<signature>`, user ID and
+    signature in URL-safe base64. Destroying a session can't revoke its
+    token: it stays valid until it expires, so the logout response
+    clears the cookie and SESSION_DURATION should be kept short.
+    """
+    def __init__(self):
+        """
+        Initialize the class
+
+        SESSION_SECRET_KEYS lists the signing secrets, comma
+        separated. The first one signs new tokens, all of them verify
+        tokens, so a key is rotated by putting the new one first and
+        dropping the old one once its tokens expired. It must be set:
+        every process serving the API needs the same keys.
+
+        SESSION_DURATION (seconds, default 3600) sets the lifetime of
+        tokens. A token can't be revoked, so it must be positive.
+
+        Raises:
+            ValueError: if SESSION_SECRET_KEYS is missing or empty, or
+            SESSION_DURATION isn't a positive integer
+        """
+        super().__init__()
+        # Tokens are checked without any store, there's nothing to filter
+        self.filter_enabled = False
+        duration = os.getenv("SESSION_DURATION", "3600")
+        try:
+            self.session_duration = int(duration)
+        except ValueError:
+            self.session_duration = 0
+        if self.session_duration <= 0:
+            raise ValueError("SESSION_DURATION must be a positive number "
+                             "of seconds, not {!r}".format(duration))
+        keys = _parse_keys(os.getenv("SESSION_SECRET_KEYS", ""))
+        if len(keys) == 0:
+            raise ValueError("SESSION_SECRET_KEYS must list the keys "
+                             "signing session tokens")
+        # Keyed HMAC states, copied for each token rather than rekeyed
+        self._signers = {key_id: hmac.new(secret, digestmod=hashlib.sha256)
+                         for key_id, secret in keys}
+        self.signing_key_id = keys[0][0]
+
+    def _signature(self, key_id: str, payload: str) -> str:
+        """
+        Sign a payload with a key
+
+        Args:
+            key_id (str): ID of the key
+            payload (str): the signed part of the token
+
+        Returns:
+            str: the signature in URL-safe base64
+        """
+        signer = self._signers[key_id].copy()
+        signer.update(payload.encode())
+        return _b64encode(signer.digest())
+
+    def create_session(self, user_id: str = None) -> str:
+        """
+        Create a signed Session ID for a user_id
+
+        Args:
+            user_id (str): user id
+
+        Returns:
+            Session ID in string format or None if user_id is None or
+            not a string
+        """
+        if user_id is None or not isinstance(user_id, str):
+            return None
+        expires = int(time.time()) + self.session_duration
+        payload = "{}.{}.{}".format(self.signing_key_id,
+                                    _b64encode(user_id.encode()), expires)
+        return "{}.{}".format(payload,
+                              self._signature(self.signing_key_id, payload))
+
+    def user_id_for_session_id(self, session_id: str = None) -> str:
+        """
+        Returns the user ID a Session ID was signed for
+
+        Args:
+            session_id (str): session ID
+
+        Returns:
+            user id or None if session_id is None, not an ASCII string,
+            not signed by a known key or expired
+        """
+        if session_id is None or not isinstance(session_id, str):
+            return None
+        # Tokens are ASCII; compare_digest refuses other strings
+        if not session_id.isascii():
+            return None
+        payload, sep, signature = session_id.rpartition(".")
+        parts = payload.split(".")
+        if not sep or len(parts) != 3:
+            return None
+        key_id, user_id, expires = parts
+        if key_id not in self._signers:
+            return None
+        if not hmac.compare_digest(self._signature(key_id, payload),
+                                   signature):
+            return None
+        try:
+            expires = int(expires)
+            user_id = _b64decode(user_id).decode()
+        except ValueError:
+            return None
+        if expires < time.time():
+            return None
+        return user_id
+
+    def destroy_user_sessions(self, user_id: str) -> int:
+        """
+        Deletes every session of a user: signed tokens aren't stored,
+        so there is none to delete
+
+        Args:
+            user_id (str): user id
+
+        Returns:
+            0
+        """
+        return 0
+
+    def destroy_session(self, request=None):
+        """
+        Ends a session / logout
+
+        Args:
+            request : request object containing cookie
+
+        Returns:
+            True if the session cookie holds a valid token, False
+            otherwise
+        """
+        if request is None:
+            return False
+        return self.user_id_for_session_id(self.session_cookie(request)) \
+            is not None
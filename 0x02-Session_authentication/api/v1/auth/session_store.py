@@ -0,0 +1,719 @@
+#!/usr/bin/env python3
+""" Module of the session stores used by SessionAuth
+
+SESSION_STORE selects the backend:
+- memory (default): a dict private to the process
+- compact: like memory, in a fraction of the space, for millions of
+  sessions per process
+- sqlite: a SQLite file in WAL mode (SESSION_STORE_PATH, default
+  .db_sessions.sqlite3) shared by every process of the host, so a
+  session created by one worker is known to the others
+"""
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterable
+import heapq
+import json
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from api.v1.env import int_env
+
+
+class SessionStore(MutableMapping):
+    """ Mapping of session IDs to session values
+
+    Iteration goes from the least to the most recently used session,
+    as marked by touch(). Values are user IDs or dictionaries of JSON
+    values and datetimes.
+
+    The store also keeps the schedule of expiry checks of its sessions,
+    see schedule() and due(). The caller serializes changes to it.
+    """
+
+    def __init__(self):
+        """ Initialize a SessionStore instance
+        """
+        # Min-heap of (expiry timestamp, session ID). Entries of
+        # sessions removed meanwhile are returned by due() all the same
+        self._expiry_heap = []
+
+    def schedule(self, session_id: str, expires: float):
+        """ Plan an expiry check of a session
+        Args:
+            session_id (str): session ID
+            expires (float): POSIX timestamp the check is due at
+        """
+        heapq.heappush(self._expiry_heap, (expires, session_id))
+
+    def due(self, now: float) -> list:
+        """ Return the sessions whose expiry check is due, forgetting
+        those checks
+        Args:
+            now (float): POSIX timestamp
+        Returns:
+            list: session IDs, some of which may no longer exist
+        """
+        heap = self._expiry_heap
+        due = []
+        while heap and heap[0][0] <= now:
+            due.append(heapq.heappop(heap)[1])
+        return due
+
+    def get_many(self, session_ids: Iterable[str]) -> dict:
+        """ Return the values of several sessions at once
+        Args:
+            session_ids (Iterable[str]): session IDs
+        Returns:
+            dict: values of the sessions found, by session ID
+        """
+        found = {}
+        for session_id in session_ids:
+            value = self.get(session_id)
+            if value is not None:
+                found[session_id] = value
+        return found
+
+    def touch(self, session_id: str):
+        """ Mark a session as the most recently used one
+
+        This default stores the value of the session again, which makes
+        it the last one iterated over in a store kept in insertion order.
+        Args:
+            session_id (str): session ID
+        """
+        value = self.get(session_id)
+        if value is not None:
+            self[session_id] = value
+
+    def oldest(self) -> str:
+        """ Return the least recently used session
+        Returns:
+            str: session ID, None if there is no session
+        """
+        return next(iter(self), None)
+
+    def sessions_of(self, user_id: str) -> list:
+        """ Return the IDs of the sessions of a user
+
+        This default scans every session; stores override it with a
+        lookup in time proportional to the user's sessions.
+        Args:
+            user_id (str): user ID
+        Returns:
+            list: session IDs
+        """
+        return [session_id for session_id, value in self.items()
+                if _user_of(value) == user_id]
+
+
+def _user_of(value) -> str:
+    """ Return the user ID of a session value
+    """
+    if isinstance(value, dict):
+        return value.get("user_id")
+    return value
+
+
+class MemorySessionStore(SessionStore):
+    """ Session store private to the process
+    """
+
+    def __init__(self):
+        """ Initialize a MemorySessionStore instance
+        """
+        super().__init__()
+        self._sessions = OrderedDict()
+        # {user ID: {session ID: None}}
+        self._by_user = {}
+
+    def __getitem__(self, session_id):
+        """ Return the value of a session
+        """
+        return self._sessions[session_id]
+
+    def __setitem__(self, session_id, value):
+        """ Store a session as the most recently used one
+        """
+        if session_id in self._sessions:
+            self._unindex(session_id, self._sessions[session_id])
+        self._sessions[session_id] = value
+        self._sessions.move_to_end(session_id)
+        self._by_user.setdefault(_user_of(value), {})[session_id] = None
+
+    def __delitem__(self, session_id):
+        """ Remove a session
+        """
+        self._unindex(session_id, self._sessions.pop(session_id))
+
+    def _unindex(self, session_id: str, value):
+        """ Remove a session from the index by user
+        """
+        user_id = _user_of(value)
+        sessions = self._by_user.get(user_id)
+        if sessions is not None:
+            sessions.pop(session_id, None)
+            if len(sessions) == 0:
+                del self._by_user[user_id]
+
+    def __iter__(self):
+        """ Iterate over the session IDs, least recently used first
+        """
+        return iter(self._sessions)
+
+    def __len__(self):
+        """ Return the number of sessions
+        """
+        return len(self._sessions)
+
+    def touch(self, session_id: str):
+        """ Mark a session as the most recently used one
+        Args:
+            session_id (str): session ID
+        """
+        if session_id in self._sessions:
+            self._sessions.move_to_end(session_id)
+
+    def sessions_of(self, user_id: str) -> list:
+        """ Return the IDs of the sessions of a user
+        Args:
+            user_id (str): user ID
+        Returns:
+            list: session IDs
+        """
+        return list(self._by_user.get(user_id, ()))
+
+
+class CompactSessionStore(SessionStore):
+    """ Session store private to the process, laid out for size
+
+    Session IDs must be UUIDs in canonical form, lowercase with dashes:
+    they are kept as their 16 bytes. Each
+    maps to a slot of parallel arrays holding the index of the user ID,
+    interned once for all its sessions, and the creation and refresh
+    dates as float timestamps. Freed slots are reused.
+
+    Values read back are rebuilt: a user ID, or a dictionary of
+    user_id, created_at and refreshed_at as naive local datetimes.
+
+    The expiry schedule is a heap of plain integers, the due time in
+    milliseconds shifted left of the slot; a slot remembers the due
+    time of its latest entry, so older ones are told apart and skipped.
+
+    The sessions of a user form a doubly linked list through two more
+    arrays of slots, for sessions_of() without any per-session object.
+    """
+
+    def __init__(self):
+        """ Initialize a CompactSessionStore instance
+        """
+        super().__init__()
+        # {UUID bytes: slot}, least recently used first
+        self._slots = {}
+        # UUID bytes of each slot, the same objects as the keys above
+        self._keys = []
+        self._scheduled = array('q')
+        self._user_index = array('l')
+        self._created = array('d')
+        self._refreshed = array('d')
+        self._next = array('l')
+        self._prev = array('l')
+        self._free_slots = []
+        # Interned user IDs, with the number of sessions of each and the
+        # first slot of their list, -1 for none
+        self._users = []
+        self._user_slots = {}
+        self._user_refs = array('l')
+        self._user_head = array('l')
+        self._free_users = []
+
+    @staticmethod
+    def _key(session_id) -> bytes:
+        """ Return the 16 bytes of a Session ID, None if not a UUID
+
+        Only the canonical spelling, as str(uuid) writes it, is taken:
+        the same bytes must not stand for several Session IDs.
+        """
+        try:
+            key = uuid.UUID(session_id)
+        except (TypeError, ValueError, AttributeError):
+            return None
+        if str(key) != session_id:
+            return None
+        return key.bytes
+
+    def _intern(self, user_id: str) -> int:
+        """ Return the index of a user ID, adding a reference to it
+        """
+        index = self._user_slots.get(user_id)
+        if index is None:
+            if self._free_users:
+                index = self._free_users.pop()
+                self._users[index] = user_id
+                self._user_refs[index] = 0
+                self._user_head[index] = -1
+            else:
+                index = len(self._users)
+                self._users.append(user_id)
+                self._user_refs.append(0)
+                self._user_head.append(-1)
+            self._user_slots[user_id] = index
+        self._user_refs[index] += 1
+        return index
+
+    def _release(self, index: int):
+        """ Drop a reference to an interned user ID
+        """
+        self._user_refs[index] -= 1
+        if self._user_refs[index] == 0:
+            del self._user_slots[self._users[index]]
+            self._users[index] = None
+            self._free_users.append(index)
+
+    def _link(self, slot: int, user: int):
+        """ Put a slot first in the list of its user
+        """
+        head = self._user_head[user]
+        self._prev[slot] = -1
+        self._next[slot] = head
+        if head >= 0:
+            self._prev[head] = slot
+        self._user_head[user] = slot
+
+    def _unlink(self, slot: int):
+        """ Take a slot out of the list of its user
+        """
+        prev, nxt = self._prev[slot], self._next[slot]
+        if prev >= 0:
+            self._next[prev] = nxt
+        else:
+            self._user_head[self._user_index[slot]] = nxt
+        if nxt >= 0:
+            self._prev[nxt] = prev
+
+    def __getitem__(self, session_id):
+        """ Return the value of a session, rebuilt from its slot
+        """
+        slot = self._slots.get(self._key(session_id))
+        if slot is None:
+            raise KeyError(session_id)
+        user_id = self._users[self._user_index[slot]]
+        created = self._created[slot]
+        if math.isnan(created):
+            return user_id
+        value = {"user_id": user_id,
+                 "created_at": datetime.fromtimestamp(created)}
+        refreshed = self._refreshed[slot]
+        if not math.isnan(refreshed):
+            value["refreshed_at"] = datetime.fromtimestamp(refreshed)
+        return value
+
+    def __setitem__(self, session_id, value):
+        """ Store a session as the most recently used one
+        """
+        key = self._key(session_id)
+        if key is None:
+            raise ValueError("Session ID {!r} isn't a UUID".format(
+                session_id))
+        if isinstance(value, dict):
+            if not set(value) <= {"user_id", "created_at", "refreshed_at"}:
+                raise ValueError("can't store {!r} in a session".format(
+                    value))
+            user_id = value.get("user_id")
+            created = value.get("created_at")
+            refreshed = value.get("refreshed_at")
+            created = created.timestamp() if created else math.nan
+            refreshed = refreshed.timestamp() if refreshed else math.nan
+        else:
+            user_id, created, refreshed = value, math.nan, math.nan
+        user = self._intern(user_id)
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._unlink(slot)
+            self._release(self._user_index[slot])
+        elif self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = len(self._created)
+            self._keys.append(None)
+            self._scheduled.append(-1)
+            self._user_index.append(0)
+            self._created.append(0.0)
+            self._refreshed.append(0.0)
+            self._next.append(-1)
+            self._prev.append(-1)
+        self._keys[slot] = key
+        self._user_index[slot] = user
+        self._link(slot, user)
+        self._created[slot] = created
+        self._refreshed[slot] = refreshed
+        self._slots[key] = slot
+
+    def __delitem__(self, session_id):
+        """ Remove a session, freeing its slot
+        """
+        slot = self._slots.pop(self._key(session_id), None)
+        if slot is None:
+            raise KeyError(session_id)
+        self._unlink(slot)
+        self._release(self._user_index[slot])
+        self._keys[slot] = None
+        self._scheduled[slot] = -1
+        self._free_slots.append(slot)
+
+    def __iter__(self):
+        """ Iterate over the session IDs, least recently used first
+        """
+        for key in list(self._slots):
+            yield str(uuid.UUID(bytes=key))
+
+    def __len__(self):
+        """ Return the number of sessions
+        """
+        return len(self._slots)
+
+    def __contains__(self, session_id):
+        """ Tell whether a session exists
+        """
+        return self._key(session_id) in self._slots
+
+    def oldest(self) -> str:
+        """ Return the least recently used session
+        Returns:
+            str: session ID, None if there is no session
+        """
+        for key in self._slots:
+            return str(uuid.UUID(bytes=key))
+        return None
+
+    def touch(self, session_id: str):
+        """ Mark a session as the most recently used one
+        Args:
+            session_id (str): session ID
+        """
+        key = self._key(session_id)
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._slots[key] = slot
+
+    def sessions_of(self, user_id: str) -> list:
+        """ Return the IDs of the sessions of a user
+        Args:
+            user_id (str): user ID
+        Returns:
+            list: session IDs
+        """
+        user = self._user_slots.get(user_id)
+        session_ids = []
+        slot = self._user_head[user] if user is not None else -1
+        while slot >= 0:
+            session_ids.append(str(uuid.UUID(bytes=self._keys[slot])))
+            slot = self._next[slot]
+        return session_ids
+
+    def schedule(self, session_id: str, expires: float):
+        """ Plan an expiry check of a session
+        Args:
+            session_id (str): session ID
+            expires (float): POSIX timestamp the check is due at
+        """
+        slot = self._slots.get(self._key(session_id))
+        if slot is None:
+            return
+        due_ms = int(expires * 1000)
+        self._scheduled[slot] = due_ms
+        heapq.heappush(self._expiry_heap, due_ms << 32 | slot)
+
+    def due(self, now: float) -> list:
+        """ Return the sessions whose expiry check is due, forgetting
+        those checks
+        Args:
+            now (float): POSIX timestamp
+        Returns:
+            list: session IDs
+        """
+        heap = self._expiry_heap
+        now_ms = int(now * 1000)
+        due = []
+        while heap and heap[0] >> 32 <= now_ms:
+            entry = heapq.heappop(heap)
+            slot = entry & 0xFFFFFFFF
+            if self._scheduled[slot] == entry >> 32:
+                self._scheduled[slot] = -1
+                due.append(str(uuid.UUID(bytes=self._keys[slot])))
+        return due
+
+
+def _encode(value) -> str:
+    """ Serialize a session value, keeping datetimes
+    """
+    def default(obj):
+        if isinstance(obj, datetime):
+            return {"__datetime__": obj.isoformat()}
+        raise TypeError("can't store {!r} in a session".format(obj))
+    return json.dumps(value, default=default)
+
+
+def _decode(raw: str):
+    """ Deserialize a session value written by _encode()
+    """
+    def hook(obj):
+        if len(obj) == 1 and "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+        return obj
+    return json.loads(raw, object_hook=hook)
+
+
+class SQLiteSessionStore(SessionStore):
+    """ Session store in a SQLite file shared by processes
+
+    The database is in WAL mode, so readers don't wait for writers.
+    Each process keeps a pool of at most pool_size connections, shared
+    by its threads; a forked child opens its own.
+
+    The number of sessions is kept up to date by triggers in a table of
+    its own, so len() doesn't count the rows.
+    """
+
+    # SQLite limits the number of parameters of a statement
+    batch_size = 500
+
+    def __init__(self, path: str, pool_size: int = 4):
+        """ Initialize a SQLiteSessionStore instance
+        Args:
+            path (str): the database file
+            pool_size (int): most idle connections kept open
+        """
+        super().__init__()
+        self.path = path
+        self.pool_size = max(pool_size, 1)
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+        with self._connection() as conn:
+            # Other processes may be creating the same schema
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._create_schema(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection):
+        """ Create the tables, or bring those of an older version up to
+        date
+        """
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                     "session_id TEXT PRIMARY KEY, "
+                     "value TEXT NOT NULL, "
+                     "used_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_used_at "
+                     "ON sessions (used_at)")
+        columns = [row[1] for row in
+                   conn.execute("PRAGMA table_info(sessions)")]
+        if "user_id" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN user_id TEXT")
+            rows = conn.execute("SELECT session_id, value "
+                                "FROM sessions").fetchall()
+            conn.executemany("UPDATE sessions SET user_id = ? "
+                             "WHERE session_id = ?",
+                             [(_user_of(_decode(raw)), session_id)
+                              for session_id, raw in rows])
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_user_id "
+                     "ON sessions (user_id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS session_count ("
+                     "n INTEGER NOT NULL)")
+        if conn.execute("SELECT 1 FROM session_count").fetchone() is None:
+            conn.execute("INSERT INTO session_count "
+                         "SELECT COUNT(*) FROM sessions")
+        conn.execute("CREATE TRIGGER IF NOT EXISTS sessions_insert "
+                     "AFTER INSERT ON sessions BEGIN "
+                     "UPDATE session_count SET n = n + 1; END")
+        conn.execute("CREATE TRIGGER IF NOT EXISTS sessions_delete "
+                     "AFTER DELETE ON sessions BEGIN "
+                     "UPDATE session_count SET n = n - 1; END")
+
+    def _connect(self) -> sqlite3.Connection:
+        """ Open a connection to the database
+        """
+        conn = sqlite3.connect(self.path, timeout=30,
+                               isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """ Borrow a connection from the pool of the process
+        """
+        with self._pool_lock:
+            if self._pool_pid != os.getpid():
+                # Connections inherited through fork must not be used
+                self._pool = queue.LifoQueue()
+                self._pool_pid = os.getpid()
+            pool = self._pool
+        try:
+            conn = pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if pool.qsize() < self.pool_size:
+                pool.put(conn)
+            else:
+                conn.close()
+
+    def __getitem__(self, session_id):
+        with self._connection() as conn:
+            row = conn.execute("SELECT value FROM sessions "
+                               "WHERE session_id = ?",
+                               (session_id,)).fetchone()
+        if row is None:
+            raise KeyError(session_id)
+        return _decode(row[0])
+
+    def __setitem__(self, session_id, value):
+        with self._connection() as conn:
+            # An upsert, not INSERT OR REPLACE: the replaced row would
+            # be deleted without firing sessions_delete
+            conn.execute("INSERT INTO sessions "
+                         "(session_id, value, used_at, user_id) "
+                         "VALUES (?, ?, ?, ?) "
+                         "ON CONFLICT (session_id) DO UPDATE SET "
+                         "value = excluded.value, "
+                         "used_at = excluded.used_at, "
+                         "user_id = excluded.user_id",
+                         (session_id, _encode(value), time.time(),
+                          _user_of(value)))
+
+    def __delitem__(self, session_id):
+        with self._connection() as conn:
+            cursor = conn.execute("DELETE FROM sessions "
+                                  "WHERE session_id = ?", (session_id,))
+        if cursor.rowcount == 0:
+            raise KeyError(session_id)
+
+    def __iter__(self):
+        with self._connection() as conn:
+            rows = conn.execute("SELECT session_id FROM sessions "
+                                "ORDER BY used_at").fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self):
+        """ Return the number of sessions, as kept by the triggers
+        """
+        with self._connection() as conn:
+            return conn.execute("SELECT n FROM session_count").fetchone()[0]
+
+    def oldest(self) -> str:
+        """ Return the least recently used session, by the used_at index
+        Returns:
+            str: session ID, None if there is no session
+        """
+        with self._connection() as conn:
+            row = conn.execute("SELECT session_id FROM sessions "
+                               "ORDER BY used_at LIMIT 1").fetchone()
+        return row[0] if row is not None else None
+
+    def __contains__(self, session_id):
+        with self._connection() as conn:
+            return conn.execute("SELECT 1 FROM sessions "
+                                "WHERE session_id = ?",
+                                (session_id,)).fetchone() is not None
+
+    def pop(self, session_id, *default):
+        """ Remove a session and return its value, in one transaction
+        Args:
+            session_id (str): session ID
+            default: value returned if there is no session
+        Returns:
+            the value of the session
+        """
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT value FROM sessions "
+                                   "WHERE session_id = ?",
+                                   (session_id,)).fetchone()
+                if row is not None:
+                    conn.execute("DELETE FROM sessions "
+                                 "WHERE session_id = ?", (session_id,))
+            finally:
+                conn.execute("COMMIT")
+        if row is not None:
+            return _decode(row[0])
+        if default:
+            return default[0]
+        raise KeyError(session_id)
+
+    def get_many(self, session_ids: Iterable[str]) -> dict:
+        """ Return the values of several sessions, batch_size per query
+        Args:
+            session_ids (Iterable[str]): session IDs
+        Returns:
+            dict: values of the sessions found, by session ID
+        """
+        session_ids = list(session_ids)
+        found = {}
+        with self._connection() as conn:
+            for i in range(0, len(session_ids), self.batch_size):
+                batch = session_ids[i:i + self.batch_size]
+                rows = conn.execute(
+                    "SELECT session_id, value FROM sessions "
+                    "WHERE session_id IN ({})".format(
+                        ", ".join("?" * len(batch))), batch)
+                for session_id, raw in rows:
+                    found[session_id] = _decode(raw)
+        return found
+
+    def sessions_of(self, user_id: str) -> list:
+        """ Return the IDs of the sessions of a user, by an index
+        Args:
+            user_id (str): user ID
+        Returns:
+            list: session IDs
+        """
+        with self._connection() as conn:
+            rows = conn.execute("SELECT session_id FROM sessions "
+                                "WHERE user_id = ?", (user_id,)).fetchall()
+        return [row[0] for row in rows]
+
+    def touch(self, session_id: str):
+        """ Mark a session as the most recently used one
+        Args:
+            session_id (str): session ID
+        """
+        with self._connection() as conn:
+            conn.execute("UPDATE sessions SET used_at = ? "
+                         "WHERE session_id = ?", (time.time(), session_id))
+
+
+def session_store() -> SessionStore:
+    """ Return a new session store of the backend set by SESSION_STORE
+    Returns:
+        SessionStore: the store
+    Raises:
+        ValueError: if SESSION_STORE names no backend
+    """
+    backend = os.getenv('SESSION_STORE', 'memory')
+    if backend == 'memory':
+        return MemorySessionStore()
+    if backend == 'compact':
+        return CompactSessionStore()
+    if backend == 'sqlite':
+        return SQLiteSessionStore(
+            os.getenv('SESSION_STORE_PATH', '.db_sessions.sqlite3'),
+            int_env('SESSION_STORE_POOL_SIZE', 4))
+    raise ValueError("unknown SESSION_STORE {!r}".format(backend))
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+""" Module of single-flight call coalescing
+"""
+import threading
+
+
+class _Call:
+    """ A computation in flight and, once done, its outcome
+    """
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        """ Initialize a _Call instance, not done yet
+        """
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """ Coalesces concurrent calls with the same key
+
+    While a call for a key runs, other threads asking for the same key
+    wait for it and get its result, or its exception, instead of
+    running their own. Nothing is kept once the call returns: this is
+    not a cache.
+    """
+
+    def __init__(self):
+        """ Initialize a SingleFlight instance
+        """
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """ Run fn, or wait for the call already running for key
+        Args:
+            key: hashable key of the computation
+            fn: callable without arguments
+        Returns:
+            the result of fn
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        """ Return the number of calls and of those that shared a result
+        """
+        with self._lock:
+            return {"calls": self.calls, "shared": self.shared,
+                    "in_flight": len(self._calls)}
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+""" Module of latency histograms for the stages of authentication
+
+Code under measure runs inside `with timed("stage"):`. Durations are
+counted in buckets of powers of two microseconds, so recording one is
+a clock read and an integer increment. AUTH_TIMING=0 turns the timers
+into no-ops.
+"""
+from contextlib import nullcontext
+import os
+import threading
+import time
+
+
+ENABLED = os.getenv('AUTH_TIMING', '1').lower() not in ('0', 'false', 'no')
+# Bucket i counts durations below 2**i microseconds, the last one the rest
+BUCKETS = 27
+_NO_TIMER = nullcontext()
+
+
+class Histogram:
+    """ Latency histogram of one stage
+    """
+
+    def __init__(self):
+        """ Initialize a Histogram instance
+        """
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self._lock = threading.Lock()
+
+    def record(self, ns: int):
+        """ Count one duration
+        Args:
+            ns (int): the duration in nanoseconds
+        """
+        bucket = min((ns // 1000).bit_length(), BUCKETS - 1)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.total_ns += ns
+            if ns > self.max_ns:
+                self.max_ns = ns
+
+    def percentile(self, fraction: float) -> float:
+        """ Return an upper bound of a percentile
+        Args:
+            fraction (float): the percentile, between 0 and 1
+        Returns:
+            float: milliseconds, the upper bound of the bucket holding it
+        """
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count > 0:
+                break
+        return min(2 ** bucket / 1000, self.max_ns / 1e6)
+
+    def to_json(self) -> dict:
+        """ Return the summary and the buckets of the histogram
+        """
+        with self._lock:
+            return {
+                "count": self.count,
+                "mean_ms": self.total_ns / self.count / 1e6
+                if self.count else 0.0,
+                "p50_ms": self.percentile(0.5),
+                "p90_ms": self.percentile(0.9),
+                "p99_ms": self.percentile(0.99),
+                "max_ms": self.max_ns / 1e6,
+                "buckets_us": {"<{}".format(2 ** bucket): count
+                               for bucket, count in enumerate(self.counts)
+                               if count > 0},
+            }
+
+
+class _Timer:
+    """ Context manager recording its duration into a histogram
+    """
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: Histogram):
+        """ Initialize a _Timer instance recording into a histogram
+        """
+        self.histogram = histogram
+
+    def __enter__(self):
+        """ Start the clock
+        """
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        """ Record the time since __enter__, exceptions or not
+        """
+        self.histogram.record(time.perf_counter_ns() - self.start)
+        return False
+
+
+HISTOGRAMS = {}
+_histograms_lock = threading.Lock()
+
+
+def histogram(stage: str) -> Histogram:
+    """ Return the histogram of a stage, created on first use
+    Args:
+        stage (str): name of the stage
+    Returns:
+        Histogram: its histogram
+    """
+    found = HISTOGRAMS.get(stage)
+    if found is None:
+        with _histograms_lock:
+            found = HISTOGRAMS.setdefault(stage, Histogram())
+    return found
+
+
+def timed(stage: str):
+    """ Return a context manager timing a stage
+    Args:
+        stage (str): name of the stage
+    Returns:
+        a context manager, recording nothing if timing is disabled
+    """
+    if not ENABLED:
+        return _NO_TIMER
+    return _Timer(histogram(stage))
+
+
+def timings() -> dict:
+    """ Return the histograms of every stage, by stage name
+    """
+    with _histograms_lock:
+        stages = sorted(HISTOGRAMS.items())
+    return {stage: found.to_json() for stage, found in stages}
+
+
+def reset():
+    """ Forget every recorded duration
+    """
+    with _histograms_lock:
+        HISTOGRAMS.clear()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+""" Module of a bounded cache with expiring entries
+"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache:
+    """ Bounded LRU cache whose entries expire after a time to live
+
+    Safe to share between threads. Counts hits, misses (including
+    expired entries), evictions of least recently used entries and
+    explicit invalidations.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        """ Initialize a TTLCache instance
+        Args:
+            maxsize (int): most entries kept, 0 disables the cache
+            ttl (float): seconds an entry stays valid, 0 for no expiry
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        """ Return the number of entries, expired or not
+        """
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """ Return the value of a key and mark it recently used
+        Args:
+            key: the key to look up
+            default: value returned on a miss
+        Returns:
+            the cached value, default if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """ Cache a value, evicting the least recently used entries
+        Args:
+            key: the key
+            value: the value
+            ttl (float): seconds to live, default the cache's ttl
+        """
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl and ttl > 0 else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key) -> bool:
+        """ Drop the entry of a key
+        Args:
+            key: the key
+        Returns:
+            bool: True if there was an entry
+        """
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return False
+            self.invalidations += 1
+            return True
+
+    def clear(self):
+        """ Drop every entry
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """ Return the size and counters of the cache
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
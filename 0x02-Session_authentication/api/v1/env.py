@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+""" Module of helpers reading settings from the environment
+"""
+import os
+
+
+def int_env(name: str, default: int = 0) -> int:
+    """
+    Read an integer environment variable
+
+    Args:
+        name (str): name of the variable
+        default (int): value if unset or not an integer
+
+    Returns:
+        int: the value
+    """
+    try:
+        return int(os.getenv(name))
+    except (TypeError, ValueError):
+        return default
+
+
+def float_env(name: str, default: float = 0.0) -> float:
+    """
+    Read a number from an environment variable
+
+    Args:
+        name (str): name of the variable
+        default (float): value if unset or not a number
+
+    Returns:
+        float: the value
+    """
+    try:
+        return float(os.getenv(name))
+    except (TypeError, ValueError):
+        return default
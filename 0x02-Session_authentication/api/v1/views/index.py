@@ -51,3 +51,30 @@ def stats() -> str:
     stats = {}
     stats['users'] = User.count()
     return jsonify(stats)
+
+
+@app_views.route('/metrics/auth', methods=['GET'], strict_slashes=False)
+def auth_metrics() -> str:
+    """ GET /api/v1/metrics/auth
+    Return:
+      - the latency histograms of each authentication stage of this
+        process: count, mean, percentiles and buckets in microseconds
+    """
+    from api.v1.auth.timing import timings
+    return jsonify(timings())
+
+
+@app_views.route('/metrics/sessions', methods=['GET'], strict_slashes=False)
+def session_metrics() -> str:
+    """ GET /api/v1/metrics/sessions
+    Return:
+      - the counters of the session filter and store of this process,
+        empty if sessions aren't used
+    """
+    from api.v1.app import auth
+    metrics = {}
+    if hasattr(auth, 'filter_metrics'):
+        metrics['filter'] = auth.filter_metrics()
+    if hasattr(auth, 'session_metrics'):
+        metrics['store'] = auth.session_metrics()
+    return jsonify(metrics)
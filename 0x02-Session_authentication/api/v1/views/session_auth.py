@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 """ Module of Users views
 """
+import math
 import os
 from flask import abort, jsonify, request
+from api.v1.auth.rate_limit import login_limiter
+from api.v1.auth.timing import timed
 from api.v1.views import app_views
 from models.user import User
 
 
+# Attempts by client IP and by email, checked before any lookup or hash
+# when LOGIN_RATE_PER_MINUTE is set
+LOGIN_LIMITER = login_limiter()
+
+
 @app_views.route('/auth_session/login', methods=['POST'], strict_slashes=False)
 def auth_session():
     """
@@ -16,17 +24,27 @@ def auth_session():
     """
     email = request.form.get('email')
     password = request.form.get('password')
+    wait = LOGIN_LIMITER.acquire(('ip', request.remote_addr),
+                                 ('email', email) if email else None)
+    if wait > 0:
+        resp = jsonify({"error": "too many login attempts"})
+        resp.headers['Retry-After'] = str(math.ceil(wait))
+        return resp, 429
     if email is None or email == '':
         return jsonify({"error": "email missing"}), 400
     if password is None or password == '':
         return jsonify({"error": "password missing"}), 400
-    users = User.search({"email": email})
+    with timed("login.lookup"):
+        users = User.search({"email": email})
     if not users or users == []:
         return jsonify({"error": "no user found for this email"}), 404
     for user in users:
-        if user.is_valid_password(password):
+        with timed("login.password"):
+            valid = user.is_valid_password(password)
+        if valid:
             from api.v1.app import auth
-            session_id = auth.create_session(user.id)
+            with timed("login.create_session"):
+                session_id = auth.create_session(user.id)
             resp = jsonify(user.to_json())
             session_name = os.getenv('SESSION_NAME')
             resp.set_cookie(session_name, session_id)
@@ -42,5 +60,24 @@ def handle_logout():
     """
     from api.v1.app import auth
     if auth.destroy_session(request):
-        return jsonify({}), 200
+        resp = jsonify({})
+        resp.delete_cookie(os.getenv('SESSION_NAME'))
+        return resp, 200
     abort(404)
+
+
+@app_views.route('/auth_session/logout_all', methods=['DELETE'],
+                 strict_slashes=False)
+def handle_logout_all():
+    """
+    Handle user logout from every session
+    Return:
+        the number of sessions deleted
+    """
+    from api.v1.app import auth
+    if not hasattr(auth, 'destroy_user_sessions'):
+        abort(404)
+    removed = auth.destroy_user_sessions(request.current_user.id)
+    resp = jsonify({"sessions": removed})
+    resp.delete_cookie(os.getenv('SESSION_NAME'))
+    return resp, 200
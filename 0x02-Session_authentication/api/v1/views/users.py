@@ -2,7 +2,8 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request
+import os
 from models.user import User
 
 
@@ -15,9 +16,13 @@ def view_all_users() -> str:
     attributes of a User. The list is obtained by calling the
     to_json() method on each User object in the User.all() list
     and then using the list comprehension to create the final list.
+
+    The response carries a strong ETag, the digest of the IDs and
+    versions of the Users: with a matching If-None-Match, the answer is
+    a 304 and nothing is serialized.
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    return _conditional(User.digest(), lambda: jsonify(
+        [user.to_json() for user in User.all()]))
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -28,7 +33,8 @@ def view_one_user(user_id: str = None) -> str:
       - User ID
 
     Return:
-      - User object JSON represented
+      - User object JSON represented, with the version of the User as
+        ETag, or 304 if it matches If-None-Match
       - 404 if the User ID doesn't exist
     """
     # If user_id is None, abort with 404
@@ -44,7 +50,7 @@ def view_one_user(user_id: str = None) -> str:
     # request.current_user is not None, return
     # JSON representation of the current user
     if user_id == "me" and request.current_user is not None:
-        return jsonify(request.current_user.to_json())
+        return _user_response(request.current_user)
 
     # Get the User with the given user_id
     user = User.get(user_id)
@@ -54,7 +60,7 @@ def view_one_user(user_id: str = None) -> str:
         abort(404)
 
     # Return JSON representation of the User
-    return jsonify(user.to_json())
+    return _user_response(user)
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -72,6 +78,7 @@ def delete_user(user_id: str = None) -> str:
     if user is None:
         abort(404)
     user.remove()
+    _destroy_sessions(user.id)
     return jsonify({}), 200
 
 
@@ -121,16 +128,22 @@ def update_user(user_id: str = None) -> str:
     JSON body:
       - last_name (optional)
       - first_name (optional)
+    Passwords are changed through PUT /api/v1/users/me/password only.
+    With If-Match, the User is only updated if its ETag, as GET returns
+    it, matches: a client can't overwrite changes it hasn't seen.
     Return:
-      - User object JSON represented
+      - User object JSON represented, with its new ETag
       - 404 if the User ID doesn't exist
       - 400 if can't update the User
+      - 412 if If-Match doesn't match the ETag of the User
     """
     if user_id is None:
         abort(404)
     user = User.get(user_id)
     if user is None:
         abort(404)
+    if request.if_match and not request.if_match.contains(_user_etag(user)):
+        return jsonify({'error': "Precondition failed"}), 412
     rj = None
     try:
         rj = request.get_json()
@@ -143,4 +156,84 @@ def update_user(user_id: str = None) -> str:
     if rj.get('last_name') is not None:
         user.last_name = rj.get('last_name')
     user.save()
-    return jsonify(user.to_json()), 200
+    response = jsonify(user.to_json())
+    response.set_etag(_user_etag(user))
+    return response, 200
+
+
+@app_views.route('/users/me/password', methods=['PUT'],
+                 strict_slashes=False)
+def update_password() -> str:
+    """ PUT /api/v1/users/me/password
+    JSON body:
+      - current_password
+      - new_password, not empty
+    Changes the password of the authenticated User, then ends every
+    session of the User, this one included.
+    Return:
+      - User object JSON represented
+      - 400 if the body is wrong or new_password is missing
+      - 403 if current_password is wrong
+      - 404 if no User is authenticated
+    """
+    user = getattr(request, 'current_user', None)
+    if user is None:
+        abort(404)
+    rj = None
+    try:
+        rj = request.get_json()
+    except Exception as e:
+        rj = None
+    if not isinstance(rj, dict):
+        return jsonify({'error': "Wrong format"}), 400
+    new_password = rj.get('new_password')
+    if not isinstance(new_password, str) or new_password == "":
+        return jsonify({'error': "new_password missing"}), 400
+    if not user.is_valid_password(rj.get('current_password')):
+        abort(403)
+    user.password = new_password
+    user.save()
+    _destroy_sessions(user.id)
+    response = jsonify(user.to_json())
+    if os.getenv('SESSION_NAME'):
+        response.delete_cookie(os.getenv('SESSION_NAME'))
+    return response, 200
+
+
+def _destroy_sessions(user_id: str) -> None:
+    """ Delete every session of a user, if the API uses sessions
+    """
+    from api.v1.app import auth
+    if hasattr(auth, 'destroy_user_sessions'):
+        auth.destroy_user_sessions(user_id)
+
+
+def _conditional(etag: str, build) -> Response:
+    """ Answer a GET with an ETag
+
+    Args:
+        etag (str): strong ETag of the current representation, unquoted
+        build: callable returning the full response
+
+    Returns:
+        Response: 304 if If-None-Match matches the ETag, without calling
+        build, else the response build returns
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    return response
+
+
+def _user_etag(user: User) -> str:
+    """ Return the strong ETag of a User, unquoted: its ID and version
+    """
+    return "{}-{}".format(user.id, user.version)
+
+
+def _user_response(user: User) -> Response:
+    """ Answer a GET of one User, tagged with its ID and version
+    """
+    return _conditional(_user_etag(user), lambda: jsonify(user.to_json()))
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+""" Scale benchmarks of models.base operations
+
+Usage:
+    python3 -m benchmarks.models_bench [--sizes 10000 100000 1000000]
+        [--storage json snapshot] [--output results.json]
+    python3 -m benchmarks.models_bench --compare old.json new.json
+
+For every storage and size, a store of synthetic User and UserSession
+records is generated in a scratch directory, then a fresh process loads
+it and times load_from_file, get, search, query, to_json, save and
+save_to_file. Each stage runs in its own process so peak RSS is
+measured per stage. Results are written as JSON, one entry per
+(storage, size, operation).
+"""
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = [10000, 100000, 1000000]
+STORAGES = ["json", "snapshot"]
+LOOKUPS = 1000
+REPEAT = 3
+
+
+def _peak_rss_kb() -> int:
+    """ Return the peak resident set size of this process, in KB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak //= 1024
+    return peak
+
+
+def _file_sizes() -> dict:
+    """ Return the size of the store files of the scratch directory
+    """
+    return {name: os.path.getsize(name) for name in sorted(os.listdir("."))
+            if name.startswith(".db_") and
+            (name.endswith(".json") or name.endswith(".snap"))}
+
+
+def _timed(fn, repeat: int = 1) -> float:
+    """ Return the best wall time of fn over repeat runs, in seconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def stage_generate(size: int) -> list:
+    """ Create size users and size sessions, persisted once per class
+    """
+    from models.user import User, hash_password
+    from models.user_session import UserSession
+
+    User.load_from_file()
+    UserSession.load_from_file()
+    digest = hash_password("benchmark")
+    start = datetime(2020, 1, 1)
+    users = []
+    sessions = []
+    for i in range(size):
+        created = (start + timedelta(seconds=i)).strftime(
+            "%Y-%m-%dT%H:%M:%S")
+        user = User(email="user{}@example{}.com".format(i, i % 100),
+                    _password=digest, first_name="First{}".format(i),
+                    last_name="Last{}".format(i),
+                    created_at=created, updated_at=created)
+        users.append(user)
+        sessions.append(UserSession(user_id=user.id,
+                                    session_id="s-{}".format(user.id),
+                                    created_at=created, updated_at=created))
+    results = []
+    results.append({"op": "save_many_users",
+                    "seconds": _timed(lambda: User.save_many(users))})
+    results.append({"op": "save_many_sessions",
+                    "seconds": _timed(lambda: UserSession.save_many(
+                        sessions))})
+    return results
+
+
+def stage_ops(size: int) -> list:
+    """ Time the operations on a freshly loaded store
+    """
+    from models.base import DATA
+    from models.user import User
+    from models.user_session import UserSession
+
+    results = []
+    results.append({"op": "load_from_file_users",
+                    "seconds": _timed(User.load_from_file)})
+    results.append({"op": "load_from_file_sessions",
+                    "seconds": _timed(UserSession.load_from_file)})
+    loaded_rss = _peak_rss_kb()
+    for result in results:
+        result["rss_after_load_kb"] = loaded_rss
+
+    ids = random.Random(0).sample(list(DATA["User"]), min(LOOKUPS, size))
+    seconds = _timed(lambda: [User.get(obj_id) for obj_id in ids], REPEAT)
+    results.append({"op": "get", "seconds": seconds / len(ids)})
+
+    email = "user{}@example{}.com".format(size // 2, (size // 2) % 100)
+    results.append({"op": "search_email", "seconds": _timed(
+        lambda: User.search({"email": email}), REPEAT)})
+    results.append({"op": "search_session_id", "seconds": _timed(
+        lambda: UserSession.search({"session_id": "s-{}".format(ids[0])}),
+        REPEAT)})
+
+    since = datetime(2020, 1, 1) + timedelta(seconds=size - size // 100)
+    results.append({"op": "query_index_build", "seconds": _timed(
+        lambda: User.query({"created_at": {"gte": since}}))})
+    results.append({"op": "query_created_since", "seconds": _timed(
+        lambda: User.query({"created_at": {"gte": since}}), REPEAT)})
+
+    results.append({"op": "to_json_all_cold", "seconds": _timed(
+        lambda: [u.to_json() for u in User.all()])})
+    results.append({"op": "to_json_all_warm", "seconds": _timed(
+        lambda: [u.to_json() for u in User.all()], REPEAT)})
+
+    user = User.get(ids[0])
+    results.append({"op": "save_one", "seconds": _timed(user.save, REPEAT)})
+    results.append({"op": "save_to_file_users", "seconds": _timed(
+        User.save_to_file, REPEAT)})
+    return results
+
+
+def run_worker(stage: str, size: int) -> None:
+    """ Run one stage in this process and print its results as JSON
+    """
+    sys.path.insert(0, ROOT)
+    if stage == "generate":
+        results = stage_generate(size)
+    else:
+        results = stage_ops(size)
+    peak = _peak_rss_kb()
+    files = _file_sizes()
+    for result in results:
+        result["peak_rss_kb"] = peak
+        result["file_bytes"] = files
+    print(json.dumps(results))
+
+
+def run(sizes: list, storages: list) -> list:
+    """ Run every stage for every storage and size in scratch dirs
+    """
+    results = []
+    for storage in storages:
+        for size in sizes:
+            workdir = tempfile.mkdtemp(prefix="models_bench_")
+            env = dict(os.environ, DB_STORAGE=storage,
+                       PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1")
+            try:
+                for stage in ("generate", "ops"):
+                    out = subprocess.run(
+                        [sys.executable, "-m", "benchmarks.models_bench",
+                         "--worker", stage, "--size", str(size)],
+                        cwd=workdir, env=env, check=True,
+                        stdout=subprocess.PIPE).stdout
+                    for result in json.loads(out):
+                        result.update({"storage": storage, "size": size,
+                                       "stage": stage})
+                        results.append(result)
+                        print("{storage:9} {size:>8} {op:24} {seconds:12.6f}s"
+                              " {peak_rss_kb:>9} KB".format(**result),
+                              file=sys.stderr)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """ Print the time ratio new/old of every common measurement
+    """
+    def _load(file_path):
+        with open(file_path) as f:
+            doc = json.load(f)
+        return {(r["storage"], r["size"], r["op"]): r
+                for r in doc["results"]}
+
+    old = _load(old_path)
+    new = _load(new_path)
+    for key in sorted(set(old) & set(new)):
+        o, n = old[key], new[key]
+        ratio = n["seconds"] / o["seconds"] if o["seconds"] else 0.0
+        print("{:9} {:>8} {:24} {:12.6f}s {:12.6f}s x{:6.2f}"
+              " rss {:>9} -> {:>9} KB".format(
+                  key[0], key[1], key[2], o["seconds"], n["seconds"],
+                  ratio, o["peak_rss_kb"], n["peak_rss_kb"]))
+
+
+def main(argv: list = None) -> int:
+    """ Command line entry point
+    """
+    parser = argparse.ArgumentParser(prog="python3 -m benchmarks.models_bench")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--storage", nargs="+", default=STORAGES,
+                        choices=STORAGES)
+    parser.add_argument("--output", default="-",
+                        help="results file, - for stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--worker", choices=["generate", "ops"],
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.worker, args.size)
+        return 0
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    doc = {
+        "meta": {
+            "date": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": run(args.sizes, args.storage),
+    }
+    if args.output == "-":
+        json.dump(doc, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(doc, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+""" Memory benchmark of the in-process session stores
+
+Usage:
+    python3 -m benchmarks.sessions_bench [--sizes 1000000 10000000]
+        [--store memory compact] [--users 100000] [--output results.json]
+
+For every store and size, a fresh process creates size sessions through
+SessionExpAuth.create_session, spread over a pool of user IDs, then
+looks some up. Resident memory is read before and after, so the bytes
+per session include the store and the expiry heap of SessionExpAuth.
+Results are written as JSON, one entry per (store, size).
+"""
+from datetime import datetime
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+
+from benchmarks.models_bench import ROOT, _peak_rss_kb
+
+
+SIZES = [1000000, 10000000]
+STORES = ["memory", "compact"]
+USERS = 100000
+LOOKUPS = 10000
+
+
+def _rss_kb() -> int:
+    """ Return the current resident set size of this process, in KB
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return _peak_rss_kb()
+
+
+def run_worker(size: int, users: int) -> dict:
+    """ Fill a store in this process and measure it
+    """
+    sys.path.insert(0, ROOT)
+    from api.v1.auth.session_exp_auth import SessionExpAuth
+
+    user_ids = [str(uuid.uuid4()) for _ in range(min(users, size) or 1)]
+    auth = SessionExpAuth()
+    before = _rss_kb()
+    start = time.perf_counter()
+    session_ids = []
+    keep = max(size // LOOKUPS, 1)
+    for i in range(size):
+        session_id = auth.create_session(user_ids[i % len(user_ids)])
+        if i % keep == 0:
+            session_ids.append(session_id)
+    create_seconds = time.perf_counter() - start
+    after = _rss_kb()
+
+    random.Random(0).shuffle(session_ids)
+    start = time.perf_counter()
+    for session_id in session_ids:
+        auth.user_id_for_session_id(session_id)
+    lookup_seconds = (time.perf_counter() - start) / len(session_ids)
+    return {
+        "sessions": len(auth.user_id_by_session_id),
+        "users": len(user_ids),
+        "create_seconds": create_seconds,
+        "lookup_seconds": lookup_seconds,
+        "rss_before_kb": before,
+        "rss_after_kb": after,
+        "bytes_per_session": (after - before) * 1024 / size,
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def run(sizes: list, stores: list, users: int) -> list:
+    """ Run a worker process for every store and size
+    """
+    results = []
+    for store in stores:
+        for size in sizes:
+            env = dict(os.environ, SESSION_STORE=store,
+                       SESSION_DURATION="3600", SESSION_SWEEP_INTERVAL="0",
+                       PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1")
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.sessions_bench",
+                 "--worker", "--size", str(size), "--users", str(users)],
+                cwd=ROOT, env=env, check=True,
+                stdout=subprocess.PIPE).stdout
+            result = json.loads(out)
+            result.update({"store": store, "size": size})
+            results.append(result)
+            print("{store:8} {size:>9} {bytes_per_session:8.1f} B/session"
+                  " {create_seconds:9.2f}s create"
+                  " {lookup_seconds:.2e}s lookup".format(**result),
+                  file=sys.stderr)
+    return results
+
+
+def main(argv: list = None) -> int:
+    """ Command line entry point
+    """
+    parser = argparse.ArgumentParser(
+        prog="python3 -m benchmarks.sessions_bench")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--store", nargs="+", default=STORES,
+                        choices=STORES)
+    parser.add_argument("--users", type=int, default=USERS,
+                        help="distinct user IDs the sessions belong to")
+    parser.add_argument("--output", default="-",
+                        help="results file, - for stdout")
+    parser.add_argument("--worker", action="store_true",
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(args.size, args.users)))
+        return 0
+
+    doc = {
+        "meta": {
+            "date": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": run(args.sizes, args.store, args.users),
+    }
+    if args.output == "-":
+        json.dump(doc, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(doc, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
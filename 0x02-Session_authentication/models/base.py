@@ -1,20 +1,256 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from contextlib import contextmanager
 from datetime import datetime
 from typing import TypeVar, List, Iterable
-from os import path
+import hashlib
 import json
+import os
+import threading
+import time
 import uuid
 
+from models.index import HashIndex, SortedIndex
+from models.locks import ReadWriteLock
+from models.snapshot import SnapshotStore, open_snapshot, write_snapshot
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+# "json" keeps each class in .db_<Class>.json, loaded whole. "snapshot"
+# keeps it in .db_<Class>.snap, memory-mapped and decoded per record.
+STORAGE = os.getenv('DB_STORAGE', 'json')
+try:
+    MAX_RESIDENT = int(os.getenv('DB_MAX_RESIDENT')) or None
+except (TypeError, ValueError):
+    MAX_RESIDENT = None
 DATA = {}
+# Guards DATA and the per-class dicts it holds. Readers never mutate,
+# so they share the lock; writers (save, remove, load) hold it alone.
+DATA_LOCK = ReadWriteLock()
+# Serializes snapshot-and-write of the .db_*.json files so an older
+# snapshot can never overwrite a newer one.
+_PERSIST_LOCK = threading.Lock()
+# Classes loaded or saved by this process, and the (inode, mtime, size)
+# of their .db_*.json file as last read or written here. Another process
+# rewriting the file changes the stamp, which is how reloads are detected.
+_CLASSES = {}
+FILE_STAMPS = {}
+# Number of times each class was read from its file, {class name: int}:
+# unlike FILE_STAMPS, it doesn't change when this process writes the file
+LOADS = {}
+_last_reload_check = 0.0
+# Indexes per class, {class name: {attribute: SortedIndex or HashIndex}}.
+# Built on the first search or query using them, then kept up to date by
+# save and remove under DATA_LOCK; dropped whenever the class is reloaded.
+INDEXES = {}
+# IDs per class of the instances assigned an indexed attribute since
+# they were last indexed, {class name: set of IDs}: their indexes may
+# still hold the saved value, so searches check them too
+_UNSAVED = {}
+QUERY_OPERATORS = ('gt', 'gte', 'lt', 'lte', 'prefix', 'in')
+# Collection version per class, {class name: int}, bumped whenever an
+# instance of the class is saved, removed or reloaded in this process
+VERSIONS = {}
+# Last digest of each class, {class name: (collection version, digest)}
+_DIGESTS = {}
+# Instance attributes that are bookkeeping, never part of to_json()
+_JSON_CACHE = '_json_cache'
+TRANSIENT_ATTRIBUTES = frozenset([_JSON_CACHE])
+
+
+def _file_path(s_class: str) -> str:
+    """ Return the path of the file storing the instances of a class
+    """
+    if STORAGE == 'snapshot':
+        return ".db_{}.snap".format(s_class)
+    return ".db_{}.json".format(s_class)
+
+
+def _file_stamp(file_path: str) -> tuple:
+    """ Return the (inode, mtime, size) of a file, None if missing
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+@contextmanager
+def _file_lock(file_path: str, shared: bool = False):
+    """ Hold an advisory lock on a store file across processes
+
+    Writers take it exclusively so saves from several workers are
+    serialized; readers take it shared so they never see a half
+    renamed file. It's a no-op where fcntl isn't available.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open("{}.lock".format(file_path), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def reload_changed() -> List[str]:
+    """ Reload the classes whose file was changed by another process
+
+    The check is a stat() per known class. When DB_RELOAD_INTERVAL is
+    set (in seconds), calls made within that interval of the previous
+    check return immediately.
+
+    Return the names of the reloaded classes
+    """
+    global _last_reload_check
+    try:
+        interval = float(os.getenv('DB_RELOAD_INTERVAL', 0))
+    except ValueError:
+        interval = 0
+    now = time.monotonic()
+    if interval > 0 and now - _last_reload_check < interval:
+        return []
+    _last_reload_check = now
+
+    reloaded = []
+    for s_class, cls in list(_CLASSES.items()):
+        if _file_stamp(_file_path(s_class)) != FILE_STAMPS.get(s_class):
+            cls.load_from_file()
+            reloaded.append(s_class)
+    return reloaded
+
+
+def _bump(s_class: str) -> None:
+    """ Bump the collection version of a class
+
+    The caller holds DATA_LOCK for writing
+    """
+    VERSIONS[s_class] = VERSIONS.get(s_class, 0) + 1
+
+
+def _next_version(s_class: str, obj) -> int:
+    """ Return the version of an instance about to be stored
+
+    It's past both the version the instance carries and the one stored,
+    which another process may have bumped since the instance was read,
+    so a version never stands for two different contents.
+
+    The caller holds the file lock and DATA_LOCK for writing
+    """
+    stored = DATA[s_class].get(obj.id)
+    version = obj.version
+    if stored is not None and stored.version > version:
+        version = stored.version
+    return version + 1
+
+
+def _index_add(s_class: str, obj) -> None:
+    """ Add or refresh an instance in the indexes of its class
+
+    The caller holds DATA_LOCK for writing
+    """
+    for index in INDEXES.get(s_class, {}).values():
+        index.add(obj)
+    _UNSAVED.get(s_class, set()).discard(obj.id)
+
+
+def _index_discard(s_class: str, obj_id: str) -> None:
+    """ Remove an instance from the indexes of its class
+
+    The caller holds DATA_LOCK for writing
+    """
+    for index in INDEXES.get(s_class, {}).values():
+        index.discard(obj_id)
+    _UNSAVED.get(s_class, set()).discard(obj_id)
+
+
+def _track_change(s_class: str, obj, attr: str) -> None:
+    """ Note an instance whose value of an attribute may differ from the
+    one in its index, if the attribute is indexed
+    """
+    index = INDEXES.get(s_class, {}).get(attr)
+    if index is None:
+        return
+    obj_id = obj.__dict__.get('id')
+    if obj_id is not None and index.value_of(obj_id) != getattr(obj, attr):
+        _UNSAVED.setdefault(s_class, set()).add(obj_id)
+
+
+def _is_operators(value) -> bool:
+    """ Tell whether a query value is a dict of operators
+    """
+    return type(value) is dict and len(value) > 0 \
+        and all(op in QUERY_OPERATORS for op in value.keys())
+
+
+def _matches(value, operators: dict) -> bool:
+    """ Check an attribute value against a dict of operators
+    """
+    for op, arg in operators.items():
+        if op == 'in':
+            if value not in arg:
+                return False
+            continue
+        if value is None:
+            return False
+        if op == 'gt' and not value > arg:
+            return False
+        if op == 'gte' and not value >= arg:
+            return False
+        if op == 'lt' and not value < arg:
+            return False
+        if op == 'lte' and not value <= arg:
+            return False
+        if op == 'prefix' and \
+                not (type(value) is str and value.startswith(arg)):
+            return False
+    return True
+
+
+def _candidates(index: SortedIndex, operators: dict) -> List[str]:
+    """ Return the IDs an index yields for a dict of operators, or None
+    when an argument isn't of the type of the indexed values
+    """
+    for op, arg in operators.items():
+        args = arg if op == 'in' else [arg]
+        if not all(index.accepts(a) for a in args):
+            return None
+        if op == 'prefix' and type(arg) is not str:
+            return None
+    if 'prefix' in operators:
+        return index.prefix(operators['prefix'])
+    if 'in' in operators:
+        ids = {}
+        for value in operators['in']:
+            if value is not None:
+                ids.update(dict.fromkeys(index.range(value, value)))
+        return list(ids)
+    lower = operators.get('gt', operators.get('gte'))
+    upper = operators.get('lt', operators.get('lte'))
+    return index.range(lower, upper,
+                       'gt' not in operators, 'lt' not in operators)
 
 
 class Base():
     """ Base class for all models
     """
+    # Attributes that query() can serve from a sorted index
+    indexed_attributes = ('created_at', 'updated_at')
+    # Attributes that search() can match from a hash index. An attribute
+    # belongs to one of the two tuples at most
+    hash_indexed_attributes = ()
+    # Most instances kept in memory in snapshot storage, None for all.
+    # Least recently used ones are dropped and decoded again when read.
+    max_resident = MAX_RESIDENT
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
 
@@ -22,10 +258,12 @@ class Base():
         id (str): The ID of the instance
         created_at (str): The timestamp of creation in the format %Y-%m-%dT%H:%M:%S
         updated_at (str): The timestamp of last update in the format %Y-%m-%dT%H:%M:%S
+        _version (int): The number of times the instance was saved
         """
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
-            DATA[s_class] = {}
+            with DATA_LOCK.write():
+                DATA.setdefault(s_class, {})
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
@@ -38,6 +276,25 @@ class Base():
                                                 TIMESTAMP_FORMAT)
         else:
             self.updated_at = datetime.utcnow()
+        # Records read from CSV carry it as a string
+        self._version = int(kwargs.get('_version') or 0)
+
+    @property
+    def version(self) -> int:
+        """ Return the version of the instance, bumped by every save
+
+        Stored with the instance, so it's the same in every process
+        """
+        return self._version
+
+    def __setattr__(self, name: str, value):
+        """ Set an attribute and drop the cached to_json() results
+        """
+        object.__setattr__(self, name, value)
+        self.__dict__.pop(_JSON_CACHE, None)
+        if name in self.indexed_attributes or \
+                name in self.hash_indexed_attributes:
+            _track_change(type(self).__name__, self, name)
 
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Compare two instances for equality
@@ -56,15 +313,37 @@ class Base():
         If for_serialization is True, all attributes are included
         in the output. If False, only attributes without a leading
         underscore are included
+
+        Both variants are cached on the instance until an attribute is
+        assigned. Changing a mutable attribute in place (e.g. appending
+        to a list) isn't seen: assign it again to refresh the cache.
         """
-        result = {}
-        for key, value in self.__dict__.items():
-            if not for_serialization and key[0] == '_':
-                continue
-            if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
-            else:
-                result[key] = value
+        return dict(self._cached_json(for_serialization))
+
+    def _cached_json(self, for_serialization: bool) -> dict:
+        """ Return the cached to_json() result, building it if needed
+
+        The dict is shared with later calls: callers must not modify it
+        """
+        cache = self.__dict__.get(_JSON_CACHE)
+        if cache is None:
+            # An assignment during the build below pops this dict off
+            # the instance, so a stale result is never seen again
+            cache = {}
+            self.__dict__[_JSON_CACHE] = cache
+        result = cache.get(for_serialization)
+        if result is None:
+            result = {}
+            for key, value in list(self.__dict__.items()):
+                if key in TRANSIENT_ATTRIBUTES:
+                    continue
+                if not for_serialization and key[0] == '_':
+                    continue
+                if type(value) is datetime:
+                    result[key] = value.strftime(TIMESTAMP_FORMAT)
+                else:
+                    result[key] = value
+            cache[for_serialization] = result
         return result
 
     @classmethod
@@ -74,16 +353,109 @@ class Base():
         The instances are loaded from a JSON file with the same name
         as the class
         """
+        file_path = _file_path(cls.__name__)
+        with _file_lock(file_path, shared=True):
+            cls._read_file()
+
+    @classmethod
+    def _read_file(cls):
+        """ Replace the instances in memory by the ones in the file
+
+        In snapshot storage, the snapshot is only mapped: records are
+        decoded when read. If there is no snapshot yet, the JSON file
+        is loaded, to be written as a snapshot on the next save.
+
+        The caller holds the file lock
+        """
+        s_class = cls.__name__
+        file_path = _file_path(s_class)
+        _CLASSES[s_class] = cls
+        stamp = _file_stamp(file_path)
+        objs = {}
+        json_path = ".db_{}.json".format(s_class)
+        if STORAGE == 'snapshot' and stamp is not None:
+            objs = SnapshotStore(cls, open_snapshot(file_path),
+                                 max_resident=cls.max_resident)
+        elif os.path.exists(json_path):
+            with open(json_path, 'r') as f:
+                objs_json = json.load(f)
+                for obj_id, obj_json in objs_json.items():
+                    objs[obj_id] = cls(**obj_json)
+
+        with DATA_LOCK.write():
+            DATA[s_class] = objs
+            INDEXES.pop(s_class, None)
+            _UNSAVED.pop(s_class, None)
+            _bump(s_class)
+        FILE_STAMPS[s_class] = stamp
+        LOADS[s_class] = LOADS.get(s_class, 0) + 1
+
+    @classmethod
+    def _reload_if_stale(cls):
+        """ Reload the instances if another process rewrote the file
+
+        The caller holds the file lock
+        """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
+        _CLASSES[s_class] = cls
+        if _file_stamp(_file_path(s_class)) != FILE_STAMPS.get(s_class):
+            cls._read_file()
+
+    @classmethod
+    def _write_file(cls):
+        """ Write the instances in memory to the file
+
+        The caller holds _PERSIST_LOCK and the file lock
+        """
+        s_class = cls.__name__
+        file_path = _file_path(s_class)
+        tmp_path = "{}.{}.tmp".format(file_path, os.getpid())
+        if STORAGE == 'snapshot':
+            cls._write_snapshot(file_path, tmp_path)
             return
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        with DATA_LOCK.read():
+            objs = list(DATA[s_class].items())
+        objs_json = {}
+        for obj_id, obj in objs:
+            objs_json[obj_id] = obj._cached_json(True)
+
+        with open(tmp_path, 'w') as f:
+            json.dump(objs_json, f)
+        os.replace(tmp_path, file_path)
+        _CLASSES[s_class] = cls
+        FILE_STAMPS[s_class] = _file_stamp(file_path)
+
+    @classmethod
+    def _write_snapshot(cls, file_path: str, tmp_path: str):
+        """ Write the instances to a new snapshot and switch to it
+
+        Records never decoded are copied from the current snapshot.
+
+        The caller holds _PERSIST_LOCK and the file lock
+        """
+        s_class = cls.__name__
+        with DATA_LOCK.read():
+            store = DATA[s_class]
+            if isinstance(store, SnapshotStore):
+                # records() is lazy: read it whole while the lock holds
+                records = list(store.records())
+            else:
+                records = [(obj_id, json.dumps(obj._cached_json(True))
+                            .encode('utf-8'))
+                           for obj_id, obj in list(store.items())]
+        write_snapshot(tmp_path, records)
+        os.replace(tmp_path, file_path)
+        snapshot = open_snapshot(file_path)
+        with DATA_LOCK.write():
+            store = DATA[s_class]
+            if isinstance(store, SnapshotStore):
+                store.rebase(snapshot)
+            else:
+                DATA[s_class] = SnapshotStore(cls, snapshot, store,
+                                              cls.max_resident)
+        _CLASSES[s_class] = cls
+        FILE_STAMPS[s_class] = _file_stamp(file_path)
 
     @classmethod
     def save_to_file(cls):
@@ -92,25 +464,59 @@ class Base():
         The instances are saved to a JSON file with the same name
         as the class
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
-
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+        with _PERSIST_LOCK, _file_lock(_file_path(cls.__name__)):
+            cls._write_file()
 
     def save(self):
         """ Save the current instance
 
         The instance is saved to the file and the updated_at
-        attribute is updated
+        attribute is updated. Changes written to the file by other
+        processes are loaded first so they aren't overwritten.
         """
         s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        with _PERSIST_LOCK, _file_lock(_file_path(s_class)):
+            self.__class__._reload_if_stale()
+            with DATA_LOCK.write():
+                self._version = _next_version(s_class, self)
+                DATA[s_class][self.id] = self
+                _index_add(s_class, self)
+                _bump(s_class)
+            self.__class__._write_file()
+
+    @classmethod
+    def save_many(cls, objs: Iterable[TypeVar('Base')],
+                  existing_only: bool = False) -> int:
+        """ Save several instances with a single write of the file
+
+        Unlike save(), updated_at is left as is, so imported records
+        keep their original timestamps. With existing_only, instances
+        no longer stored, e.g. removed by another process, are skipped
+        rather than saved again.
+
+        Return the number of instances saved
+        """
+        s_class = cls.__name__
+        objs = list(objs)
+        if len(objs) == 0:
+            return 0
+        with _PERSIST_LOCK, _file_lock(_file_path(s_class)):
+            cls._reload_if_stale()
+            saved = 0
+            with DATA_LOCK.write():
+                for obj in objs:
+                    if existing_only and obj.id not in DATA[s_class]:
+                        continue
+                    obj._version = _next_version(s_class, obj)
+                    DATA[s_class][obj.id] = obj
+                    _index_add(s_class, obj)
+                    saved += 1
+                if saved > 0:
+                    _bump(s_class)
+            if saved > 0:
+                cls._write_file()
+        return saved
 
     def remove(self):
         """ Remove the current instance
@@ -118,9 +524,42 @@ class Base():
         The instance is removed from the file
         """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        with _PERSIST_LOCK, _file_lock(_file_path(s_class)):
+            self.__class__._reload_if_stale()
+            with DATA_LOCK.write():
+                removed = DATA[s_class].pop(self.id, None)
+                _index_discard(s_class, self.id)
+                if removed is not None:
+                    _bump(s_class)
+            if removed is not None:
+                self.__class__._write_file()
+
+    @classmethod
+    def remove_many(cls, ids: Iterable[str]) -> int:
+        """ Remove several instances by ID with a single write of the file
+
+        The file is rewritten from the remaining instances only, so the
+        space of the removed ones is reclaimed.
+
+        Return the number of instances removed
+        """
+        s_class = cls.__name__
+        ids = list(ids)
+        if len(ids) == 0:
+            return 0
+        with _PERSIST_LOCK, _file_lock(_file_path(s_class)):
+            cls._reload_if_stale()
+            removed = 0
+            with DATA_LOCK.write():
+                for obj_id in ids:
+                    if DATA[s_class].pop(obj_id, None) is not None:
+                        _index_discard(s_class, obj_id)
+                        removed += 1
+                if removed > 0:
+                    _bump(s_class)
+            if removed > 0:
+                cls._write_file()
+        return removed
 
     @classmethod
     def count(cls) -> int:
@@ -129,12 +568,51 @@ class Base():
         Return the number of instances
         """
         s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        with DATA_LOCK.read():
+            return len(DATA[s_class])
+
+    @classmethod
+    def collection_version(cls) -> int:
+        """ Return the version of the collection of instances
+
+        It changes whenever an instance is saved or removed, or the
+        class reloaded, in this process. It's only meaningful within
+        the process: see digest() for a value shared by processes.
+        """
+        with DATA_LOCK.read():
+            return VERSIONS.get(cls.__name__, 0)
+
+    @classmethod
+    def digest(cls) -> str:
+        """ Return a digest of the IDs and versions of all instances
+
+        Two processes holding the same instances get the same digest,
+        whatever order they were loaded or saved in: instances are
+        hashed by ID order. It's computed again only when the collection
+        version changed, without serializing any instance.
+
+        Return the digest in hex
+        """
+        s_class = cls.__name__
+        version = cls.collection_version()
+        cached = _DIGESTS.get(s_class)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        h = hashlib.blake2b(digest_size=16)
+        for obj_id, obj_version in sorted((obj.id, obj.version)
+                                          for obj in cls.all()):
+            h.update("{}:{}\n".format(obj_id, obj_version).encode())
+        digest = h.hexdigest()
+        _DIGESTS[s_class] = (version, digest)
+        return digest
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
         """ Return all instances
 
+        In snapshot storage, records not in memory are decoded first,
+        see search().
+
         Return an iterable of all instances
         """
         return cls.search()
@@ -143,15 +621,30 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one instance by ID
 
-        Return the instance with the given ID
+        Return the instance with the given ID. In snapshot storage,
+        only this record is decoded from the snapshot.
         """
         s_class = cls.__name__
-        return DATA[s_class].get(id)
+        with DATA_LOCK.read():
+            return DATA[s_class].get(id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all instances with matching attributes
 
+        When an attribute of hash_indexed_attributes (or, for a value
+        other than None, of indexed_attributes) is given, candidates
+        come from its index instead of a scan of every instance. Indexes
+        follow save() and remove(), and instances assigned a new value
+        without being saved are checked as well, so the result is the
+        one of a scan. Values an index can't look up (unhashable, or
+        not of the type of the values it sorts) are searched by a scan.
+
+        A scan in snapshot storage decodes every record not in memory.
+        Decoded instances are kept, so the next scans are as cheap as in
+        JSON storage, unless max_resident is below the number of
+        instances: then the evicted ones are decoded again on each scan.
+
         Return a list of instances that match the given attributes
         """
         s_class = cls.__name__
@@ -162,5 +655,128 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        indexed = [attr for attr, v in attributes.items()
+                   if attr in cls.hash_indexed_attributes or
+                   (attr in cls.indexed_attributes and v is not None)]
+        if len(indexed) == 0:
+            with DATA_LOCK.read():
+                objs = list(DATA[s_class].values())
+            return list(filter(_search, objs))
+
+        attr = indexed[0]
+        value = attributes[attr]
+        objs = cls._from_index(attr, lambda index: index.lookup(value)
+                               if index.accepts(value) else None)
+        if objs is None:
+            with DATA_LOCK.read():
+                objs = list(DATA[s_class].values())
+        return list(filter(_search, objs))
+
+    @classmethod
+    def query(cls, filters: dict = {}) -> List[TypeVar('Base')]:
+        """ Search all instances matching equality and range filters
+
+        Each filter value is either compared for equality, as in
+        search(), or is a dict of operators that must all hold:
+        gt, gte, lt, lte (bounds compared with the attribute value,
+        so use datetime objects for timestamps), prefix (string
+        starting with) and in (value in a list). For example
+        {"created_at": {"gte": since}, "email": {"prefix": "bob"}}.
+
+        The first filter on an attribute of indexed_attributes is
+        answered by bisecting a sorted index; the others are checked
+        on the instances it yields. Without one, or when its arguments
+        aren't of the type of the indexed values, all instances are
+        scanned.
+
+        Return a list of instances that match all filters
+        """
+        s_class = cls.__name__
+        for attr, value in filters.items():
+            if type(value) is dict and not _is_operators(value):
+                raise ValueError("Unknown query operator in {}: {}"
+                                 .format(attr, list(value.keys())))
+
+        def _query(obj):
+            for k, v in filters.items():
+                if _is_operators(v):
+                    if not _matches(getattr(obj, k, None), v):
+                        return False
+                elif getattr(obj, k, None) != v:
+                    return False
+            return True
+
+        indexed = [attr for attr, v in filters.items()
+                   if attr in cls.indexed_attributes and _is_operators(v)]
+        if len(indexed) == 0:
+            with DATA_LOCK.read():
+                objs = list(DATA[s_class].values())
+            return list(filter(_query, objs))
+
+        attr = indexed[0]
+        objs = cls._from_index(attr, lambda index: _candidates(
+            index, filters[attr]))
+        if objs is None:
+            with DATA_LOCK.read():
+                objs = list(DATA[s_class].values())
+        return list(filter(_query, objs))
+
+    @classmethod
+    def _from_index(cls, attr: str, candidates) -> list:
+        """ Return the instances an index of an attribute yields
+
+        candidates is called with the index, built first if needed,
+        and returns IDs, or None when the index can't answer: then None
+        is returned. The instances changed since they were indexed are
+        added to the ones found.
+        """
+        s_class = cls.__name__
+        with DATA_LOCK.read():
+            index = INDEXES.get(s_class, {}).get(attr)
+            if index is not None:
+                return cls._instances(candidates(index))
+        with DATA_LOCK.write():
+            index = cls._build_index(attr)
+            return cls._instances(candidates(index))
+
+    @classmethod
+    def _instances(cls, ids: List[str]) -> list:
+        """ Return the instances of IDs and the unsaved ones
+
+        The caller holds DATA_LOCK
+        """
+        if ids is None:
+            return None
+        s_class = cls.__name__
+        objs = [DATA[s_class][obj_id] for obj_id in ids]
+        unsaved = _UNSAVED.get(s_class)
+        if unsaved:
+            found = set(ids)
+            for obj_id in list(unsaved):
+                if obj_id in found:
+                    continue
+                obj = DATA[s_class].get(obj_id)
+                if obj is None:
+                    unsaved.discard(obj_id)
+                else:
+                    objs.append(obj)
+        return objs
+
+    @classmethod
+    def _build_index(cls, attr: str):
+        """ Return the index of an attribute, building it if needed
+
+        The caller holds DATA_LOCK for writing
+        """
+        s_class = cls.__name__
+        indexes = INDEXES.setdefault(s_class, {})
+        if indexes.get(attr) is None:
+            if attr in cls.hash_indexed_attributes:
+                index = HashIndex(attr)
+            else:
+                index = SortedIndex(attr)
+            for obj in DATA[s_class].values():
+                index.add(obj)
+            indexes[attr] = index
+        return indexes[attr]
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+""" Background snapshot module
+
+Backs up the whole store without blocking requests: the process forks
+and the child writes every class from its copy-on-write view of DATA,
+while the parent keeps serving. The backup is a set of .db_<Class>.json
+files, the same format as JSON storage, so restoring is a copy. They
+hold password hashes, so only the owner can read them.
+
+It isn't exposed by the API. Either run it from the command line:
+
+    python3 -m models.bgsave [--directory DIR]
+
+or, with DB_BGSAVE_SIGNAL=1, send SIGUSR1 to a running API process,
+which only its owner (or root) can do.
+"""
+from datetime import datetime
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+from models.base import DATA, DATA_LOCK, TIMESTAMP_FORMAT
+from models.snapshot import SnapshotStore
+
+
+BACKUP_DIR = os.getenv('DB_BACKUP_DIR', 'backup')
+# Status of the last background save, read by the API
+LAST_BGSAVE = {"in_progress": False}
+_bgsave_lock = threading.Lock()
+# Thread collecting the report of the running save, if any
+_waiter = None
+
+
+def _write_class(store, file_path: str) -> int:
+    """ Stream the instances of a class to a JSON file
+
+    Only lock-free reads of the store are used: locks held by other
+    threads at fork time are never released in the child.
+
+    Returns:
+        int: the size of the file written
+    """
+    if isinstance(store, SnapshotStore):
+        records = store.records()
+    else:
+        records = ((obj_id, json.dumps(obj._cached_json(True)).encode())
+                   for obj_id, obj in list(store.items()))
+    tmp_path = "{}.tmp".format(file_path)
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(b"{")
+        sep = b""
+        for obj_id, raw in records:
+            f.write(sep)
+            f.write(json.dumps(obj_id).encode())
+            f.write(b": ")
+            f.write(raw)
+            sep = b", "
+        f.write(b"}")
+    os.replace(tmp_path, file_path)
+    return os.path.getsize(file_path)
+
+
+def _child(directory: str, write_fd: int):
+    """ Write the backup from the forked child and report through a pipe
+    """
+    status = 1
+    try:
+        start = time.monotonic()
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        files = {}
+        for s_class, store in list(DATA.items()):
+            file_path = os.path.join(directory, ".db_{}.json".format(s_class))
+            files[file_path] = _write_class(store, file_path)
+        report = {"files": files, "bytes": sum(files.values()),
+                  "write_seconds": time.monotonic() - start}
+        status = 0
+    except Exception as e:
+        report = {"error": str(e)}
+    try:
+        os.write(write_fd, json.dumps(report).encode())
+    finally:
+        os._exit(status)
+
+
+def _wait(pid: int, read_fd: int, started: float):
+    """ Collect the report of the child and record it in LAST_BGSAVE
+    """
+    chunks = []
+    with os.fdopen(read_fd, 'rb') as f:
+        for chunk in iter(lambda: f.read(4096), b""):
+            chunks.append(chunk)
+    _, code = os.waitpid(pid, 0)
+    try:
+        report = json.loads(b"".join(chunks).decode())
+    except ValueError:
+        report = {"error": "child exited with status {}".format(code)}
+    report["duration_seconds"] = time.monotonic() - started
+    with _bgsave_lock:
+        LAST_BGSAVE.update(report)
+        LAST_BGSAVE["in_progress"] = False
+        LAST_BGSAVE["finished_at"] = \
+            datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+
+
+def bgsave(directory: str = None) -> int:
+    """ Start a background save of every class of DATA
+
+    The fork happens while holding DATA_LOCK for reading, so the
+    child never sees a class in the middle of a save. Progress and the
+    final duration, size and files are recorded in LAST_BGSAVE.
+
+    Args:
+        directory (str): where to write, default DB_BACKUP_DIR or backup
+
+    Returns:
+        int: the PID of the child, None if a save is already running
+
+    Raises:
+        OSError: if the platform can't fork
+    """
+    global _waiter
+    if not hasattr(os, 'fork'):
+        raise OSError("background save needs os.fork")
+    directory = directory or BACKUP_DIR
+    with _bgsave_lock:
+        if LAST_BGSAVE.get("in_progress"):
+            return None
+        LAST_BGSAVE.clear()
+        LAST_BGSAVE.update({
+            "in_progress": True,
+            "directory": directory,
+            "started_at": datetime.utcnow().strftime(TIMESTAMP_FORMAT),
+        })
+
+    read_fd, write_fd = os.pipe()
+    started = time.monotonic()
+    with DATA_LOCK.read():
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            _child(directory, write_fd)
+    os.close(write_fd)
+    with _bgsave_lock:
+        LAST_BGSAVE["pid"] = pid
+        LAST_BGSAVE["fork_seconds"] = time.monotonic() - started
+    waiter = threading.Thread(target=_wait, args=(pid, read_fd, started),
+                              daemon=True)
+    waiter.start()
+    # Published once started: bgsave_wait() can't join it before
+    _waiter = waiter
+    return pid
+
+
+def bgsave_wait(timeout: float = None) -> dict:
+    """ Wait for the running background save, if any, to finish
+
+    Args:
+        timeout (float): most seconds to wait, None for no limit
+
+    Returns:
+        dict: the status of the last background save
+    """
+    waiter = _waiter
+    if waiter is not None:
+        waiter.join(timeout)
+    return bgsave_status()
+
+
+def bgsave_status() -> dict:
+    """ Return a copy of the status of the last background save
+    """
+    with _bgsave_lock:
+        return dict(LAST_BGSAVE)
+
+
+def _signalled_bgsave():
+    """ Run a background save and log its outcome to stderr
+    """
+    if bgsave() is not None:
+        print("bgsave: {}".format(json.dumps(bgsave_wait())),
+              file=sys.stderr)
+
+
+def _on_signal(signum, frame):
+    """ Start a background save from a signal, outside of the handler
+    """
+    threading.Thread(target=_signalled_bgsave, daemon=True).start()
+
+
+def install_signal_handler(signum: int = None) -> bool:
+    """ Start a background save whenever the process receives a signal
+
+    Args:
+        signum (int): the signal, default SIGUSR1
+
+    Returns:
+        bool: False where signals can't be handled: off the main
+        thread, or on a platform without SIGUSR1
+    """
+    if signum is None:
+        signum = getattr(signal, 'SIGUSR1', None)
+    if signum is None or \
+            threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signum, _on_signal)
+    return True
+
+
+def main(argv: list = None) -> int:
+    """ Command line entry point: back up the store of this directory
+    """
+    from models.bulk import MODELS
+
+    parser = argparse.ArgumentParser(prog="python3 -m models.bgsave")
+    parser.add_argument("--directory", default=BACKUP_DIR,
+                        help="where to write the backup")
+    args = parser.parse_args(argv)
+
+    for cls in MODELS.values():
+        cls.load_from_file()
+    bgsave(args.directory)
+    status = bgsave_wait()
+    print(json.dumps(status, indent=2))
+    return 1 if "error" in status else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
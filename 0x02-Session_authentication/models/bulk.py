@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+""" Bulk import/export of model instances
+
+Usage:
+    python3 -m models.bulk import FILE [--model User] [--format csv|jsonl]
+    python3 -m models.bulk export FILE [--model User] [--format csv|jsonl]
+
+FILE may be - for stdin/stdout. The format defaults to the extension of
+FILE (.csv, otherwise JSON Lines).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
+import argparse
+import csv
+import json
+import os
+import sys
+
+from models.base import DATA, DATA_LOCK
+from models.user import User, hash_password
+from models.user_session import UserSession
+
+
+MODELS = {
+    "User": User,
+    "UserSession": UserSession,
+}
+BATCH_SIZE = 10000
+
+
+def read_records(f, fmt: str) -> Iterator[dict]:
+    """ Stream records from a CSV or JSON Lines file
+
+    Empty CSV cells are read as None.
+
+    Args:
+        f: file object open for reading
+        fmt (str): csv or jsonl
+
+    Returns:
+        iterator of dict, one per record
+    """
+    if fmt == "csv":
+        for row in csv.DictReader(f):
+            yield {k: (v if v != "" else None) for k, v in row.items()}
+        return
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _user_fields(record: dict) -> dict:
+    """ Map a record to User keyword arguments
+
+    A clear text "password" column is kept aside to be hashed, and a
+    "name" column (as in user_data.csv) fills first_name/last_name.
+    """
+    kwargs = dict(record)
+    name = kwargs.pop("name", None)
+    if name and kwargs.get("first_name") is None \
+            and kwargs.get("last_name") is None:
+        parts = name.split(" ", 1)
+        kwargs["first_name"] = parts[0]
+        kwargs["last_name"] = parts[1] if len(parts) > 1 else None
+    return kwargs
+
+
+def import_records(cls, records: Iterable[dict], workers: int = None,
+                   batch_size: int = BATCH_SIZE) -> int:
+    """ Create instances from records and persist them once
+
+    Clear text passwords of User records are hashed by a pool of
+    worker processes, one batch of records at a time.
+
+    Args:
+        cls: the model class
+        records (iterable): dicts of attributes
+        workers (int): number of hashing processes, default CPU count
+        batch_size (int): records hashed per batch
+
+    Returns:
+        int: the number of instances imported
+    """
+    records = iter(records)
+    objs = []
+    pool = None
+    workers = workers or os.cpu_count() or 1
+    if cls is User and workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            batch = list(islice(records, batch_size))
+            if len(batch) == 0:
+                break
+            if cls is not User:
+                objs.extend(cls(**record) for record in batch)
+                continue
+            batch = [_user_fields(record) for record in batch]
+            pwds = [record.pop("password", None) for record in batch]
+            todo = [i for i, pwd in enumerate(pwds) if pwd]
+            clear = [pwds[i] for i in todo]
+            if pool is not None:
+                chunksize = max(1, len(clear) // (4 * workers))
+                hashed = pool.map(hash_password, clear, chunksize=chunksize)
+            else:
+                hashed = map(hash_password, clear)
+            for i, digest in zip(todo, hashed):
+                batch[i]["_password"] = digest
+            objs.extend(User(**record) for record in batch)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return cls.save_many(objs)
+
+
+def export_records(cls, f, fmt: str) -> int:
+    """ Stream all instances of a class to a CSV or JSON Lines file
+
+    Records are serialized with to_json(True), so an export can be
+    imported back as is.
+
+    Args:
+        cls: the model class
+        f: file object open for writing
+        fmt (str): csv or jsonl
+
+    Returns:
+        int: the number of instances exported
+    """
+    with DATA_LOCK.read():
+        objs = list(DATA.get(cls.__name__, {}).values())
+    writer = None
+    for obj in objs:
+        record = obj.to_json(True)
+        if fmt != "csv":
+            f.write(json.dumps(record))
+            f.write("\n")
+            continue
+        if writer is None:
+            writer = csv.DictWriter(f, fieldnames=list(record.keys()),
+                                    extrasaction='ignore')
+            writer.writeheader()
+        writer.writerow(record)
+    return len(objs)
+
+
+def _open(file_path: str, mode: str):
+    """ Open a file, - meaning stdin or stdout
+    """
+    if file_path == "-":
+        return os.fdopen(os.dup((sys.stdin if mode == 'r'
+                                 else sys.stdout).fileno()), mode,
+                         newline='')
+    return open(file_path, mode, newline='')
+
+
+def main(argv: list = None) -> int:
+    """ Command line entry point
+    """
+    parser = argparse.ArgumentParser(prog="python3 -m models.bulk")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("file")
+    parser.add_argument("--model", choices=sorted(MODELS), default="User")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--workers", type=int, default=None,
+                        help="password hashing processes (import)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "csv" if args.file.endswith(".csv") else "jsonl"
+    cls = MODELS[args.model]
+    cls.load_from_file()
+
+    if args.command == "import":
+        with _open(args.file, 'r') as f:
+            count = import_records(cls, read_records(f, fmt),
+                                   args.workers, args.batch_size)
+    else:
+        with _open(args.file, 'w') as f:
+            count = export_records(cls, f, fmt)
+    print("{} {} {}ed".format(count, args.model, args.command),
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
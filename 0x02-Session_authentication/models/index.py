@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+""" Index module
+"""
+from bisect import bisect_left, bisect_right
+from typing import List
+
+
+# Sorts after any character, so prefix + _MAX_CHAR bounds a prefix range
+_MAX_CHAR = chr(0x10FFFF)
+
+
+class SortedIndex():
+    """ Sorted index of one attribute over the instances of a class
+
+    Values and ids are kept in two aligned lists sorted by value, so
+    ranges and prefixes are found with bisect. Instances whose value
+    is None aren't indexed: they can't match a range or a prefix.
+
+    The values sorted are those of the type of the first one indexed.
+    Values of another type, which may not compare with them, are kept
+    apart: ranges and prefixes never return them, and accepts() tells
+    equality lookups to scan instead.
+    """
+
+    def __init__(self, attribute: str):
+        """ Initialize a SortedIndex instance
+
+        Args:
+            attribute (str): name of the indexed attribute
+        """
+        self.attribute = attribute
+        self.value_type = None
+        self._values = []
+        self._ids = []
+        self._value_by_id = {}
+        # {ID: value} of the values not of value_type
+        self._others = {}
+
+    def __len__(self) -> int:
+        """ Return the number of indexed instances
+        """
+        return len(self._value_by_id)
+
+    def add(self, obj) -> None:
+        """ Index an instance, replacing its previous entry if any
+
+        Args:
+            obj (Base): the instance to index
+        """
+        self.discard(obj.id)
+        value = getattr(obj, self.attribute, None)
+        if value is None:
+            return
+        self._value_by_id[obj.id] = value
+        if self.value_type is None:
+            self.value_type = type(value)
+        if type(value) is not self.value_type:
+            self._others[obj.id] = value
+            return
+        pos = bisect_right(self._values, value)
+        self._values.insert(pos, value)
+        self._ids.insert(pos, obj.id)
+
+    def discard(self, obj_id: str) -> None:
+        """ Remove the entry of an instance, if indexed
+
+        Args:
+            obj_id (str): ID of the instance
+        """
+        if obj_id not in self._value_by_id:
+            return
+        value = self._value_by_id.pop(obj_id)
+        if self._others.pop(obj_id, None) is not None:
+            return
+        lo = bisect_left(self._values, value)
+        hi = bisect_right(self._values, value)
+        pos = self._ids.index(obj_id, lo, hi)
+        del self._values[pos]
+        del self._ids[pos]
+
+    def range(self, lower=None, upper=None,
+              include_lower: bool = True,
+              include_upper: bool = True) -> List[str]:
+        """ Return the IDs whose value lies between two bounds
+
+        Args:
+            lower: lowest value, None for no lower bound
+            upper: highest value, None for no upper bound
+            include_lower (bool): whether lower itself matches
+            include_upper (bool): whether upper itself matches
+
+        Returns:
+            list: IDs in ascending order of value
+        """
+        lo = 0
+        hi = len(self._values)
+        if lower is not None:
+            if include_lower:
+                lo = bisect_left(self._values, lower)
+            else:
+                lo = bisect_right(self._values, lower)
+        if upper is not None:
+            if include_upper:
+                hi = bisect_right(self._values, upper)
+            else:
+                hi = bisect_left(self._values, upper)
+        return self._ids[lo:hi]
+
+    def value_of(self, obj_id: str):
+        """ Return the indexed value of an instance, None if not indexed
+
+        Args:
+            obj_id (str): ID of the instance
+        """
+        return self._value_by_id.get(obj_id)
+
+    def accepts(self, value) -> bool:
+        """ Tell whether lookup() of a value finds every match
+
+        It's the case when every indexed value has the type of value,
+        so they all compare with it.
+
+        Args:
+            value: the value to match
+        """
+        if value is None or len(self._others) > 0:
+            return False
+        return self.value_type is None or type(value) is self.value_type
+
+    def lookup(self, value) -> List[str]:
+        """ Return the IDs whose value equals a value
+
+        Args:
+            value: the value to match, None never matches, see accepts()
+
+        Returns:
+            list: IDs
+        """
+        if value is None:
+            return []
+        return self.range(value, value)
+
+    def prefix(self, prefix: str) -> List[str]:
+        """ Return the IDs whose string value starts with a prefix
+
+        Args:
+            prefix (str): the prefix to match
+
+        Returns:
+            list: IDs in ascending order of value
+        """
+        return self.range(prefix, prefix + _MAX_CHAR, True, False)
+
+
+class HashIndex():
+    """ Hash index of one attribute over the instances of a class
+
+    Maps each value to the IDs holding it, for equality lookups in
+    constant time. None is indexed like any other value.
+    """
+
+    def __init__(self, attribute: str):
+        """ Initialize a HashIndex instance
+
+        Args:
+            attribute (str): name of the indexed attribute
+        """
+        self.attribute = attribute
+        self._ids_by_value = {}
+        self._value_by_id = {}
+
+    def __len__(self) -> int:
+        """ Return the number of indexed instances
+        """
+        return len(self._value_by_id)
+
+    def add(self, obj) -> None:
+        """ Index an instance, replacing its previous entry if any
+
+        Args:
+            obj (Base): the instance to index
+        """
+        self.discard(obj.id)
+        value = getattr(obj, self.attribute, None)
+        self._ids_by_value.setdefault(value, {})[obj.id] = None
+        self._value_by_id[obj.id] = value
+
+    def value_of(self, obj_id: str):
+        """ Return the indexed value of an instance, None if not indexed
+
+        Args:
+            obj_id (str): ID of the instance
+        """
+        return self._value_by_id.get(obj_id)
+
+    def accepts(self, value) -> bool:
+        """ Tell whether lookup() can take a value: it must be hashable
+
+        Args:
+            value: the value to match
+        """
+        try:
+            hash(value)
+        except TypeError:
+            return False
+        return True
+
+    def discard(self, obj_id: str) -> None:
+        """ Remove the entry of an instance, if indexed
+
+        Args:
+            obj_id (str): ID of the instance
+        """
+        if obj_id not in self._value_by_id:
+            return
+        value = self._value_by_id.pop(obj_id)
+        ids = self._ids_by_value[value]
+        del ids[obj_id]
+        if len(ids) == 0:
+            del self._ids_by_value[value]
+
+    def lookup(self, value) -> List[str]:
+        """ Return the IDs whose value equals a value
+
+        Args:
+            value: the value to match
+
+        Returns:
+            list: IDs, in insertion order
+        """
+        return list(self._ids_by_value.get(value, ()))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+""" Locks module
+"""
+from contextlib import contextmanager
+import threading
+
+
+class ReadWriteLock():
+    """ Reader/writer lock
+
+    Any number of readers may hold the lock at the same time, a writer
+    holds it alone. Waiting writers block new readers so a steady stream
+    of reads can't starve a write. The lock is not reentrant: a thread
+    must not acquire it again while already holding it.
+    """
+
+    def __init__(self):
+        """ Initialize a ReadWriteLock instance
+        """
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        """ Acquire the lock for reading
+        """
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        """ Release the lock after reading
+        """
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        """ Acquire the lock for writing
+        """
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        """ Release the lock after writing
+        """
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        """ Context manager holding the lock for reading
+        """
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        """ Context manager holding the lock for writing
+        """
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+""" Snapshot module
+
+Binary snapshot of the instances of one class, read through mmap so a
+single record can be decoded without parsing the rest of the file, and
+so worker processes opening the same file share its page cache.
+
+Layout (little endian):
+    header   magic "BSNP", version u16, key size u16, count u64,
+             index offset u64
+    records  to_json(True) of each instance, UTF-8 JSON, back to back
+    index    count fixed size entries sorted by ID: ID (NUL padded to
+             key size), record offset u64, record length u32
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Iterable, Iterator, Tuple
+import json
+import mmap
+import os
+import struct
+import threading
+
+
+MAGIC = b"BSNP"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHQQ")
+_ENTRY = struct.Struct("<QI")
+
+
+def write_snapshot(file_path: str,
+                   records: Iterable[Tuple[str, bytes]]) -> int:
+    """ Write a snapshot file
+
+    Args:
+        file_path (str): path of the file to write
+        records (iterable): (ID, encoded record) pairs
+
+    Returns:
+        int: the number of records written
+    """
+    entries = []
+    with open(file_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        offset = _HEADER.size
+        for obj_id, raw in records:
+            entries.append((obj_id.encode('utf-8'), offset, len(raw)))
+            f.write(raw)
+            offset += len(raw)
+        entries.sort()
+        key_size = max([len(key) for key, _, _ in entries] or [0])
+        for key, rec_offset, length in entries:
+            f.write(key.ljust(key_size, b"\0"))
+            f.write(_ENTRY.pack(rec_offset, length))
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, key_size, len(entries), offset))
+    return len(entries)
+
+
+class Snapshot():
+    """ Read-only, memory-mapped snapshot file
+    """
+
+    def __init__(self, file_path: str):
+        """ Open a snapshot file
+
+        Args:
+            file_path (str): path of the file
+
+        Raises:
+            ValueError: if the file isn't a snapshot
+        """
+        with open(file_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, key_size, count, index_offset = \
+            _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a snapshot file".format(file_path))
+        self._key_size = key_size
+        self._count = count
+        self._index_offset = index_offset
+        self._entry_size = key_size + _ENTRY.size
+
+    def __len__(self) -> int:
+        """ Return the number of records
+        """
+        return self._count
+
+    def _key_at(self, i: int) -> bytes:
+        """ Return the padded ID of the i-th index entry
+        """
+        start = self._index_offset + i * self._entry_size
+        return self._mm[start:start + self._key_size]
+
+    def _find(self, obj_id: str) -> int:
+        """ Binary search the index, return the entry number or -1
+        """
+        key = obj_id.encode('utf-8')
+        if len(key) > self._key_size:
+            return -1
+        key = key.ljust(self._key_size, b"\0")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._key_at(lo) == key:
+            return lo
+        return -1
+
+    def _raw_at(self, i: int) -> bytes:
+        """ Return the encoded record of the i-th index entry
+        """
+        start = self._index_offset + i * self._entry_size + self._key_size
+        offset, length = _ENTRY.unpack_from(self._mm, start)
+        return self._mm[offset:offset + length]
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ Tell whether the snapshot holds a record
+        """
+        return self._find(obj_id) >= 0
+
+    def get_raw(self, obj_id: str) -> bytes:
+        """ Return the encoded record of an ID, None if missing
+        """
+        i = self._find(obj_id)
+        if i < 0:
+            return None
+        return self._raw_at(i)
+
+    def get(self, obj_id: str) -> dict:
+        """ Return the decoded record of an ID, None if missing
+        """
+        raw = self.get_raw(obj_id)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def ids(self) -> Iterator[str]:
+        """ Iterate over the IDs, in sorted order
+        """
+        for i in range(self._count):
+            yield self._key_at(i).rstrip(b"\0").decode('utf-8')
+
+    def items_raw(self) -> Iterator[Tuple[str, bytes]]:
+        """ Iterate over (ID, encoded record) pairs, in ID order
+        """
+        for i in range(self._count):
+            yield (self._key_at(i).rstrip(b"\0").decode('utf-8'),
+                   self._raw_at(i))
+
+
+class SnapshotStore(MutableMapping):
+    """ Instances of a class, backed by a snapshot
+
+    Stands in for the dict of a class in DATA. Instances saved or
+    removed since the snapshot was written are tracked on top of it
+    until the next write, and always stay in memory. Records read, by
+    ID or by a scan, are decoded into instances and cached; with
+    max_resident set, the cache keeps that many instances at most and
+    evicts the least recently used ones, which are decoded again when
+    next read.
+    """
+
+    def __init__(self, cls, snapshot: Snapshot = None, objs: dict = None,
+                 max_resident: int = None):
+        """ Initialize a SnapshotStore instance
+
+        Args:
+            cls: the model class
+            snapshot (Snapshot): the snapshot, None for an empty one
+            objs (dict): instances already in the snapshot, by ID
+            max_resident (int): most cached instances, None for no limit
+        """
+        self._cls = cls
+        self._snapshot = snapshot
+        self.max_resident = max_resident
+        self._dirty = {}
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._new = set()
+        self._removed = set()
+        self.faults = 0
+        self.evictions = 0
+        for obj_id, obj in (objs or {}).items():
+            self._cache_put(obj_id, obj)
+
+    def _in_snapshot(self, obj_id: str) -> bool:
+        """ Tell whether an ID is in the snapshot, removed or not
+        """
+        return self._snapshot is not None and obj_id in self._snapshot
+
+    def _decode(self, obj_id: str):
+        """ Return the instance of an ID from the snapshot, None if missing
+        """
+        if obj_id in self._removed or self._snapshot is None:
+            return None
+        record = self._snapshot.get(obj_id)
+        if record is None:
+            return None
+        return self._cls(**record)
+
+    def _cache_get(self, obj_id: str):
+        """ Return a cached instance and mark it recently used
+        """
+        with self._cache_lock:
+            obj = self._cache.get(obj_id)
+            if obj is not None:
+                self._cache.move_to_end(obj_id)
+            return obj
+
+    def _cache_put(self, obj_id: str, obj):
+        """ Cache an instance, evicting the least recently used ones
+
+        Return the cached instance, which is the one already cached if
+        another thread decoded the same record first
+        """
+        with self._cache_lock:
+            obj = self._cache.setdefault(obj_id, obj)
+            self._cache.move_to_end(obj_id)
+            while self.max_resident is not None \
+                    and len(self._cache) > self.max_resident:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+            return obj
+
+    def __getitem__(self, obj_id: str):
+        """ Return the instance of an ID, decoding it if not in memory
+        """
+        obj = self._dirty.get(obj_id)
+        if obj is None:
+            obj = self._cache_get(obj_id)
+        if obj is None:
+            obj = self._decode(obj_id)
+            if obj is None:
+                raise KeyError(obj_id)
+            self.faults += 1
+            obj = self._cache_put(obj_id, obj)
+        return obj
+
+    def __setitem__(self, obj_id: str, obj):
+        """ Add or replace an instance
+        """
+        with self._cache_lock:
+            self._cache.pop(obj_id, None)
+        self._dirty[obj_id] = obj
+        self._removed.discard(obj_id)
+        if not self._in_snapshot(obj_id):
+            self._new.add(obj_id)
+
+    def __delitem__(self, obj_id: str):
+        """ Remove an instance
+        """
+        if obj_id not in self:
+            raise KeyError(obj_id)
+        with self._cache_lock:
+            self._cache.pop(obj_id, None)
+        self._dirty.pop(obj_id, None)
+        self._new.discard(obj_id)
+        if self._in_snapshot(obj_id):
+            self._removed.add(obj_id)
+
+    def __contains__(self, obj_id) -> bool:
+        """ Tell whether an ID is present, without decoding it
+        """
+        if obj_id in self._dirty:
+            return True
+        return obj_id not in self._removed and self._in_snapshot(obj_id)
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over the IDs
+        """
+        dirty = dict(self._dirty)
+        yield from dirty
+        if self._snapshot is None:
+            return
+        for obj_id in self._snapshot.ids():
+            if obj_id not in dirty and obj_id not in self._removed:
+                yield obj_id
+
+    def __len__(self) -> int:
+        """ Return the number of instances
+        """
+        count = len(self._new) - len(self._removed)
+        if self._snapshot is not None:
+            count += len(self._snapshot)
+        return count
+
+    def values(self):
+        """ Return all instances
+
+        Records not in memory are decoded and cached, so only the first
+        scan pays for decoding them all. With max_resident below the
+        number of records, each scan decodes the evicted ones again.
+        """
+        dirty = dict(self._dirty)
+        result = list(dirty.values())
+        if self._snapshot is None:
+            return result
+        for obj_id, raw in self._snapshot.items_raw():
+            if obj_id in dirty or obj_id in self._removed:
+                continue
+            obj = self._cache_get(obj_id)
+            if obj is None:
+                obj = self._cls(**json.loads(raw))
+                self.faults += 1
+                obj = self._cache_put(obj_id, obj)
+            result.append(obj)
+        return result
+
+    def items(self):
+        """ Return all (ID, instance) pairs, see values()
+        """
+        return [(obj.id, obj) for obj in self.values()]
+
+    def records(self) -> Iterator[Tuple[str, bytes]]:
+        """ Iterate over (ID, encoded record) pairs for a new snapshot
+
+        Instances saved since the last snapshot are encoded, the other
+        records are copied from the snapshot as is.
+        """
+        dirty = dict(self._dirty)
+        for obj_id, obj in dirty.items():
+            yield obj_id, json.dumps(obj._cached_json(True)).encode('utf-8')
+        if self._snapshot is None:
+            return
+        for obj_id, raw in self._snapshot.items_raw():
+            if obj_id not in dirty and obj_id not in self._removed:
+                yield obj_id, raw
+
+    def rebase(self, snapshot: Snapshot):
+        """ Switch to a snapshot holding every current instance
+
+        Instances saved since the previous snapshot become clean
+        cached instances, subject to eviction. The previous mapping is
+        left to be unmapped by the garbage collector, as readers may
+        still be using it.
+        """
+        dirty = self._dirty
+        self._snapshot = snapshot
+        self._dirty = {}
+        self._new = set()
+        self._removed = set()
+        for obj_id, obj in dirty.items():
+            self._cache_put(obj_id, obj)
+
+    def stats(self) -> dict:
+        """ Return counters of the store
+
+        resident: instances in memory, dirty: instances saved since
+        the snapshot, faults: records decoded into the cache,
+        evictions: instances dropped from the cache
+        """
+        return {
+            "resident": len(self._cache) + len(self._dirty),
+            "dirty": len(self._dirty),
+            "faults": self.faults,
+            "evictions": self.evictions,
+        }
+
+
+def open_snapshot(file_path: str) -> Snapshot:
+    """ Open a snapshot file, None if it doesn't exist
+    """
+    if not os.path.exists(file_path):
+        return None
+    return Snapshot(file_path)
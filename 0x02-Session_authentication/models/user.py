@@ -5,10 +5,24 @@ import hashlib
 from models.base import Base
 
 
+def hash_password(pwd: str) -> str:
+    """ Hash a password in SHA256
+    Hash a password in SHA256, as stored in User._password.
+
+    Args:
+        pwd: str, The password to hash.
+
+    Returns:
+        str: The lowercase hex digest.
+    """
+    return hashlib.sha256(pwd.encode()).hexdigest().lower()
+
+
 class User(Base):
     """ User class
     Represents a user.
     """
+    indexed_attributes = Base.indexed_attributes + ('email',)
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
@@ -45,7 +59,7 @@ class User(Base):
         if pwd is None or type(pwd) is not str:
             self._password = None
         else:
-            self._password = hashlib.sha256(pwd.encode()).hexdigest().lower()
+            self._password = hash_password(pwd)
 
     def is_valid_password(self, pwd: str) -> bool:
         """ Validate a password
@@ -61,8 +75,7 @@ class User(Base):
             return False
         if self.password is None:
             return False
-        pwd_e = pwd.encode()
-        return hashlib.sha256(pwd_e).hexdigest().lower() == self.password
+        return hash_password(pwd) == self.password
 
     def display_name(self) -> str:
         """ Display User name based on email/first_name/last_name
@@ -8,6 +8,7 @@ class UserSession(Base):
     """
     UserSession class
     """
+    hash_indexed_attributes = ('session_id', 'user_id')
 
     def __init__(self, *args: list, **kwargs: dict):
         """
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+""" Fixtures shared by the tests
+
+Every test runs in its own empty directory, with the in-memory store
+of models.base emptied before and after it, so the .db_* files and
+the instances of one test never leak into another.
+"""
+from datetime import datetime, timedelta
+import base64
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from models import base  # noqa: E402
+
+
+def reset_store():
+    """ Forget every instance, index and file stamp of models.base
+    """
+    with base.DATA_LOCK.write():
+        base.DATA.clear()
+        base.INDEXES.clear()
+        base._UNSAVED.clear()
+    base.FILE_STAMPS.clear()
+    base.LOADS.clear()
+    base._CLASSES.clear()
+    base.VERSIONS.clear()
+    base._DIGESTS.clear()
+    base._last_reload_check = 0.0
+
+
+def run_python(code: str, cwd: str, **env) -> str:
+    """ Run Python code in another process working in cwd
+
+    Args:
+        code (str): the code
+        cwd (str): its working directory
+        env: environment variables to set
+
+    Returns:
+        str: what it printed
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1",
+               **env)
+    return subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env,
+                          check=True, stdout=subprocess.PIPE,
+                          universal_newlines=True).stdout
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    """ Run the test in an empty store kept in its own directory
+    """
+    monkeypatch.chdir(tmp_path)
+    reset_store()
+    yield tmp_path
+    reset_store()
+
+
+class FakeRequest:
+    """ Request carrying only headers and cookies, for the auth classes
+    """
+
+    def __init__(self, headers: dict = None, cookies: dict = None):
+        """ Initialize a FakeRequest instance
+        """
+        self.headers = headers or {}
+        self.cookies = cookies or {}
+
+
+def basic_header(email: str, password: str) -> dict:
+    """ Return the Authorization header of Basic credentials
+    """
+    token = base64.b64encode("{}:{}".format(email, password).encode())
+    return {"Authorization": "Basic {}".format(token.decode())}
+
+
+class Clock:
+    """ Stand-in for the datetime class of a module, whose now() and
+    utcnow() are moved by hand
+    """
+    current = datetime(2030, 1, 1, 12, 0, 0)
+
+    def __init__(self, module, monkeypatch, *modules):
+        """ Replace the datetime class of a module, and of the other
+        modules given
+        """
+        self.current = Clock.current
+        clock = self
+
+        class FrozenDatetime(datetime):
+            """ datetime whose now() and utcnow() read the clock
+            """
+            @classmethod
+            def now(cls, tz=None):
+                """ Return the time of the clock
+                """
+                return cls.combine(clock.current.date(),
+                                   clock.current.time())
+
+            @classmethod
+            def utcnow(cls):
+                """ Return the time of the clock
+                """
+                return cls.combine(clock.current.date(),
+                                   clock.current.time())
+
+        for patched in (module,) + modules:
+            monkeypatch.setattr(patched, "datetime", FrozenDatetime)
+
+    def advance(self, seconds: float):
+        """ Move the clock forward
+        """
+        self.current += timedelta(seconds=seconds)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+""" Tests of the ASGI entry point
+"""
+import asyncio
+import json
+
+import pytest
+
+from conftest import basic_header
+
+from api.v1 import app as app_module
+from api.v1 import asgi
+from api.v1.auth.basic_auth import BasicAuth
+from models.user import User
+
+
+def _request(method, path, headers=None, body=b"", chunks=None):
+    """ Run one HTTP request through the ASGI app
+
+    Returns:
+        tuple: (status, headers as a dict, body)
+    """
+    parts = chunks or [body]
+    messages = [{"type": "http.request", "body": part,
+                 "more_body": i < len(parts) - 1}
+                for i, part in enumerate(parts)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": method, "path": path,
+        "query_string": b"", "http_version": "1.1",
+        "client": ("10.0.0.1", 5555), "server": ("api", 80),
+        "headers": [(name.lower().encode(), value.encode())
+                    for name, value in (headers or {}).items()],
+    }
+    asyncio.run(asgi.application(scope, receive, send))
+    start, content = sent
+    return (start["status"],
+            {k.decode(): v.decode() for k, v in start["headers"]},
+            content["body"])
+
+
+@pytest.fixture
+def basic(monkeypatch):
+    monkeypatch.setattr(app_module, "auth", BasicAuth())
+    user = User(email="bob@x.io")
+    user.password = "pwd"
+    user.save()
+    return user
+
+
+def test_open_route(basic):
+    status, headers, body = _request("GET", "/api/v1/status")
+    assert status == 200
+    assert json.loads(body) == {"status": "OK"}
+    assert headers["content-type"] == "application/json"
+
+
+def test_authenticated_before_the_app(basic):
+    status, _, _ = _request("GET", "/api/v1/users/me")
+    assert status == 401
+    status, _, _ = _request("GET", "/api/v1/users/me",
+                            basic_header("bob@x.io", "wrong"))
+    assert status == 403
+    status, _, body = _request("GET", "/api/v1/users/me",
+                               basic_header("bob@x.io", "pwd"))
+    assert status == 200
+    assert json.loads(body)["email"] == "bob@x.io"
+
+
+def test_chunked_body(basic):
+    headers = dict(basic_header("bob@x.io", "pwd"),
+                   **{"Content-Type": "application/json"})
+    status, _, body = _request("PUT", "/api/v1/users/{}".format(basic.id),
+                               headers, chunks=[b'{"first_na', b'me": "B"}'])
+    assert status == 200
+    assert json.loads(body)["first_name"] == "B"
+
+
+def test_body_too_large(basic, monkeypatch):
+    monkeypatch.setattr(asgi, "MAX_BODY", 10)
+    status, _, body = _request("POST", "/api/v1/users", body=b"x" * 11)
+    assert status == 413
+    assert json.loads(body) == {"error": "Payload too large"}
+
+
+def test_environ_of_a_scope():
+    environ = asgi._environ({
+        "method": "GET", "path": "/api/v1/status", "root_path": "",
+        "query_string": b"a=1", "headers": [
+            (b"x-thing", b"1"), (b"x-thing", b"2"),
+            (b"content-type", b"text/plain")],
+        "client": ("10.0.0.1", 5555), "server": ("api", 8080)}, b"body")
+    assert environ["HTTP_X_THING"] == "1,2"
+    assert environ["CONTENT_TYPE"] == "text/plain"
+    assert environ["CONTENT_LENGTH"] == "4"
+    assert environ["QUERY_STRING"] == "a=1"
+    assert environ["REMOTE_ADDR"] == "10.0.0.1"
+    assert environ["SERVER_PORT"] == "8080"
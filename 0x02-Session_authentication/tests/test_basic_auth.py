@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+""" Tests of BasicAuth and its cache of verified credentials
+"""
+import pytest
+
+from conftest import FakeRequest, basic_header
+
+from api.v1.auth import ttl_cache
+from api.v1.auth.basic_auth import BasicAuth
+from api.v1.auth.ttl_cache import TTLCache
+from models.user import User
+
+
+class Clock:
+    """ Stand-in for time.monotonic, moved by hand
+    """
+
+    def __init__(self):
+        """ Start the clock at an arbitrary time
+        """
+        self.now = 1000.0
+
+    def __call__(self):
+        """ Return the current time
+        """
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ttl_cache.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def bob():
+    user = User()
+    user.email = "bob@x.io"
+    user.password = "pwd"
+    user.save()
+    return user
+
+
+@pytest.fixture
+def checks(monkeypatch):
+    """ Count the password checks
+    """
+    calls = []
+    is_valid = User.is_valid_password
+
+    def counted(self, pwd):
+        calls.append(pwd)
+        return is_valid(self, pwd)
+
+    monkeypatch.setattr(User, "is_valid_password", counted)
+    return calls
+
+
+def test_entries_expire(clock):
+    cache = TTLCache(10, ttl=5)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+    clock.now += 4
+    assert cache.get("a") == 1
+    clock.now += 2
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = TTLCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_and_disabled_cache():
+    cache = TTLCache(2)
+    cache.set("a", 1)
+    assert cache.invalidate("a") is True
+    assert cache.invalidate("a") is False
+    disabled = TTLCache(0)
+    disabled.set("a", 1)
+    assert disabled.get("a") is None and len(disabled) == 0
+
+
+def test_credentials_are_checked_once(bob, checks):
+    auth = BasicAuth()
+    request = FakeRequest(basic_header("bob@x.io", "pwd"))
+    assert auth.current_user(request).id == bob.id
+    assert auth.current_user(request).id == bob.id
+    assert len(checks) == 1
+
+
+def test_wrong_credentials_are_never_cached(bob, checks):
+    auth = BasicAuth()
+    request = FakeRequest(basic_header("bob@x.io", "nope"))
+    assert auth.current_user(request) is None
+    assert auth.current_user(request) is None
+    assert len(checks) == 2
+    assert len(auth.credential_cache) == 0
+
+
+def test_password_change_invalidates(bob):
+    auth = BasicAuth()
+    request = FakeRequest(basic_header("bob@x.io", "pwd"))
+    assert auth.current_user(request) is not None
+    bob.password = "new"
+    bob.save()
+    assert auth.current_user(request) is None
+    assert auth.current_user(
+        FakeRequest(basic_header("bob@x.io", "new"))).id == bob.id
+
+
+def test_removed_user_invalidates(bob):
+    auth = BasicAuth()
+    request = FakeRequest(basic_header("bob@x.io", "pwd"))
+    assert auth.current_user(request) is not None
+    bob.remove()
+    assert auth.current_user(request) is None
+
+
+def test_cache_keys_hold_no_credentials(bob):
+    auth = BasicAuth()
+    header = basic_header("bob@x.io", "pwd")
+    auth.current_user(FakeRequest(header))
+    for key in auth.credential_cache._entries:
+        assert header["Authorization"].encode() not in key
+        assert b"pwd" not in key
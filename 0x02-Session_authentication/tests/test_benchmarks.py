@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+""" Smoke tests of the benchmark suites, at a tiny scale
+"""
+import json
+
+from benchmarks import models_bench
+
+
+def test_models_bench_runs_and_compares(store, capsys):
+    assert models_bench.main(["--sizes", "50", "--storage", "json",
+                              "snapshot", "--output", "out.json"]) == 0
+    with open("out.json") as f:
+        doc = json.load(f)
+    ops = {(r["storage"], r["op"]) for r in doc["results"]}
+    for storage in ("json", "snapshot"):
+        for op in ("save_many_users", "load_from_file_users", "get",
+                   "search_email", "query_created_since", "save_one"):
+            assert (storage, op) in ops
+    assert all(r["seconds"] >= 0 and r["size"] == 50
+               for r in doc["results"])
+
+    capsys.readouterr()
+    assert models_bench.main(["--compare", "out.json", "out.json"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == len(doc["results"])
+    assert all("x  1.00" in line for line in lines)
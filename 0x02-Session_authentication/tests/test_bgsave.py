@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+""" Tests of the background snapshots of the store
+"""
+import json
+import os
+import signal
+import stat
+import time
+
+from conftest import run_python
+
+from models import bgsave
+from models.user import User
+
+
+def _users(count):
+    for i in range(count):
+        user = User()
+        user.email = "user{}@x.io".format(i)
+        user.password = "pwd"
+        user.save()
+
+
+def test_backup_holds_every_instance(store):
+    _users(5)
+    assert bgsave.bgsave("backup") is not None
+    status = bgsave.bgsave_wait(30)
+    assert status["in_progress"] is False
+    assert "error" not in status
+    with open(os.path.join("backup", ".db_User.json")) as f:
+        backup = json.load(f)
+    with open(".db_User.json") as f:
+        assert backup == json.load(f)
+
+
+def test_backup_is_private_to_its_owner(store):
+    _users(1)
+    bgsave.bgsave("backup")
+    bgsave.bgsave_wait(30)
+    assert stat.S_IMODE(os.stat("backup").st_mode) == 0o700
+    mode = os.stat(os.path.join("backup", ".db_User.json")).st_mode
+    assert stat.S_IMODE(mode) == 0o600
+
+
+def test_command_line(store):
+    _users(3)
+    out = run_python("import sys\nfrom models.bgsave import main\n"
+                     "sys.exit(main(['--directory', 'copy']))", str(store))
+    assert json.loads(out)["files"]
+    with open(os.path.join("copy", ".db_User.json")) as f:
+        assert len(json.load(f)) == 3
+
+
+def test_signal_starts_a_backup(store):
+    _users(2)
+    previous = signal.getsignal(signal.SIGUSR1)
+    try:
+        assert bgsave.install_signal_handler()
+        os.kill(os.getpid(), signal.SIGUSR1)
+        deadline = time.monotonic() + 30
+        while not os.path.exists(os.path.join(bgsave.BACKUP_DIR,
+                                              ".db_User.json")):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        bgsave.bgsave_wait(30)
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+
+
+def test_no_route_exposes_it(monkeypatch):
+    from api.v1 import app as app_module
+    monkeypatch.setattr(app_module, "auth", None)
+    client = app_module.app.test_client()
+    assert client.post("/api/v1/bgsave").status_code == 404
+    assert client.get("/api/v1/bgsave").status_code == 404
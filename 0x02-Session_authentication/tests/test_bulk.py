@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+""" Tests of the bulk import/export of model instances
+"""
+import io
+
+from models import bulk
+from models.user import User
+
+
+CSV = """name,email,password
+Bob Dylan,bob@x.io,pwd1
+Alice,alice@x.io,
+"""
+
+
+def _records():
+    """ Return the stored records, less their version which saves bump
+    """
+    records = {}
+    for user in User.all():
+        record = user.to_json(True)
+        record.pop("_version", None)
+        records[user.id] = record
+    return records
+
+
+def test_import_csv_hashes_passwords_and_splits_names():
+    records = bulk.read_records(io.StringIO(CSV), "csv")
+    assert bulk.import_records(User, records, workers=1) == 2
+    User.load_from_file()
+    bob = User.search({"email": "bob@x.io"})[0]
+    assert (bob.first_name, bob.last_name) == ("Bob", "Dylan")
+    assert bob.is_valid_password("pwd1")
+    alice = User.search({"email": "alice@x.io"})[0]
+    assert alice.first_name == "Alice" and alice.last_name is None
+    assert alice.password is None
+
+
+def test_import_with_worker_processes():
+    records = ({"email": "u{}@x.io".format(i), "password": "p{}".format(i)}
+               for i in range(30))
+    assert bulk.import_records(User, records, workers=2, batch_size=7) == 30
+    user = User.search({"email": "u17@x.io"})[0]
+    assert user.is_valid_password("p17")
+
+
+def test_jsonl_export_imports_back(store, tmp_path_factory):
+    bulk.import_records(User, bulk.read_records(io.StringIO(CSV), "csv"),
+                        workers=1)
+    out = io.StringIO()
+    assert bulk.export_records(User, out, "jsonl") == 2
+    exported = _records()
+
+    User.remove_many(list(exported))
+    assert User.count() == 0
+    records = bulk.read_records(io.StringIO(out.getvalue()), "jsonl")
+    assert bulk.import_records(User, records, workers=1) == 2
+    assert _records() == exported
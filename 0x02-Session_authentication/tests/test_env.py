@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+""" Tests of the environment helpers
+"""
+import pytest
+
+from api.v1.env import float_env, int_env
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, 7), ("12", 12), ("-3", -3), ("", 7), ("1.5", 7), ("many", 7)])
+def test_int_env(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv("SOME_SETTING", raising=False)
+    else:
+        monkeypatch.setenv("SOME_SETTING", value)
+    assert int_env("SOME_SETTING", 7) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, 0.5), ("2", 2.0), ("0.01", 0.01), ("x", 0.5)])
+def test_float_env(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv("SOME_SETTING", raising=False)
+    else:
+        monkeypatch.setenv("SOME_SETTING", value)
+    assert float_env("SOME_SETTING", 0.5) == expected
+
+
+def test_defaults_to_zero(monkeypatch):
+    monkeypatch.delenv("SOME_SETTING", raising=False)
+    assert int_env("SOME_SETTING") == 0
+    assert float_env("SOME_SETTING") == 0.0
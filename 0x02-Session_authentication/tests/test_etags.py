@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+""" Tests of versions, collection digests and conditional requests
+"""
+import io
+import json
+
+import pytest
+
+from conftest import basic_header, reset_store
+
+from api.v1 import app as app_module
+from api.v1.auth.basic_auth import BasicAuth
+from models import bulk
+from models.user import User
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, "auth", BasicAuth())
+    user = User(email="bob@x.io")
+    user.password = "pwd"
+    user.save()
+    client = app_module.app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = \
+        basic_header("bob@x.io", "pwd")["Authorization"]
+    client.user = user
+    return client
+
+
+def _users(emails):
+    users = []
+    for email in emails:
+        user = User(email=email)
+        user.save()
+        users.append(user)
+    return users
+
+
+def test_save_bumps_versions():
+    user, = _users(["a@x.io"])
+    assert user.version == 1
+    before = User.collection_version()
+    user.first_name = "A"
+    user.save()
+    assert user.version == 2
+    assert User.collection_version() > before
+
+
+def test_digest_ignores_insertion_order():
+    users = _users(["a@x.io", "b@x.io", "c@x.io"])
+    digest = User.digest()
+    # Another process loading the same records in another order
+    with open(".db_User.json", "w") as f:
+        json.dump({user.id: user.to_json(True)
+                   for user in reversed(users)}, f)
+    reset_store()
+    User.load_from_file()
+    assert [user.id for user in User.all()] == \
+        [user.id for user in reversed(users)]
+    assert User.digest() == digest
+
+
+def test_digest_follows_changes():
+    user, other = _users(["a@x.io", "b@x.io"])
+    digest = User.digest()
+    assert User.digest() == digest
+    user.save()
+    changed = User.digest()
+    assert changed != digest
+    other.remove()
+    assert User.digest() not in (digest, changed)
+
+
+def test_csv_versions_are_integers():
+    user, = _users(["a@x.io"])
+    user.save()
+    out = io.StringIO()
+    bulk.export_records(User, out, "csv")
+    user.remove()
+    records = bulk.read_records(io.StringIO(out.getvalue()), "csv")
+    bulk.import_records(User, records, workers=1)
+    imported = User.get(user.id)
+    assert type(imported.version) is int
+    assert imported.version == 3
+
+
+@pytest.mark.parametrize("path", ["/api/v1/users", "/api/v1/users/me",
+                                  "/api/v1/users/{id}"])
+def test_not_modified(client, path):
+    path = path.format(id=client.user.id)
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    again = client.get(path, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+    client.user.first_name = "Bob"
+    client.user.save()
+    changed = client.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_if_match_on_update(client):
+    path = "/api/v1/users/{}".format(client.user.id)
+    etag = client.get(path).headers["ETag"]
+    response = client.put(path, json={"first_name": "Bob"},
+                          headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    stale = client.put(path, json={"first_name": "Robert"},
+                       headers={"If-Match": etag})
+    assert stale.status_code == 412
+    assert User.get(client.user.id).first_name == "Bob"
+    forced = client.put(path, json={"first_name": "Robert"},
+                        headers={"If-Match": "*"})
+    assert forced.status_code == 200
+    assert User.get(client.user.id).first_name == "Robert"
+
+
+def test_digest_cache_keyed_by_collection_version():
+    with open(".db_User.json", "w") as f:
+        json.dump({"u1": {"id": "u1", "email": "a@x.io", "_version": 5}}, f)
+    User.load_from_file()
+    digest = User.digest()
+    # Enough saves to bring the collection version to 5
+    _users(["b@x.io", "c@x.io", "d@x.io", "e@x.io"])
+    assert User.count() == 5
+    assert User.digest() != digest
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+""" Tests of concurrent access to the store
+"""
+import threading
+import time
+
+from models.base import DATA
+from models.locks import ReadWriteLock
+from models.user import User
+
+
+def test_readers_share_the_lock():
+    lock = ReadWriteLock()
+    inside = []
+    barrier = threading.Barrier(3)
+
+    def reader():
+        with lock.read():
+            inside.append(1)
+            barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(inside) == 3
+
+
+def test_writer_excludes_readers():
+    lock = ReadWriteLock()
+    events = []
+    lock.acquire_write()
+
+    def reader():
+        with lock.read():
+            events.append("read")
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    time.sleep(0.05)
+    events.append("write done")
+    lock.release_write()
+    thread.join(5)
+    assert events == ["write done", "read"]
+
+
+def test_waiting_writer_blocks_new_readers():
+    lock = ReadWriteLock()
+    events = []
+    lock.acquire_read()
+
+    def writer():
+        with lock.write():
+            events.append("write")
+
+    def reader():
+        with lock.read():
+            events.append("read")
+
+    w = threading.Thread(target=writer)
+    w.start()
+    time.sleep(0.05)
+    r = threading.Thread(target=reader)
+    r.start()
+    time.sleep(0.05)
+    assert events == []
+    lock.release_read()
+    w.join(5)
+    r.join(5)
+    assert events == ["write", "read"]
+
+
+def test_concurrent_saves_keep_every_instance():
+    def create(n):
+        for i in range(n):
+            user = User()
+            user.email = "{}-{}@x.io".format(threading.get_ident(), i)
+            user.save()
+
+    threads = [threading.Thread(target=create, args=(20,))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert User.count() == 160
+    assert len(DATA["User"]) == 160
+
+    # The file holds every one of them too
+    User.load_from_file()
+    assert User.count() == 160
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+""" Tests of Base.query and its sorted indexes
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.base import INDEXES
+from models.user import User
+
+
+def _users(count=20):
+    start = datetime(2020, 1, 1)
+    users = []
+    for i in range(count):
+        user = User(created_at=(start + timedelta(days=i)).strftime(
+            "%Y-%m-%dT%H:%M:%S"))
+        user.email = "user{:02}@{}".format(i, "a.io" if i % 2 else "b.io")
+        user.save()
+        users.append(user)
+    return users
+
+
+def _scan(users, predicate):
+    return sorted(user.id for user in users if predicate(user))
+
+
+def _ids(found):
+    return sorted(user.id for user in found)
+
+
+def test_ranges_match_a_scan():
+    users = _users()
+    since = datetime(2020, 1, 5)
+    until = datetime(2020, 1, 10)
+    assert _ids(User.query({"created_at": {"gte": since}})) == \
+        _scan(users, lambda u: u.created_at >= since)
+    assert _ids(User.query({"created_at": {"gt": since}})) == \
+        _scan(users, lambda u: u.created_at > since)
+    assert _ids(User.query({"created_at": {"gt": since, "lte": until}})) \
+        == _scan(users, lambda u: since < u.created_at <= until)
+    assert _ids(User.query({"created_at": {"lt": since}})) == \
+        _scan(users, lambda u: u.created_at < since)
+    assert "created_at" in INDEXES["User"]
+
+
+def test_prefix_and_in():
+    users = _users()
+    assert _ids(User.query({"email": {"prefix": "user1"}})) == \
+        _scan(users, lambda u: u.email.startswith("user1"))
+    wanted = ["user03@a.io", "user04@b.io", "nobody@x.io"]
+    assert _ids(User.query({"email": {"in": wanted}})) == \
+        _scan(users, lambda u: u.email in wanted)
+
+
+def test_arguments_the_index_cannot_take_are_scanned():
+    users = _users()
+    User.query({"email": {"prefix": "user"}})
+    assert "email" in INDEXES["User"]
+    assert User.query({"email": {"in": [1]}}) == []
+    assert User.query({"created_at": {"prefix": "2020"}}) == []
+    wanted = ["user03@a.io", None]
+    assert _ids(User.query({"email": {"in": wanted}})) == \
+        _scan(users, lambda u: u.email in wanted)
+
+
+def test_filters_combine():
+    users = _users()
+    since = datetime(2020, 1, 8)
+    found = User.query({"created_at": {"gte": since},
+                        "email": {"prefix": "user1"}})
+    assert _ids(found) == _scan(
+        users, lambda u: u.created_at >= since and
+        u.email.startswith("user1"))
+    found = User.query({"created_at": {"gte": since}, "first_name": None})
+    assert _ids(found) == _scan(users, lambda u: u.created_at >= since)
+
+
+def test_index_follows_saves_and_removals():
+    users = _users(5)
+    User.query({"email": {"prefix": "user"}})
+    users[0].email = "zed@x.io"
+    users[0].save()
+    users[1].remove()
+    assert _ids(User.query({"email": {"prefix": "user"}})) == \
+        sorted(u.id for u in users[2:])
+    assert _ids(User.query({"email": {"prefix": "zed"}})) == [users[0].id]
+
+
+def test_unknown_operator_is_rejected():
+    _users(1)
+    with pytest.raises(ValueError):
+        User.query({"created_at": {"after": datetime(2020, 1, 1)}})
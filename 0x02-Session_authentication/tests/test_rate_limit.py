@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+""" Tests of the login rate limiter
+"""
+import pytest
+
+from api.v1.auth import rate_limit
+from api.v1.auth.rate_limit import (
+    TokenBucketLimiter,
+    login_limiter,
+    trust_proxies
+)
+
+
+class FakeTime:
+    """ Stand-in for the time module, moved by hand
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(rate_limit, "time", fake)
+    return fake
+
+
+def test_burst_then_refill(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=3)
+    assert [limiter.acquire("k") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("k") == pytest.approx(1.0)
+    clock.now += 1
+    assert limiter.acquire("k") == 0
+    assert limiter.stats()["limited"] == 1
+
+
+def test_attempt_takes_from_every_key_or_none(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=1)
+    assert limiter.acquire(("ip", "1.2.3.4"), ("email", "a@x.io")) == 0
+    # The email is out of tokens: the new IP's token isn't taken
+    assert limiter.acquire(("ip", "5.6.7.8"), ("email", "a@x.io")) > 0
+    assert limiter.acquire(("ip", "5.6.7.8"), None) == 0
+
+
+def test_least_recent_buckets_are_dropped(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=1, maxsize=2)
+    for key in ("a", "b", "c"):
+        limiter.acquire(key)
+    assert limiter.stats()["buckets"] == 2
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("c") > 0
+
+
+def test_off_by_default(monkeypatch):
+    monkeypatch.delenv("LOGIN_RATE_PER_MINUTE", raising=False)
+    limiter = login_limiter()
+    assert all(limiter.acquire("k") == 0 for _ in range(100))
+
+
+def test_opt_in(monkeypatch, clock):
+    monkeypatch.setenv("LOGIN_RATE_PER_MINUTE", "60")
+    monkeypatch.setenv("LOGIN_BURST", "2")
+    limiter = login_limiter()
+    assert limiter.acquire("k") == 0 and limiter.acquire("k") == 0
+    assert limiter.acquire("k") == pytest.approx(1.0)
+
+
+def _remote_addr(environ):
+    seen = {}
+
+    def wsgi_app(environ, start_response):
+        seen["addr"] = environ["REMOTE_ADDR"]
+        return []
+
+    trust_proxies(wsgi_app)(dict(environ), None)
+    return seen["addr"]
+
+
+@pytest.mark.parametrize("proxies, client", [
+    (None, "10.0.0.1"), ("0", "10.0.0.1"), ("1", "9.9.9.9"),
+    ("2", "8.8.8.8")])
+def test_trusted_proxies(monkeypatch, proxies, client):
+    if proxies is None:
+        monkeypatch.delenv("TRUSTED_PROXIES", raising=False)
+    else:
+        monkeypatch.setenv("TRUSTED_PROXIES", proxies)
+    environ = {"REMOTE_ADDR": "10.0.0.1",
+               "HTTP_X_FORWARDED_FOR": "8.8.8.8, 9.9.9.9",
+               "wsgi.url_scheme": "http", "HTTP_HOST": "api"}
+    assert _remote_addr(environ) == client
+
+
+def test_login_route_limits_by_client(monkeypatch, clock):
+    from api.v1 import app as app_module
+    from api.v1.views import session_auth as views
+    monkeypatch.setattr(views, "LOGIN_LIMITER",
+                        TokenBucketLimiter(rate=1, burst=1))
+    client = app_module.app.test_client()
+    url = "/api/v1/auth_session/login"
+    assert client.post(url, data={}).status_code == 400
+    response = client.post(url, data={})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    other = client.post(url, data={}, environ_base={
+        "REMOTE_ADDR": "10.0.0.2"})
+    assert other.status_code == 400
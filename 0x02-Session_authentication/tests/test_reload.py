@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+""" Tests of the reload of classes changed by other processes
+"""
+from conftest import run_python
+
+from models.base import reload_changed
+from models.user import User
+
+
+OTHER_PROCESS = """
+from models.user import User
+User.load_from_file()
+user = User()
+user.email = "other@x.io"
+user.save()
+"""
+
+
+def _user(email):
+    user = User()
+    user.email = email
+    user.save()
+    return user
+
+
+def test_nothing_reloaded_without_changes(store):
+    _user("bob@x.io")
+    assert reload_changed() == []
+
+
+def test_reload_picks_up_writes_of_another_process(store):
+    _user("bob@x.io")
+    run_python(OTHER_PROCESS, str(store))
+    assert reload_changed() == ["User"]
+    emails = sorted(user.email for user in User.all())
+    assert emails == ["bob@x.io", "other@x.io"]
+    assert reload_changed() == []
+
+
+def test_save_keeps_writes_of_another_process(store):
+    bob = _user("bob@x.io")
+    run_python(OTHER_PROCESS, str(store))
+    # No reload_changed(): save() itself must not overwrite the file
+    bob.first_name = "Bob"
+    bob.save()
+    User.load_from_file()
+    emails = sorted(user.email for user in User.all())
+    assert emails == ["bob@x.io", "other@x.io"]
+    assert User.get(bob.id).first_name == "Bob"
+
+
+def test_removal_by_another_process(store):
+    bob = _user("bob@x.io")
+    _user("alice@x.io")
+    run_python("from models.user import User\n"
+               "User.load_from_file()\n"
+               "User.get({!r}).remove()\n".format(bob.id), str(store))
+    reload_changed()
+    assert User.get(bob.id) is None
+    assert User.count() == 1
+
+
+def test_reload_interval_skips_checks(store, monkeypatch):
+    _user("bob@x.io")
+    monkeypatch.setenv("DB_RELOAD_INTERVAL", "3600")
+    assert reload_changed() == []
+    run_python(OTHER_PROCESS, str(store))
+    # Within the interval of the previous check
+    assert reload_changed() == []
+    monkeypatch.setenv("DB_RELOAD_INTERVAL", "0")
+    assert reload_changed() == ["User"]
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+""" Tests of the excluded paths of Auth.require_auth
+"""
+import pytest
+
+from api.v1.auth.auth import Auth
+from api.v1.auth.path_matcher import PathMatcher
+
+
+EXCLUDED = ["/api/v1/status/", "/api/v1/stat*", "/api/v1/users/*/avatar",
+            "/api/v1/auth_session/login"]
+
+
+@pytest.mark.parametrize("path, required", [
+    ("/api/v1/status", False),
+    ("/api/v1/status/", False),
+    ("/api/v1/stats", False),
+    ("/api/v1/statistics/daily", False),
+    ("/api/v1/users/42/avatar", False),
+    ("/api/v1/users/42/avatar/", False),
+    ("/api/v1/auth_session/login", False),
+    ("/api/v1/auth_session/login/", False),
+    ("/api/v1/users", True),
+    ("/api/v1/users/42", True),
+    ("/api/v1/sta", True),
+    ("/api/v1/auth_session/logout", True),
+    (None, True),
+])
+def test_paths(path, required):
+    auth = Auth()
+    assert auth.require_auth(path, EXCLUDED) is required
+    assert auth.require_auth(path, PathMatcher(EXCLUDED)) is required
+
+
+def test_no_exclusion_requires_auth():
+    auth = Auth()
+    assert auth.require_auth("/api/v1/status", None)
+    assert auth.require_auth("/api/v1/status", [])
+
+
+def test_glob_characters():
+    matcher = PathMatcher(["/api/v?/status", "/api/v1/[ab]*"])
+    assert matcher.match("/api/v2/status")
+    assert not matcher.match("/api/v10/status")
+    assert matcher.match("/api/v1/alpha")
+    assert not matcher.match("/api/v1/gamma")
+    assert len(matcher) == 2
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+""" Tests of Base.search answered from indexes
+"""
+import pytest
+
+from models.base import INDEXES
+from models.user import User
+from models.user_session import UserSession
+
+
+def _scan(cls, attributes):
+    return sorted(obj.id for obj in cls.all()
+                  if all(getattr(obj, k) == v for k, v in attributes.items()))
+
+
+def _ids(found):
+    return sorted(obj.id for obj in found)
+
+
+def _users(count=10):
+    users = []
+    for i in range(count):
+        user = User(email="user{}@a.io".format(i % 4),
+                    first_name="F{}".format(i % 3))
+        user.save()
+        users.append(user)
+    return users
+
+
+def test_index_and_scan_agree():
+    _users()
+    for attributes in ({"email": "user1@a.io"},
+                       {"email": "user1@a.io", "first_name": "F0"},
+                       {"email": "nobody@a.io"},
+                       {"first_name": "F2"}):
+        assert _ids(User.search(attributes)) == _scan(User, attributes)
+    assert "email" in INDEXES["User"]
+
+
+def test_hash_index_and_scan_agree():
+    for i in range(6):
+        UserSession(user_id="u{}".format(i % 2),
+                    session_id="s{}".format(i)).save()
+    for attributes in ({"user_id": "u0"}, {"session_id": "s3"},
+                       {"session_id": "missing"}):
+        assert _ids(UserSession.search(attributes)) == \
+            _scan(UserSession, attributes)
+
+
+def test_values_the_index_cannot_take_are_scanned():
+    _users()
+    UserSession(user_id="u1", session_id="s1").save()
+    assert User.search({"email": 42}) == []
+    assert User.search({"email": ["user1@a.io"]}) == []
+    assert UserSession.search({"session_id": ["x"]}) == []
+
+
+def test_values_of_another_type_are_found():
+    users = _users()
+    users[0].email = 42
+    users[0].save()
+    assert _ids(User.search({"email": 42})) == [users[0].id]
+    assert _ids(User.search({"email": "user1@a.io"})) == \
+        _scan(User, {"email": "user1@a.io"})
+
+
+@pytest.mark.parametrize("new_email", ["changed@a.io", None])
+def test_unsaved_changes_are_seen(new_email):
+    users = _users()
+    assert len(User.search({"email": "user0@a.io"})) == 3
+    users[0].email = new_email
+    assert users[0] not in User.search({"email": "user0@a.io"})
+    if new_email is not None:
+        assert User.search({"email": new_email}) == [users[0]]
+    users[0].email = "user0@a.io"
+    assert users[0] in User.search({"email": "user0@a.io"})
+
+
+def test_unsaved_new_instances_are_not_found():
+    _users()
+    User.search({"email": "user0@a.io"})
+    User(email="user0@a.io")
+    assert len(User.search({"email": "user0@a.io"})) == 3
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+""" Tests of SessionDBAuth: its session cache and stored sessions
+"""
+from datetime import datetime
+import os
+
+import pytest
+
+from conftest import Clock, run_python
+
+from api.v1.auth import session_db_auth
+from api.v1.auth.session_db_auth import SessionDBAuth
+from models import base
+from models.base import reload_changed
+from models.user_session import UserSession
+
+
+OTHER_PROCESS_LOGOUT = """
+from models.user_session import UserSession
+UserSession.load_from_file()
+for user_session in UserSession.search({{"session_id": "{}"}}):
+    user_session.remove()
+"""
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    return Clock(session_db_auth, monkeypatch, base)
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    monkeypatch.setenv("SESSION_DURATION", "60")
+    monkeypatch.setenv("SESSION_GC_INTERVAL", "0")
+    monkeypatch.setenv("SESSION_SWEEP_INTERVAL", "0")
+    auth = SessionDBAuth()
+    yield auth
+    auth.stop_sweeper()
+
+
+def test_own_logins_keep_the_cache(auth):
+    session_id = auth.create_session("u1")
+    assert auth.user_id_for_session_id(session_id) == "u1"
+    assert len(auth.session_cache) == 1
+    auth.create_session("u2")
+    assert auth.user_id_for_session_id(session_id) == "u1"
+    assert auth.session_cache.hits == 1
+
+
+def test_logout_of_another_process_clears_the_cache(auth, store):
+    session_id = auth.create_session("u1")
+    assert auth.user_id_for_session_id(session_id) == "u1"
+    run_python(OTHER_PROCESS_LOGOUT.format(session_id), str(store))
+    assert reload_changed() == ["UserSession"]
+    assert auth.user_id_for_session_id(session_id) is None
+
+
+def test_collect_removes_only_expired_records(auth, clock):
+    old = [auth.create_session("u{}".format(i)) for i in range(20)]
+    clock.advance(30)
+    new = [auth.create_session("v{}".format(i)) for i in range(3)]
+    size = os.path.getsize(".db_UserSession.json")
+    assert auth.collect_expired() == 0
+    clock.advance(31)
+    assert auth.collect_expired() == 20
+    assert auth.session_metrics()["collected"] == 20
+    assert os.path.getsize(".db_UserSession.json") < size / 4
+    assert sorted(s.session_id for s in UserSession.all()) == sorted(new)
+    assert all(auth.user_id_for_session_id(s) is None for s in old)
+    assert all(auth.user_id_for_session_id(s) for s in new)
+
+
+def test_collect_evicts_cached_sessions(auth, clock):
+    session_id = auth.create_session("u1")
+    assert auth.user_id_for_session_id(session_id) == "u1"
+    clock.advance(61)
+    assert auth.collect_expired() == 1
+    assert len(auth.session_cache) == 0
+
+
+def test_collect_without_duration_keeps_everything(monkeypatch, clock):
+    monkeypatch.setenv("SESSION_DURATION", "0")
+    auth = SessionDBAuth()
+    auth.create_session("u1")
+    clock.advance(10 ** 6)
+    assert auth.collect_expired() == 0
+    assert len(UserSession.all()) == 1
+
+
+class FakeMonotonic:
+    """ Stand-in for the time module, whose monotonic() is moved by hand
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_sliding_refreshes_are_written_together(monkeypatch, clock):
+    monotonic = FakeMonotonic()
+    monkeypatch.setattr(session_db_auth, "time", monotonic)
+    monkeypatch.setenv("SESSION_DURATION", "60")
+    monkeypatch.setenv("SESSION_GC_INTERVAL", "0")
+    monkeypatch.setenv("SESSION_SLIDING", "1")
+    monkeypatch.setenv("SESSION_REFRESH_INTERVAL", "30")
+    auth = SessionDBAuth()
+    session_ids = [auth.create_session("u{}".format(i)) for i in range(3)]
+    stamp = base.FILE_STAMPS["UserSession"]
+    clock.advance(40)
+    monotonic.now += 10
+    assert all(auth.user_id_for_session_id(s) for s in session_ids)
+    # Recorded, not written yet
+    assert base.FILE_STAMPS["UserSession"] == stamp
+    monotonic.now += 30
+    clock.advance(30)
+    assert auth.user_id_for_session_id(session_ids[0]) == "u0"
+    assert base.FILE_STAMPS["UserSession"] != stamp
+    used = {s.session_id: s.updated_at for s in UserSession.all()}
+    assert all(used[s] >= datetime(2030, 1, 1, 12, 0, 40)
+               for s in session_ids)
+    # Past the fixed expiry, still alive from the last use
+    clock.advance(25)
+    assert auth.user_id_for_session_id(session_ids[1]) == "u1"
+    assert auth.collect_expired() == 0
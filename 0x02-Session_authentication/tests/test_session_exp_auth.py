@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+""" Tests of SessionExpAuth expiry, sweeping and capacity limit
+"""
+from datetime import datetime
+
+import pytest
+
+from conftest import Clock
+
+from api.v1.auth import session_exp_auth
+from api.v1.auth.session_exp_auth import SessionExpAuth
+
+
+@pytest.fixture(params=["memory", "compact", "sqlite"])
+def backend(request, monkeypatch):
+    """ Run the test with each session store
+    """
+    monkeypatch.setenv("SESSION_STORE", request.param)
+    monkeypatch.setenv("SESSION_SWEEP_INTERVAL", "0")
+    return request.param
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    return Clock(session_exp_auth, monkeypatch)
+
+
+def _auth(monkeypatch, **env):
+    for name, value in env.items():
+        monkeypatch.setenv(name, str(value))
+    return SessionExpAuth()
+
+
+def test_session_expires(backend, clock, monkeypatch):
+    auth = _auth(monkeypatch, SESSION_DURATION=60)
+    session_id = auth.create_session("u1")
+    clock.advance(59)
+    assert auth.user_id_for_session_id(session_id) == "u1"
+    clock.advance(2)
+    assert auth.user_id_for_session_id(session_id) is None
+    assert session_id not in auth.user_id_by_session_id
+    assert auth.session_metrics()["expired"] == 1
+
+
+def test_no_duration_never_expires(backend, clock, monkeypatch):
+    auth = _auth(monkeypatch, SESSION_DURATION=0)
+    session_id = auth.create_session("u1")
+    clock.advance(10 ** 6)
+    assert auth.user_id_for_session_id(session_id) == "u1"
+    assert auth.sweep_expired() == 0
+
+
+def test_sweep_removes_only_expired_sessions(backend, clock, monkeypatch):
+    auth = _auth(monkeypatch, SESSION_DURATION=60)
+    old = [auth.create_session("u{}".format(i)) for i in range(5)]
+    clock.advance(30)
+    new = [auth.create_session("v{}".format(i)) for i in range(3)]
+    assert auth.sweep_expired() == 0
+    clock.advance(31)
+    assert auth.sweep_expired() == 5
+    assert sorted(auth.user_id_by_session_id) == sorted(new)
+    assert all(auth.user_id_for_session_id(s) is None for s in old)
+    clock.advance(30)
+    assert auth.sweep_expired() == 3
+    assert auth.session_metrics()["live"] == 0
+
+
+def test_cap_evicts_least_recently_used(backend, clock, monkeypatch):
+    auth = _auth(monkeypatch, SESSION_MAX_COUNT=3)
+    first, second, third = [auth.create_session(u)
+                            for u in ("u1", "u2", "u3")]
+    clock.advance(1)
+    # Using the first session makes the second the least recent one
+    assert auth.user_id_for_session_id(first) == "u1"
+    fourth = auth.create_session("u4")
+    assert auth.user_id_for_session_id(second) is None
+    for session_id, user_id in ((first, "u1"), (third, "u3"),
+                                (fourth, "u4")):
+        assert auth.user_id_for_session_id(session_id) == user_id
+    metrics = auth.session_metrics()
+    assert metrics["live"] == 3 and metrics["evicted"] == 1
+
+
+def test_sweeper_thread(backend, monkeypatch):
+    monkeypatch.setenv("SESSION_SWEEP_INTERVAL", "1")
+    auth = _auth(monkeypatch, SESSION_DURATION=60)
+    try:
+        assert auth._sweeper is not None and auth._sweeper.is_alive()
+    finally:
+        auth.stop_sweeper()
+    auth._sweeper.join(5)
+    assert not auth._sweeper.is_alive()
+
+
+def test_sliding_session_lives_while_used(backend, clock, monkeypatch):
+    auth = _auth(monkeypatch, SESSION_DURATION=60, SESSION_SLIDING=1,
+                 SESSION_REFRESH_INTERVAL=10)
+    session_id = auth.create_session("u1")
+    for _ in range(5):
+        clock.advance(50)
+        assert auth.user_id_for_session_id(session_id) == "u1"
+    clock.advance(61)
+    assert auth.user_id_for_session_id(session_id) is None
+
+
+def test_sliding_refresh_at_most_once_per_interval(backend, clock,
+                                                   monkeypatch):
+    auth = _auth(monkeypatch, SESSION_DURATION=60, SESSION_SLIDING=1,
+                 SESSION_REFRESH_INTERVAL=30)
+    session_id = auth.create_session("u1")
+    created = auth.user_id_by_session_id[session_id]
+    clock.advance(20)
+    auth.user_id_for_session_id(session_id)
+    assert auth.user_id_by_session_id[session_id] == created
+    clock.advance(20)
+    auth.user_id_for_session_id(session_id)
+    refreshed = auth.user_id_by_session_id[session_id]["refreshed_at"]
+    assert refreshed == datetime(2030, 1, 1, 12, 0, 40)
+    # The last refresh was at 40s, so it lasts until 100s, not 60s
+    clock.advance(59)
+    assert auth.user_id_for_session_id(session_id) == "u1"
+
+
+def test_fixed_session_ignores_use(backend, clock, monkeypatch):
+    auth = _auth(monkeypatch, SESSION_DURATION=60,
+                 SESSION_REFRESH_INTERVAL=10)
+    session_id = auth.create_session("u1")
+    clock.advance(50)
+    assert auth.user_id_for_session_id(session_id) == "u1"
+    clock.advance(11)
+    assert auth.user_id_for_session_id(session_id) is None
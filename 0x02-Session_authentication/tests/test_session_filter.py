@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+""" Tests of the Bloom filter of live sessions
+"""
+import threading
+import uuid
+
+import pytest
+
+from conftest import run_python
+
+from api.v1.auth.bloom import BloomFilter
+from api.v1.auth.session_auth import SessionAuth
+from api.v1.auth.session_db_auth import SessionDBAuth
+from models.base import reload_changed
+
+
+OTHER_PROCESS_LOGIN = """
+from models.user_session import UserSession
+UserSession.load_from_file()
+UserSession(user_id="u9", session_id="{}").save()
+"""
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    monkeypatch.setenv("SESSION_STORE", "memory")
+    return SessionAuth()
+
+
+@pytest.fixture
+def db_auth(monkeypatch):
+    monkeypatch.setenv("SESSION_GC_INTERVAL", "0")
+    monkeypatch.setenv("SESSION_SWEEP_INTERVAL", "0")
+    auth = SessionDBAuth()
+    yield auth
+    auth.stop_sweeper()
+
+
+def _built(auth):
+    auth.session_may_exist("warm-up")
+    assert auth.wait_filter(10)
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(1000, 0.01)
+    items = [str(uuid.uuid4()) for _ in range(500)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    others = sum(str(uuid.uuid4()) in bloom for _ in range(2000))
+    assert others < 100
+    assert len(bloom) == 500
+
+
+def test_unknown_sessions_rejected_once_built(auth):
+    session_id = auth.create_session("u1")
+    # Not built yet: the store answers
+    assert auth.session_may_exist("unknown")
+    assert auth.wait_filter(10)
+    assert auth.session_may_exist(session_id)
+    assert not auth.session_may_exist("unknown")
+    assert auth.filter_metrics()["rejected"] == 1
+
+
+def test_rebuilds_run_off_the_request_thread(auth, monkeypatch):
+    threads = []
+    live = auth._live_session_ids
+
+    def recording():
+        threads.append(threading.current_thread())
+        return live()
+
+    monkeypatch.setattr(auth, "_live_session_ids", recording)
+    _built(auth)
+    monkeypatch.setattr(auth, "filter_rebuild_interval", 0)
+    auth.session_may_exist("unknown")
+    assert auth.wait_filter(10)
+    assert len(threads) == 2
+    assert threading.current_thread() not in threads
+
+
+def test_sessions_created_during_a_rebuild_are_kept(auth, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    live = auth._live_session_ids
+
+    def slow():
+        found = live()
+        started.set()
+        release.wait(10)
+        return found
+
+    monkeypatch.setattr(auth, "_live_session_ids", slow)
+    auth.session_may_exist("warm-up")
+    assert started.wait(10)
+    session_id = auth.create_session("u1")
+    release.set()
+    assert auth.wait_filter(10)
+    assert auth.session_may_exist(session_id)
+
+
+def test_own_logins_keep_the_db_filter(db_auth):
+    _built(db_auth)
+    session_ids = [db_auth.create_session("u{}".format(i))
+                   for i in range(5)]
+    assert db_auth._filter_rebuilder is None
+    assert all(db_auth.session_may_exist(s) for s in session_ids)
+    assert not db_auth.session_may_exist("unknown")
+    assert db_auth._filter_rebuilder is None
+
+
+def test_logins_of_another_process_pass_the_db_filter(db_auth, store):
+    db_auth.create_session("u1")
+    _built(db_auth)
+    session_id = str(uuid.uuid4())
+    run_python(OTHER_PROCESS_LOGIN.format(session_id), str(store))
+    assert reload_changed() == ["UserSession"]
+    assert db_auth.session_may_exist(session_id)
+    assert db_auth.wait_filter(10)
+    assert db_auth.session_may_exist(session_id)
+    assert db_auth.user_id_for_session_id(session_id) == "u9"
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+""" Tests of SessionSignedAuth tokens
+"""
+import pytest
+
+from conftest import FakeRequest
+
+from api.v1.auth import session_signed_auth
+from api.v1.auth.session_signed_auth import SessionSignedAuth
+
+
+class FakeTime:
+    """ Stand-in for the time module, moved by hand
+    """
+    def __init__(self):
+        self.now = 1900000000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(session_signed_auth, "time", fake)
+    return fake
+
+
+def _auth(monkeypatch, keys="first-secret", duration="60"):
+    monkeypatch.setenv("SESSION_SECRET_KEYS", keys)
+    monkeypatch.setenv("SESSION_DURATION", duration)
+    return SessionSignedAuth()
+
+
+def test_token_round_trip(monkeypatch, clock):
+    auth = _auth(monkeypatch)
+    token = auth.create_session("user.with:odd/chars")
+    assert auth.user_id_for_session_id(token) == "user.with:odd/chars"
+    assert auth.create_session(None) is None
+    assert auth.user_id_for_session_id(None) is None
+
+
+def test_token_expires(monkeypatch, clock):
+    auth = _auth(monkeypatch)
+    token = auth.create_session("u1")
+    clock.now += 60
+    assert auth.user_id_for_session_id(token) == "u1"
+    clock.now += 1
+    assert auth.user_id_for_session_id(token) is None
+
+
+def test_tampered_tokens_are_rejected(monkeypatch, clock):
+    auth = _auth(monkeypatch)
+    key_id, user_id, expires, signature = \
+        auth.create_session("u1").split(".")
+    longer = "{}.{}.{}.{}".format(key_id, user_id, int(expires) + 3600,
+                                  signature)
+    assert auth.user_id_for_session_id(longer) is None
+    other = _auth(monkeypatch, keys="other-secret")
+    assert other.user_id_for_session_id(
+        auth.create_session("u1")) is None
+    assert auth.user_id_for_session_id("not.a.token") is None
+
+
+@pytest.mark.parametrize("forge", [
+    lambda parts: ".".join(parts[:3] + ["\xe9" * len(parts[3])]),
+    lambda parts: ".".join(parts[:1] + ["\udce9"] + parts[2:]),
+    lambda parts: ".".join(parts[:2]),
+    lambda parts: ".".join(parts + ["extra"]),
+    lambda parts: ""])
+def test_malformed_tokens_are_rejected(monkeypatch, clock, forge):
+    auth = _auth(monkeypatch)
+    token = forge(auth.create_session("u1").split("."))
+    assert auth.user_id_for_session_id(token) is None
+
+
+def test_key_rotation(monkeypatch, clock):
+    old = _auth(monkeypatch, keys="old-secret")
+    old_token = old.create_session("u1")
+    rotated = _auth(monkeypatch, keys="new-secret, old-secret")
+    assert rotated.user_id_for_session_id(old_token) == "u1"
+    new_token = rotated.create_session("u2")
+    assert new_token.split(".")[0] != old_token.split(".")[0]
+    assert old.user_id_for_session_id(new_token) is None
+    retired = _auth(monkeypatch, keys="new-secret")
+    assert retired.user_id_for_session_id(old_token) is None
+    assert retired.user_id_for_session_id(new_token) == "u2"
+
+
+def test_secrets_are_taken_whole(monkeypatch, clock):
+    auth = _auth(monkeypatch, keys="kid:s3cr.et")
+    token = auth.create_session("u1")
+    assert token.count(".") == 3
+    assert _auth(monkeypatch, keys="s3cr.et").user_id_for_session_id(
+        token) is None
+    assert auth.user_id_for_session_id(token) == "u1"
+
+
+@pytest.mark.parametrize("keys, duration", [
+    ("", "60"), (" , ", "60"), ("secret", "0"), ("secret", "-5"),
+    ("secret", "soon")])
+def test_bad_configuration_is_refused(monkeypatch, keys, duration):
+    with pytest.raises(ValueError):
+        _auth(monkeypatch, keys=keys, duration=duration)
+
+
+def test_duration_defaults_to_an_hour(monkeypatch, clock):
+    monkeypatch.setenv("SESSION_SECRET_KEYS", "secret")
+    monkeypatch.delenv("SESSION_DURATION", raising=False)
+    auth = SessionSignedAuth()
+    assert auth.session_duration == 3600
+
+
+def test_destroy_session(monkeypatch, clock):
+    monkeypatch.setenv("SESSION_NAME", "_my_session_id")
+    auth = _auth(monkeypatch)
+    token = auth.create_session("u1")
+    assert auth.destroy_session(FakeRequest(
+        cookies={"_my_session_id": token}))
+    assert not auth.destroy_session(FakeRequest(
+        cookies={"_my_session_id": "forged"}))
+    assert auth.destroy_user_sessions("u1") == 0
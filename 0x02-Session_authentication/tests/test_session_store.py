@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+""" Tests of the session stores
+"""
+from datetime import datetime
+import os
+import sqlite3
+import uuid
+
+import pytest
+
+from conftest import run_python
+
+from api.v1.auth.session_store import (
+    CompactSessionStore,
+    MemorySessionStore,
+    SQLiteSessionStore,
+    SessionStore,
+    session_store
+)
+
+
+@pytest.fixture(params=["memory", "compact", "sqlite"])
+def sessions(request):
+    if request.param == "memory":
+        return MemorySessionStore()
+    if request.param == "compact":
+        return CompactSessionStore()
+    return SQLiteSessionStore("sessions.sqlite3")
+
+
+def _ids(count):
+    return [str(uuid.uuid4()) for _ in range(count)]
+
+
+def test_mapping(sessions):
+    a, b = _ids(2)
+    sessions[a] = "u1"
+    sessions[b] = {"user_id": "u2", "created_at": datetime(2030, 1, 1)}
+    assert len(sessions) == 2
+    assert sessions[a] == "u1"
+    assert sessions[b]["created_at"] == datetime(2030, 1, 1)
+    assert sessions.get_many([a, b, _ids(1)[0]]) == {a: "u1", b: sessions[b]}
+    sessions[a] = "u3"
+    assert len(sessions) == 2
+    del sessions[a]
+    assert a not in sessions and len(sessions) == 1
+    assert sessions.pop(b)["user_id"] == "u2"
+    assert len(sessions) == 0
+    with pytest.raises(KeyError):
+        del sessions[a]
+
+
+def test_oldest_follows_touch(sessions, monkeypatch):
+    ids = _ids(3)
+    for i, session_id in enumerate(ids):
+        # SQLite orders by the time of the last write
+        monkeypatch.setattr("time.time", lambda i=i: 1000.0 + i)
+        sessions[session_id] = "u1"
+    assert sessions.oldest() == ids[0]
+    monkeypatch.setattr("time.time", lambda: 2000.0)
+    sessions.touch(ids[0])
+    assert sessions.oldest() == ids[1]
+    assert list(sessions) == ids[1:] + ids[:1]
+
+
+def test_oldest_of_no_session(sessions):
+    assert sessions.oldest() is None
+
+
+def test_sessions_of(sessions):
+    ids = _ids(4)
+    for i, session_id in enumerate(ids):
+        sessions[session_id] = "u{}".format(i % 2)
+    assert sorted(sessions.sessions_of("u0")) == sorted(ids[0::2])
+    del sessions[ids[0]]
+    assert sessions.sessions_of("u0") == [ids[2]]
+    assert sessions.sessions_of("nobody") == []
+
+
+def test_default_touch_stores_the_value_again():
+    class DictStore(SessionStore):
+        def __init__(self):
+            super().__init__()
+            self.data = {}
+
+        def __getitem__(self, key):
+            return self.data[key]
+
+        def __setitem__(self, key, value):
+            self.data.pop(key, None)
+            self.data[key] = value
+
+        def __delitem__(self, key):
+            del self.data[key]
+
+        def __iter__(self):
+            return iter(self.data)
+
+        def __len__(self):
+            return len(self.data)
+
+    sessions = DictStore()
+    sessions["a"] = "u1"
+    sessions["b"] = "u2"
+    sessions.touch("a")
+    sessions.touch("missing")
+    assert list(sessions) == ["b", "a"]
+    assert sessions.oldest() == "b"
+
+
+def test_sqlite_is_shared_between_processes(store):
+    sessions = SQLiteSessionStore("shared.sqlite3")
+    sessions["s1"] = "u1"
+    run_python("from api.v1.auth.session_store import SQLiteSessionStore\n"
+               "sessions = SQLiteSessionStore('shared.sqlite3')\n"
+               "assert sessions['s1'] == 'u1'\n"
+               "sessions['s2'] = 'u2'\n", str(store))
+    assert sessions["s2"] == "u2"
+    assert len(sessions) == 2
+
+
+def test_sqlite_count_of_an_older_database():
+    conn = sqlite3.connect("old.sqlite3")
+    conn.execute("CREATE TABLE sessions (session_id TEXT PRIMARY KEY, "
+                 "value TEXT NOT NULL, used_at REAL NOT NULL)")
+    conn.executemany("INSERT INTO sessions VALUES (?, ?, 0)",
+                     [("s1", '"u1"'), ("s2", '"u2"')])
+    conn.commit()
+    conn.close()
+    sessions = SQLiteSessionStore("old.sqlite3")
+    assert len(sessions) == 2
+    assert sessions.sessions_of("u2") == ["s2"]
+    sessions["s3"] = "u3"
+    assert len(SQLiteSessionStore("old.sqlite3")) == 3
+
+
+def test_store_opened_on_construction(monkeypatch):
+    monkeypatch.setenv("SESSION_STORE", "sqlite")
+    monkeypatch.setenv("SESSION_STORE_PATH", "lazy.sqlite3")
+    from api.v1.auth.session_auth import SessionAuth
+    assert not os.path.exists("lazy.sqlite3")
+    auth = SessionAuth()
+    assert os.path.exists("lazy.sqlite3")
+    assert isinstance(auth.user_id_by_session_id, SQLiteSessionStore)
+
+
+def test_unknown_backend(monkeypatch):
+    monkeypatch.setenv("SESSION_STORE", "redis")
+    with pytest.raises(ValueError):
+        session_store()
+
+
+@pytest.mark.parametrize("spelling", [
+    str.upper, lambda s: s.replace("-", ""), lambda s: "{" + s + "}",
+    lambda s: "urn:uuid:" + s])
+def test_compact_store_takes_canonical_ids_only(spelling):
+    sessions = CompactSessionStore()
+    session_id = str(uuid.uuid4())
+    sessions[session_id] = "u1"
+    other = spelling(session_id)
+    assert other not in sessions
+    assert sessions.get(other) is None
+    with pytest.raises(KeyError):
+        del sessions[other]
+    with pytest.raises(ValueError):
+        sessions[other] = "u2"
+    assert sessions[session_id] == "u1"
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+""" Tests of single-flight call coalescing
+"""
+import threading
+import time
+
+import pytest
+
+from api.v1.auth.single_flight import SingleFlight
+
+
+def _run_concurrently(flights, key, fn, count):
+    results = []
+    errors = []
+
+    def call():
+        try:
+            results.append(flights.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_calls_share_one_run():
+    flights = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def slow():
+        runs.append(1)
+        release.wait(10)
+        return "user"
+
+    threads, results, errors = _run_concurrently(flights, "k", slow, 8)
+    while flights.stats()["calls"] < 8:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+    assert runs == [1]
+    assert results == ["user"] * 8 and errors == []
+    assert flights.stats() == {"calls": 8, "shared": 7, "in_flight": 0}
+
+
+def test_errors_are_shared_too():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(10)
+        raise LookupError("down")
+
+    threads, results, errors = _run_concurrently(flights, "k", failing, 4)
+    while flights.stats()["calls"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+    assert results == []
+    assert len(errors) == 4
+    assert all(isinstance(e, LookupError) for e in errors)
+
+
+def test_nothing_is_kept_after_a_call():
+    flights = SingleFlight()
+    assert flights.do("k", lambda: 1) == 1
+    assert flights.do("k", lambda: 2) == 2
+    with pytest.raises(ValueError):
+        flights.do("k", lambda: int("x"))
+    assert flights.do("k", lambda: 3) == 3
+    assert flights.stats()["shared"] == 0
+
+
+def test_keys_run_independently():
+    flights = SingleFlight()
+    assert [flights.do(key, lambda key=key: key * 2)
+            for key in (1, 2, 3)] == [2, 4, 6]
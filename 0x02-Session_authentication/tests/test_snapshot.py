@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+""" Tests of the snapshot storage
+"""
+import pytest
+
+from models import base
+from models.snapshot import (
+    Snapshot,
+    SnapshotStore,
+    open_snapshot,
+    write_snapshot
+)
+from models.user import User
+
+
+@pytest.fixture
+def snapshot_storage(monkeypatch):
+    """ Keep the store in snapshot files
+    """
+    monkeypatch.setattr(base, "STORAGE", "snapshot")
+
+
+def _users(count):
+    users = []
+    for i in range(count):
+        user = User()
+        user.email = "user{}@x.io".format(i)
+        user.save()
+        users.append(user)
+    return users
+
+
+def test_file_round_trip(store):
+    records = [("b", b'{"x": 2}'), ("a", b'{"x": 1}'), ("c", b'{}')]
+    assert write_snapshot("s.snap", records) == 3
+    snapshot = Snapshot("s.snap")
+    assert len(snapshot) == 3
+    assert list(snapshot.ids()) == ["a", "b", "c"]
+    assert snapshot.get("b") == {"x": 2}
+    assert snapshot.get("missing") is None
+    assert "c" in snapshot and "d" not in snapshot
+    assert open_snapshot("nothing.snap") is None
+
+
+def test_not_a_snapshot(store):
+    with open("bad.snap", "wb") as f:
+        f.write(b"\0" * 64)
+    with pytest.raises(ValueError):
+        Snapshot("bad.snap")
+
+
+def test_instances_survive_a_reload(snapshot_storage):
+    users = _users(10)
+    User.load_from_file()
+    assert isinstance(base.DATA["User"], SnapshotStore)
+    assert User.count() == 10
+    assert User.get(users[3].id).email == "user3@x.io"
+    assert sorted(u.id for u in User.all()) == sorted(u.id for u in users)
+
+
+def test_get_decodes_only_its_record(snapshot_storage):
+    users = _users(10)
+    User.load_from_file()
+    store = base.DATA["User"]
+    User.get(users[0].id)
+    assert store.stats()["faults"] == 1
+
+
+def test_scans_decode_records_once(snapshot_storage):
+    _users(10)
+    User.load_from_file()
+    store = base.DATA["User"]
+    first = User.all()
+    assert store.stats()["faults"] == 10
+    second = User.all()
+    assert store.stats()["faults"] == 10
+    assert sorted(id(u) for u in first) == sorted(id(u) for u in second)
+
+
+def test_changes_are_written_to_a_new_snapshot(snapshot_storage):
+    users = _users(5)
+    User.load_from_file()
+    users[0].remove()
+    user = User.get(users[1].id)
+    user.first_name = "Bob"
+    user.save()
+    User.load_from_file()
+    assert User.count() == 4
+    assert User.get(users[0].id) is None
+    assert User.get(users[1].id).first_name == "Bob"
+
+
+def test_records_are_read_under_the_lock(snapshot_storage, monkeypatch):
+    _users(5)
+    User.load_from_file()
+    records = SnapshotStore.records
+    held = []
+
+    def checked(self):
+        for record in records(self):
+            held.append(base.DATA_LOCK._readers > 0)
+            yield record
+
+    monkeypatch.setattr(SnapshotStore, "records", checked)
+    _users(1)
+    assert len(held) == 6 and all(held)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+""" Tests of the bounded working set of snapshot-backed classes
+"""
+import pytest
+
+from models import base
+from models.user import User
+
+
+@pytest.fixture
+def bounded(monkeypatch):
+    """ Keep Users in snapshot files, at most 3 of them in memory
+    """
+    monkeypatch.setattr(base, "STORAGE", "snapshot")
+    monkeypatch.setattr(User, "max_resident", 3)
+
+
+def _users(count):
+    users = []
+    for i in range(count):
+        user = User()
+        user.email = "user{}@x.io".format(i)
+        user.save()
+        users.append(user)
+    User.load_from_file()
+    return users
+
+
+def test_reads_beyond_the_bound_evict(bounded):
+    users = _users(10)
+    store = base.DATA["User"]
+    for user in users:
+        assert User.get(user.id).email == user.email
+    stats = store.stats()
+    assert stats["resident"] == 3
+    assert stats["faults"] == 10
+    assert stats["evictions"] == 7
+
+
+def test_recently_used_instances_stay(bounded):
+    users = _users(10)
+    store = base.DATA["User"]
+    hot = User.get(users[0].id)
+    for user in users[1:3]:
+        User.get(user.id)
+    assert User.get(users[0].id) is hot
+    User.get(users[5].id)
+    # users[1] was the least recently used one
+    assert User.get(users[0].id) is hot
+    assert store.stats()["evictions"] == 1
+
+
+def test_scans_respect_the_bound(bounded):
+    _users(10)
+    store = base.DATA["User"]
+    assert len(User.all()) == 10
+    assert store.stats()["resident"] == 3
+
+
+def test_unsaved_writes_are_never_evicted(bounded):
+    users = _users(10)
+    store = base.DATA["User"]
+    changed = User.get(users[0].id)
+    changed.first_name = "Bob"
+    with base.DATA_LOCK.write():
+        store[changed.id] = changed
+    for user in users[1:]:
+        User.get(user.id)
+    assert User.get(users[0].id) is changed
+    assert store.stats()["dirty"] == 1
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+""" Tests of the latency histograms of authentication stages
+"""
+import threading
+
+import pytest
+
+from api.v1.auth import timing
+
+
+@pytest.fixture(autouse=True)
+def histograms(monkeypatch):
+    monkeypatch.setattr(timing, "ENABLED", True)
+    timing.reset()
+    yield
+    timing.reset()
+
+
+def test_histogram_summary():
+    found = timing.Histogram()
+    for us in (1, 3, 3, 100, 5000):
+        found.record(us * 1000)
+    summary = found.to_json()
+    assert summary["count"] == 5
+    assert summary["max_ms"] == 5.0
+    assert summary["buckets_us"] == {"<2": 1, "<4": 2, "<128": 1,
+                                     "<8192": 1}
+    assert summary["p50_ms"] == 0.004
+    assert summary["p99_ms"] == 5.0
+
+
+def test_empty_histogram():
+    summary = timing.Histogram().to_json()
+    assert summary["count"] == 0
+    assert summary["mean_ms"] == 0.0 and summary["p90_ms"] == 0.0
+
+
+def test_timed_records_even_on_errors():
+    with timing.timed("stage"):
+        pass
+    with pytest.raises(KeyError):
+        with timing.timed("stage"):
+            raise KeyError("boom")
+    assert timing.timings()["stage"]["count"] == 2
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.setattr(timing, "ENABLED", False)
+    with timing.timed("stage"):
+        pass
+    assert timing.timings() == {}
+
+
+def test_timings_while_stages_come_and_go():
+    stop = threading.Event()
+    errors = []
+
+    def churn():
+        i = 0
+        while not stop.is_set():
+            with timing.timed("stage{}".format(i % 50)):
+                pass
+            if i % 50 == 0:
+                timing.reset()
+            i += 1
+
+    def read():
+        try:
+            for _ in range(500):
+                timing.timings()
+        except Exception as e:
+            errors.append(e)
+
+    writer = threading.Thread(target=churn)
+    writer.start()
+    try:
+        read()
+    finally:
+        stop.set()
+        writer.join()
+    assert errors == []
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+""" Tests of the cached to_json() results
+"""
+from models.user import User
+
+
+def test_assignment_refreshes_the_result():
+    user = User()
+    user.email = "bob@x.io"
+    assert user.to_json()["email"] == "bob@x.io"
+    user.email = "alice@x.io"
+    assert user.to_json()["email"] == "alice@x.io"
+    user.password = "secret"
+    assert user.to_json(True)["_password"] == user.password
+
+
+def test_callers_get_their_own_copy():
+    user = User()
+    user.email = "bob@x.io"
+    first = user.to_json()
+    first["email"] = "changed"
+    assert user.to_json()["email"] == "bob@x.io"
+
+
+def test_private_attributes_only_for_serialization():
+    user = User()
+    user.password = "secret"
+    assert "_password" not in user.to_json()
+    assert "_password" in user.to_json(True)
+    # Bookkeeping never leaks, in either variant
+    for result in (user.to_json(), user.to_json(True)):
+        assert not [key for key in result if key.startswith("_json")]
+
+
+def test_timestamps_are_formatted():
+    user = User()
+    result = user.to_json()
+    assert result["created_at"] == \
+        user.created_at.strftime("%Y-%m-%dT%H:%M:%S")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+""" Tests of the Users views and the sessions they end
+"""
+import pytest
+
+from api.v1 import app as app_module
+from api.v1.auth.session_auth import SessionAuth
+from api.v1.auth.session_db_auth import SessionDBAuth
+from api.v1.auth.session_exp_auth import SessionExpAuth
+from models.user import User
+from models.user_session import UserSession
+
+
+COOKIE = "_my_session_id"
+
+
+@pytest.fixture(params=[SessionAuth, SessionExpAuth, SessionDBAuth])
+def auth(request, monkeypatch):
+    monkeypatch.setenv("SESSION_NAME", COOKIE)
+    monkeypatch.setenv("SESSION_STORE", "memory")
+    monkeypatch.setenv("SESSION_DURATION", "600")
+    monkeypatch.setenv("SESSION_SWEEP_INTERVAL", "0")
+    monkeypatch.setenv("SESSION_GC_INTERVAL", "0")
+    monkeypatch.delenv("LOGIN_RATE_PER_MINUTE", raising=False)
+    UserSession.load_from_file()
+    auth = request.param()
+    monkeypatch.setattr(app_module, "auth", auth)
+    yield auth
+    if hasattr(auth, "stop_sweeper"):
+        auth.stop_sweeper()
+
+
+def _user(email, password="pwd"):
+    user = User(email=email)
+    user.password = password
+    user.save()
+    return user
+
+
+def _client(email, password="pwd"):
+    client = app_module.app.test_client()
+    response = client.post("/api/v1/auth_session/login",
+                           data={"email": email, "password": password})
+    assert response.status_code == 200
+    return client
+
+
+def _me(client):
+    return client.get("/api/v1/users/me").status_code
+
+
+def test_put_cannot_change_the_password_of_another_user(auth):
+    bob = _user("bob@x.io")
+    _user("eve@x.io")
+    bob_client = _client("bob@x.io")
+    eve_client = _client("eve@x.io")
+    response = eve_client.put("/api/v1/users/{}".format(bob.id),
+                              json={"password": "owned"})
+    assert response.status_code == 200
+    bob = User.get(bob.id)
+    assert bob.is_valid_password("pwd")
+    assert not bob.is_valid_password("owned")
+    assert _me(bob_client) == 200
+
+
+def test_put_cannot_change_its_own_password_either(auth):
+    bob = _user("bob@x.io")
+    client = _client("bob@x.io")
+    client.put("/api/v1/users/{}".format(bob.id),
+               json={"password": "new", "first_name": "Bob"})
+    bob = User.get(bob.id)
+    assert bob.first_name == "Bob"
+    assert bob.is_valid_password("pwd")
+
+
+def test_password_change_ends_every_session_of_the_user(auth):
+    _user("bob@x.io")
+    _user("eve@x.io")
+    first = _client("bob@x.io")
+    second = _client("bob@x.io")
+    eve_client = _client("eve@x.io")
+    response = first.put("/api/v1/users/me/password",
+                         json={"current_password": "pwd",
+                               "new_password": "better"})
+    assert response.status_code == 200
+    # The cookie of this session is cleared, the other one is refused
+    assert _me(first) == 401
+    assert _me(second) == 403
+    assert _me(eve_client) == 200
+    assert _client("bob@x.io", "better")
+    bob = User.search({"email": "bob@x.io"})[0]
+    assert not bob.is_valid_password("pwd")
+
+
+@pytest.mark.parametrize("body, status", [
+    ({"current_password": "wrong", "new_password": "better"}, 403),
+    ({"new_password": "better"}, 403),
+    ({"current_password": "pwd", "new_password": ""}, 400),
+    ({"current_password": "pwd"}, 400),
+    (["pwd"], 400)])
+def test_password_change_is_checked(auth, body, status):
+    _user("bob@x.io")
+    client = _client("bob@x.io")
+    response = client.put("/api/v1/users/me/password", json=body)
+    assert response.status_code == status
+    assert _me(client) == 200
+    assert User.search({"email": "bob@x.io"})[0].is_valid_password("pwd")
+
+
+def test_password_change_needs_a_session(auth):
+    client = app_module.app.test_client()
+    response = client.put("/api/v1/users/me/password",
+                          json={"current_password": "pwd",
+                                "new_password": "better"})
+    assert response.status_code == 401
+
+
+def test_logout_all_ends_only_the_sessions_of_the_user(auth):
+    _user("bob@x.io")
+    _user("eve@x.io")
+    first = _client("bob@x.io")
+    second = _client("bob@x.io")
+    eve_client = _client("eve@x.io")
+    response = first.delete("/api/v1/auth_session/logout_all")
+    assert response.status_code == 200
+    assert response.get_json() == {"sessions": 2}
+    assert _me(first) == 401 and _me(second) == 403
+    assert _me(eve_client) == 200
+
+
+def test_deleting_a_user_ends_its_sessions(auth):
+    bob = _user("bob@x.io")
+    _user("eve@x.io")
+    bob_client = _client("bob@x.io")
+    eve_client = _client("eve@x.io")
+    assert eve_client.delete(
+        "/api/v1/users/{}".format(bob.id)).status_code == 200
+    assert _me(bob_client) == 403
+    assert auth.user_id_by_session_id.sessions_of(bob.id) == []
@@ -3,9 +3,14 @@
 from flask import Flask, jsonify, request, make_response
 from flask import abort, Response, redirect
 from auth import Auth
+from rate_limit import login_limiter, trust_proxies
+import math
 
 app = Flask(__name__)
+app.wsgi_app = trust_proxies(app.wsgi_app)
 AUTH = Auth()
+# Attempts by client IP and by email, checked before any lookup or hash
+LOGIN_LIMITER = login_limiter()
 
 
 @app.route("/sessions", methods=["POST"], strict_slashes=False)
@@ -18,10 +23,21 @@ def login() -> Response:
     session ID.
 
     If the credentials are invalid, it returns a 401 status code.
+
+    With LOGIN_RATE_PER_MINUTE set, too many attempts from the same IP
+    or for the same email get a 429 status code, before the credentials
+    are checked.
     """
     email = request.form.get("email")
     password = request.form.get("password")
 
+    wait = LOGIN_LIMITER.acquire(("ip", request.remote_addr),
+                                 ("email", email) if email else None)
+    if wait > 0:
+        response = jsonify({"message": "too many login attempts"})
+        response.headers["Retry-After"] = str(math.ceil(wait))
+        return response, 429
+
     # Check if the credentials are valid
     if AUTH.valid_login(email, password):
         # Create a JSON response with a 200 status code